@@ -70,11 +70,7 @@ class CommentQuerySet(models.QuerySet):
         Filters comments under posts that are available for the user
         """
 
-        return self.filter(
-            on_post__in=Post.objects.annotate_user_permission(user).filter(
-                user_permission__isnull=False
-            )
-        )
+        return self.filter(on_post__in=Post.objects.filter_permission(user))
 
 
 class Comment(TimeStampedModel):
@@ -2,6 +2,7 @@ from comments.models import Comment
 from posts.models import Post, PostUserSnapshot
 from projects.models import Project
 from projects.permissions import ObjectPermission
+from projects.services import get_projects_visibility
 from questions.models import Forecast
 from users.models import User
 
@@ -17,11 +18,7 @@ def get_comment_permission_for_user(
 
     permissions = None
     if comment.on_post:
-        permissions = (
-            Post.objects.filter(pk=comment.on_post.pk)
-            .annotate_user_permission(user=user)[0]
-            .user_permission
-        )
+        permissions = get_projects_visibility(user).get_post_permission(comment.on_post)
     if comment.on_project:
         permissions = (
             Project.objects.filter(pk=comment.on_project.pk)
@@ -12,6 +12,7 @@ from migrator.services.migrate_questions import migrate_post_snapshots_forecasts
 from migrator.utils import paginated_query
 from posts.models import Post
 from questions.models import AggregateForecast, Forecast, Question
+from questions.services import update_question_latest_aggregate
 from users.models import User
 
 
@@ -268,6 +269,9 @@ def migrate_metaculus_predictions():
             question=question, method="metaculus_prediction"
         ).delete()
         AggregateForecast.objects.bulk_create(forecasts)
+        update_question_latest_aggregate(
+            question, "metaculus_prediction", forecasts[-1] if forecasts else None
+        )
     print(
         f"\033[KMigrating continuous metaculus prediction {i}/{c} "
         f"dur:{str(timezone.now() - start).split('.')[0]} "
@@ -324,6 +328,9 @@ def migrate_metaculus_predictions():
             question=question, method="metaculus_prediction"
         ).delete()
         AggregateForecast.objects.bulk_create(forecasts)
+        update_question_latest_aggregate(
+            question, "metaculus_prediction", forecasts[-1] if forecasts else None
+        )
     print(
         f"\033[KMigrating binary metaculus prediction {i}/{c} "
         f"dur:{str(timezone.now() - start).split('.')[0]} "
@@ -6,7 +6,11 @@ from migrator.utils import paginated_query
 from posts.models import Post
 from projects.models import Project, ProjectUserPermission
 from projects.permissions import ObjectPermission
-from projects.services import get_site_main_project
+from projects.services import (
+    get_site_main_project,
+    invalidate_site_main_project_id,
+    invalidate_user_projects_permissions,
+)
 from utils.dtypes import flatten
 
 # These types were merged with project during metaculus refactoring
@@ -360,3 +364,7 @@ def migrate_permissions(site_ids: list):
     migrate_post_default_project()
     deduplicate_default_project_and_m2m()
     add_to_main_feed_if_in_other_project()
+
+    # Projects and their permissions were bulk created
+    invalidate_site_main_project_id()
+    invalidate_user_projects_permissions()
@@ -118,6 +118,7 @@ def create_question(question: dict, **kwargs) -> Question:
             resolution_float, new_question
         )
     new_question.resolution = resolution
+    new_question.update_global_leaderboard_window()
 
     return new_question
 
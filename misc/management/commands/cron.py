@@ -19,6 +19,8 @@ from posts.jobs import (
     job_check_post_open_event,
 )
 from posts.services.common import compute_hotness
+from scoring.jobs import job_update_leaderboards
+from users.jobs import job_drop_stale_profile_stats
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -134,6 +136,28 @@ class Command(BaseCommand):
             replace_existing=True,
         )
 
+        #
+        # Scoring jobs
+        #
+        scheduler.add_job(
+            close_old_connections(job_update_leaderboards.send),
+            trigger=CronTrigger.from_crontab("0 2 * * *"),  # Every day at 02:00 UTC
+            id="scoring_job_update_leaderboards",
+            max_instances=1,
+            replace_existing=True,
+        )
+
+        #
+        # User jobs
+        #
+        scheduler.add_job(
+            close_old_connections(job_drop_stale_profile_stats.send),
+            trigger=CronTrigger.from_crontab("0 3 * * *"),  # Every day at 03:00 UTC
+            id="users_job_drop_stale_profile_stats",
+            max_instances=1,
+            replace_existing=True,
+        )
+
         #
         # ITN Sync Job
         #
@@ -3,6 +3,7 @@ Module contains Cron Job handlers
 """
 
 import logging
+from itertools import batched
 
 import django
 import dramatiq
@@ -13,7 +14,6 @@ from posts.services.subscriptions import notify_milestone, notify_date
 from questions.services import close_question
 from questions.models import Question
 
-
 logger = logging.getLogger(__name__)
 
 
@@ -48,7 +48,7 @@ def job_check_post_open_event():
 
 @dramatiq.actor
 def job_compute_movement():
-    from posts.services.common import compute_movement
+    from posts.services.common import compute_movement, get_movement_aggregations
 
     qs = (
         Post.objects.filter_active()
@@ -60,26 +60,34 @@ def job_compute_movement():
         .prefetch_questions()
     )
 
-    posts = []
+    now = django.utils.timezone.now()
 
-    for i, post in enumerate(qs.iterator(100), 1):
+    for batch in batched(qs.iterator(100), 100):
+        # Stored CPs of the whole batch are fetched at once,
+        # falling back to fetching them for each post
         try:
-            post.movement = compute_movement(post)
+            aggregations = get_movement_aggregations(
+                [question for post in batch for question in post.get_questions()],
+                now,
+            )
         except Exception:
-            logger.exception(f"Error during compute_movement for post_id {post.id}")
-            continue
+            logger.exception("Error during get_movement_aggregations")
+            aggregations = None
+
+        posts = []
 
-        posts.append(post)
+        for post in batch:
+            try:
+                post.movement = compute_movement(post, aggregations)
+            except Exception:
+                logger.exception(f"Error during compute_movement for post_id {post.id}")
+                continue
 
-        if len(posts) >= 100:
-            print("bulk updating...", end="\r")
-            Post.objects.bulk_update(posts, fields=["movement"])
-            posts = []
-            print("bulk updating... DONE")
+            posts.append(post)
 
-    print("bulk updating...", end="\r")
-    Post.objects.bulk_update(posts, fields=["movement"])
-    print("bulk updating... DONE")
+        print("bulk updating...", end="\r")
+        Post.objects.bulk_update(posts, fields=["movement"])
+        print("bulk updating... DONE")
 
 
 @dramatiq.actor
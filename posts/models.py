@@ -13,15 +13,17 @@ from django.db.models import (
     Min,
     Prefetch,
     QuerySet,
-    FilteredRelation,
     Exists,
     Value,
 )
 from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from pgvector.django import VectorField
 
+from posts.services.cache import bump_post_cache_versions
 from projects.models import Project
 from projects.permissions import ObjectPermission
 from questions.models import (
@@ -35,6 +37,40 @@ from users.models import User
 from utils.models import TimeStampedModel
 
 
+def get_condition_post_prefetches() -> list[str]:
+    return [
+        "conditional__condition__related_posts__post",
+        "conditional__condition_child__related_posts__post",
+    ]
+
+
+def get_questions_scores_prefetches() -> list[Prefetch]:
+    question_relations = [
+        "question",
+        "conditional__question_yes",
+        "conditional__question_no",
+        "group_of_questions__questions",
+    ]
+
+    return list(
+        chain.from_iterable(
+            [
+                [
+                    Prefetch(
+                        f"{rel}__scores",
+                        Score.objects.filter(aggregation_method__isnull=False),
+                    ),
+                    Prefetch(
+                        f"{rel}__archived_scores",
+                        Score.objects.filter(aggregation_method__isnull=False),
+                    ),
+                ]
+                for rel in question_relations
+            ]
+        )
+    )
+
+
 class PostQuerySet(models.QuerySet):
     def prefetch_projects(self):
         return self.prefetch_related("projects").select_related("default_project")
@@ -85,36 +121,10 @@ class PostQuerySet(models.QuerySet):
         )
 
     def prefetch_condition_post(self):
-        return self.prefetch_related(
-            "conditional__condition__related_posts__post",
-            "conditional__condition_child__related_posts__post",
-        )
+        return self.prefetch_related(*get_condition_post_prefetches())
 
     def prefetch_questions_scores(self):
-        question_relations = [
-            "question",
-            "conditional__question_yes",
-            "conditional__question_no",
-            "group_of_questions__questions",
-        ]
-
-        return self.prefetch_related(
-            *chain.from_iterable(
-                [
-                    [
-                        Prefetch(
-                            f"{rel}__scores",
-                            Score.objects.filter(aggregation_method__isnull=False),
-                        ),
-                        Prefetch(
-                            f"{rel}__archived_scores",
-                            Score.objects.filter(aggregation_method__isnull=False),
-                        ),
-                    ]
-                    for rel in question_relations
-                ]
-            )
-        )
+        return self.prefetch_related(*get_questions_scores_prefetches())
 
     def prefetch_user_subscriptions(self, user: User):
         return self.prefetch_related(
@@ -197,70 +207,18 @@ class PostQuerySet(models.QuerySet):
     # Permissions
     #
     def annotate_user_permission(self, user: User = None):
-        from projects.services import get_site_main_project
-
-        user_id = user.id if user else None
-        site_main_project = get_site_main_project()
+        """
+        Annotates the permission of the user and excludes the posts they can't see
+        """
 
-        # Annotate with user-specific permission or project's default permission
-        qs = self.annotate(
-            user_permission_override=FilteredRelation(
-                "default_project__projectuserpermission",
-                condition=Q(default_project__projectuserpermission__user_id=user_id),
-            ),
-            _user_permission=Coalesce(
-                F("user_permission_override__permission"),
-                F("default_project__default_permission"),
-            ),
-        )
+        from projects.services import get_projects_visibility
 
-        # Exclude posts user doesn't have access to
-        qs = qs.filter(
-            Q(author_id=user_id)
-            | (
-                Q(
-                    _user_permission__in=[
-                        ObjectPermission.ADMIN,
-                        ObjectPermission.CURATOR,
-                    ]
-                )
-                & Q(curation_status=Post.CurationStatus.PENDING)
-            )
-            | (
-                Q(_user_permission__isnull=False)
-                & (
-                    (
-                        Q(default_project_id=site_main_project.pk)
-                        & Q(curation_status=Post.CurationStatus.PENDING)
-                    )
-                    | Q(curation_status=Post.CurationStatus.APPROVED)
-                )
-            )
-        )
+        visibility = get_projects_visibility(user)
 
-        qs = qs.annotate(
-            user_permission=models.Case(
-                # Admin/Curator is more important than Creator
-                models.When(
-                    Q(
-                        _user_permission__in=[
-                            ObjectPermission.ADMIN,
-                            ObjectPermission.CURATOR,
-                        ]
-                    ),
-                    then=F("_user_permission"),
-                ),
-                models.When(
-                    author_id=user.id if user else None,
-                    then=models.Value(ObjectPermission.CREATOR),
-                ),
-                default=F("_user_permission"),
-                output_field=models.CharField(),
-            ),
+        return self.filter(visibility.get_posts_filter()).annotate(
+            user_permission=visibility.get_permission_annotation()
         )
 
-        return qs
-
     def filter_permission(
         self, user: User = None, permission: ObjectPermission = ObjectPermission.VIEWER
     ):
@@ -268,6 +226,8 @@ class PostQuerySet(models.QuerySet):
         Returns posts visible to the user
         """
 
+        from projects.services import get_projects_visibility
+
         user_id = user.id if user else None
 
         if permission == ObjectPermission.CREATOR:
@@ -277,8 +237,8 @@ class PostQuerySet(models.QuerySet):
             ObjectPermission.CREATOR
         ]
 
-        return self.annotate_user_permission(user).filter(
-            user_permission__in=permissions_lookup
+        return self.filter(
+            get_projects_visibility(user).get_posts_filter(permissions_lookup)
         )
 
     def filter_public(self):
@@ -571,6 +531,12 @@ class Post(TimeStampedModel):
     # And guarantees idempotency of "on post open" evens
     published_at_triggered = models.BooleanField(default=False)
 
+    def save(self, **kwargs):
+        super().save(**kwargs)
+
+        # Drop the cached serialized fragments
+        bump_post_cache_versions([self.pk])
+
     def update_forecasts_count(self):
         """
         Update forecasts count cache
@@ -768,3 +734,49 @@ class Vote(TimeStampedModel):
                 name="votes_unique_user_question", fields=["user_id", "post_id"]
             ),
         ]
+
+
+@receiver(m2m_changed, sender=Post.projects.through)
+@receiver(m2m_changed, sender=Post.coauthors.through)
+def bump_post_relations_cache_versions(
+    sender, instance, action: str, reverse: bool, pk_set: set[int], **kwargs
+):
+    """
+    Projects and coauthors are part of the cached fragments of the posts,
+    but are changed without saving them
+    """
+
+    if not reverse:
+        if action in ["post_add", "post_remove", "post_clear"]:
+            bump_post_cache_versions([instance.pk])
+    elif action in ["post_add", "post_remove"]:
+        bump_post_cache_versions(pk_set)
+    elif action == "pre_clear":
+        # Cleared posts are not given
+        bump_post_cache_versions(
+            sender.objects.filter(
+                **{f"{instance._meta.model_name}_id": instance.pk}
+            ).values_list("post_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Project)
+def bump_project_posts_cache_versions(instance: Project, created: bool, **kwargs):
+    if created:
+        return
+
+    bump_post_cache_versions(
+        Post.objects.filter(Q(default_project=instance) | Q(projects=instance))
+        .values_list("id", flat=True)
+        .distinct()
+    )
+
+
+@receiver(pre_delete, sender=Post)
+def invalidate_post_profile_stats(instance: Post, **kwargs):
+    from users.services import invalidate_profile_stats
+
+    # Questions without a post are not public anymore
+    invalidate_profile_stats(
+        Question.objects.filter(pk__in=[q.pk for q in instance.get_questions()])
+    )
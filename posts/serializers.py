@@ -1,6 +1,11 @@
+import math
+from collections import defaultdict
+from itertools import chain
 from typing import Union
 
+from django.core.cache import cache
 from django.db import models
+from django.db.models import prefetch_related_objects
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
@@ -17,17 +22,33 @@ from questions.models import Question, AggregateForecast
 from questions.serializers import (
     QuestionWriteSerializer,
     serialize_question,
+    serialize_question_my_forecasts,
     serialize_conditional,
     serialize_group,
     ConditionalWriteSerializer,
     GroupOfQuestionsWriteSerializer,
     GroupOfQuestionsUpdateSerializer,
 )
-from questions.services import get_aggregated_forecasts_for_questions
+from questions.services import (
+    get_aggregated_forecasts_for_questions,
+    get_aggregation_sparklines_for_questions,
+    get_latest_aggregated_forecasts_for_questions,
+)
 from users.models import User
 from utils.dtypes import flatten
 from utils.serializers import SerializerKeyLookupMixin
-from .models import Notebook, Post, PostSubscription
+from .models import (
+    Notebook,
+    Post,
+    PostSubscription,
+    get_condition_post_prefetches,
+    get_questions_scores_prefetches,
+)
+from .services.cache import (
+    POST_FRAGMENT_TIMEOUT,
+    get_post_cache_versions,
+    get_post_fragment_key,
+)
 from .utils import get_post_slug
 
 
@@ -318,62 +339,140 @@ class OldQuestionFilterSerializer(SerializerKeyLookupMixin, serializers.Serializ
         return
 
 
-def serialize_post(
+def get_post_fragment_timeout(post: Post) -> int:
+    """
+    Statuses and CP visibility depend on the current time,
+    so fragments expire at the next open, close, resolve or CP reveal time
+    """
+
+    questions = list(post.get_questions())
+    if post.conditional:
+        questions += [post.conditional.condition, post.conditional.condition_child]
+
+    now = timezone.now()
+    upcoming_times = [
+        dt
+        for dt in [
+            post.get_open_time(),
+            post.scheduled_close_time,
+            *chain.from_iterable(
+                (
+                    q.open_time,
+                    q.scheduled_close_time,
+                    q.actual_close_time,
+                    q.actual_resolve_time,
+                    q.cp_reveal_time,
+                )
+                for q in questions
+            ),
+        ]
+        if dt and dt > now
+    ]
+
+    if not upcoming_times:
+        return POST_FRAGMENT_TIMEOUT
+
+    return max(
+        1,
+        min(
+            POST_FRAGMENT_TIMEOUT,
+            math.ceil((min(upcoming_times) - now).total_seconds()),
+        ),
+    )
+
+
+def serialize_post_fragment(
     post: Post,
     with_cp: bool = False,
-    current_user: User = None,
-    with_subscriptions: bool = False,
     aggregate_forecasts: dict[Question, AggregateForecast] = None,
+    aggregation_sparklines: dict[Question, dict[str, dict]] = None,
 ) -> dict:
-    current_user = (
-        current_user if current_user and not current_user.is_anonymous else None
-    )
+    """
+    Serializes the part of the post which is the same for every user
+    """
+
     serialized_data = PostReadSerializer(post).data
 
     if post.question:
         serialized_data["question"] = serialize_question(
             post.question,
             with_cp=with_cp,
-            current_user=current_user,
             post=post,
             aggregate_forecasts=(
                 aggregate_forecasts[post.question] or []
                 if aggregate_forecasts
                 else None
             ),
+            aggregation_sparklines=(
+                aggregation_sparklines.get(post.question, {})
+                if aggregation_sparklines is not None
+                else None
+            ),
         )
 
     if post.conditional:
         serialized_data["conditional"] = serialize_conditional(
             post.conditional,
             with_cp=with_cp,
-            current_user=current_user,
             post=post,
             aggregate_forecasts=aggregate_forecasts,
+            aggregation_sparklines=aggregation_sparklines,
         )
 
     if post.group_of_questions:
         serialized_data["group_of_questions"] = serialize_group(
             post.group_of_questions,
             with_cp=with_cp,
-            current_user=current_user,
             post=post,
             aggregate_forecasts=aggregate_forecasts,
+            aggregation_sparklines=aggregation_sparklines,
         )
 
     if post.notebook:
         serialized_data["notebook"] = NotebookSerializer(post.notebook).data
 
+    serialized_data["vote"] = {"score": post.vote_score}
+    # Forecasters
+    serialized_data["forecasts_count"] = post.forecasts_count
+
+    return serialized_data
+
+
+def serialize_post_user_fields(
+    post: Post,
+    serialized_data: dict,
+    with_cp: bool = False,
+    current_user: User = None,
+    with_subscriptions: bool = False,
+) -> dict:
+    """
+    Merges the fields specific to the current user into a serialized post fragment
+    """
+
     # Permissions
     serialized_data["user_permission"] = post.user_permission
 
     # Annotate user's vote
-    serialized_data["vote"] = {
-        "score": post.vote_score,
-        "user_vote": post.user_vote,
-    }
-    # Forecasters
-    serialized_data["forecasts_count"] = post.forecasts_count
+    serialized_data["vote"]["user_vote"] = post.user_vote
+
+    # User forecasts
+    if with_cp and current_user:
+        serialized_questions = [
+            serialized_data.get("question"),
+            serialized_data.get("conditional", {}).get("question_yes"),
+            serialized_data.get("conditional", {}).get("question_no"),
+            *serialized_data.get("group_of_questions", {}).get("questions", []),
+        ]
+        serialized_questions_map = {q["id"]: q for q in serialized_questions if q}
+
+        for question in post.get_questions():
+            if (
+                hasattr(question, "request_user_forecasts")
+                and question.id in serialized_questions_map
+            ):
+                serialized_questions_map[question.id]["my_forecasts"] = (
+                    serialize_question_my_forecasts(question)
+                )
 
     # Subscriptions
     if with_subscriptions and current_user:
@@ -404,35 +503,141 @@ def serialize_post(
     return serialized_data
 
 
+def serialize_post(
+    post: Post,
+    with_cp: bool = False,
+    current_user: User = None,
+    with_subscriptions: bool = False,
+    aggregate_forecasts: dict[Question, AggregateForecast] = None,
+    aggregation_sparklines: dict[Question, dict[str, dict]] = None,
+) -> dict:
+    current_user = (
+        current_user if current_user and not current_user.is_anonymous else None
+    )
+    serialized_data = serialize_post_fragment(
+        post,
+        with_cp=with_cp,
+        aggregate_forecasts=aggregate_forecasts,
+        aggregation_sparklines=aggregation_sparklines,
+    )
+
+    return serialize_post_user_fields(
+        post,
+        serialized_data,
+        with_cp=with_cp,
+        current_user=current_user,
+        with_subscriptions=with_subscriptions,
+    )
+
+
+def serialize_post_fragments(
+    posts: list[Post],
+    with_cp: bool = False,
+    group_cutoff: int = None,
+    cp_sparkline: bool = False,
+) -> dict[int, dict]:
+    """
+    Returns the user-independent fragments of the posts,
+    which must be fetched with `PostQuerySet.prefetch_questions`.
+    Fragments are cached under the cache version of their post,
+    only the missing ones are serialized
+    """
+
+    variant = f"{int(bool(with_cp))}:{group_cutoff}:{int(bool(cp_sparkline))}"
+    versions = get_post_cache_versions(post.pk for post in posts)
+    keys = {
+        post.pk: get_post_fragment_key(post.pk, versions[post.pk], variant)
+        for post in posts
+    }
+    cached = cache.get_many(keys.values())
+    fragments = {post_id: cached[key] for post_id, key in keys.items() if key in cached}
+
+    if len(fragments) == len(keys):
+        return fragments
+
+    # Posts are already fetched with their questions,
+    # only the relations of the fragments are prefetched
+    missing = [post for post in posts if post.pk not in fragments]
+    prefetch_related_objects(
+        missing,
+        "projects",
+        "default_project",
+        "author",
+        "notebook",
+        "coauthors",
+        *get_condition_post_prefetches(),
+        *(get_questions_scores_prefetches() if with_cp else []),
+    )
+
+    questions_post_ids = {
+        question.pk: post.pk for post in missing for question in post.get_questions()
+    }
+    aggregate_forecasts = {}
+    aggregation_sparklines = None
+
+    if with_cp:
+        questions = flatten([p.get_questions() for p in missing])
+
+        if cp_sparkline:
+            aggregate_forecasts = get_latest_aggregated_forecasts_for_questions(
+                questions, group_cutoff=group_cutoff
+            )
+            aggregation_sparklines = get_aggregation_sparklines_for_questions(
+                aggregate_forecasts.keys()
+            )
+        else:
+            aggregate_forecasts = get_aggregated_forecasts_for_questions(
+                questions, group_cutoff=group_cutoff
+            )
+
+    # Aggregations grouped by post in a single pass
+    posts_aggregate_forecasts = defaultdict(dict)
+    for question, forecasts in aggregate_forecasts.items():
+        posts_aggregate_forecasts[questions_post_ids[question.pk]][question] = forecasts
+
+    for post in missing:
+        fragment = serialize_post_fragment(
+            post,
+            with_cp=with_cp,
+            aggregate_forecasts=posts_aggregate_forecasts[post.pk],
+            aggregation_sparklines=aggregation_sparklines,
+        )
+        cache.set(keys[post.pk], fragment, timeout=get_post_fragment_timeout(post))
+        fragments[post.pk] = fragment
+
+    return fragments
+
+
 def serialize_post_many(
     posts: Union[Post.objects, list[Post], list[int]],
     with_cp: bool = False,
     current_user: User = None,
     with_subscriptions: bool = False,
     group_cutoff: int = None,
+    cp_sparkline: bool = False,
 ) -> list[dict]:
+    """
+    With cp_sparkline, questions come with the latest aggregations and a
+    downsampled history of their centers instead of the full history
+    """
     current_user = (
         current_user if current_user and not current_user.is_anonymous else None
     )
     ids = [p.pk if isinstance(p, Post) else p for p in posts]
     qs = Post.objects.filter(pk__in=ids)
 
+    # Only the user-specific data is fetched here,
+    # see `serialize_post_fragments` for the rest
     qs = (
         qs.annotate_user_permission(user=current_user)
-        .prefetch_projects()
-        .prefetch_questions()
-        .prefetch_condition_post()
-        .select_related("author", "notebook")
-        .prefetch_related("coauthors")
+        # Already joined to filter by permission
+        .select_related("default_project").prefetch_questions()
     )
     if current_user:
         qs = qs.annotate_user_vote(current_user)
 
-    if with_cp:
-        qs = qs.prefetch_questions_scores()
-
-        if current_user:
-            qs = qs.prefetch_user_forecasts(current_user.id)
+    if with_cp and current_user:
+        qs = qs.prefetch_user_forecasts(current_user.id)
 
     if with_subscriptions and current_user:
         qs = qs.prefetch_user_subscriptions(user=current_user)
@@ -441,27 +646,20 @@ def serialize_post_many(
         qs = qs.prefetch_user_snapshots(current_user)
 
     # Restore the original ordering
-    objects = list(qs.all())
-    objects.sort(key=lambda obj: ids.index(obj.id))
+    ids_order = {post_id: index for index, post_id in enumerate(ids)}
+    objects = sorted(qs.all(), key=lambda obj: ids_order[obj.id])
 
-    aggregate_forecasts = {}
-
-    if with_cp:
-        aggregate_forecasts = get_aggregated_forecasts_for_questions(
-            flatten([p.get_questions() for p in objects]), group_cutoff=group_cutoff
-        )
+    fragments = serialize_post_fragments(
+        objects, with_cp=with_cp, group_cutoff=group_cutoff, cp_sparkline=cp_sparkline
+    )
 
     return [
-        serialize_post(
+        serialize_post_user_fields(
             post,
+            fragments[post.pk],
             with_cp=with_cp,
             current_user=current_user,
             with_subscriptions=with_subscriptions,
-            aggregate_forecasts={
-                q: v
-                for q, v in aggregate_forecasts.items()
-                if q in post.get_questions()
-            },
         )
         for post in objects
     ]
@@ -0,0 +1,74 @@
+import time
+from collections.abc import Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+
+# 10m, renames of authors and coauthors don't invalidate fragments
+POST_FRAGMENT_TIMEOUT = 60 * 10
+# 1d, versions must outlive the fragments they key
+POST_CACHE_VERSION_TIMEOUT = 3600 * 24
+
+
+def get_post_cache_version_key(post_id: int) -> str:
+    return f"post_cache_version:{post_id}"
+
+
+def get_post_fragment_key(post_id: int, version: int, variant: str) -> str:
+    return f"post_fragment:{post_id}:{version}:{variant}"
+
+
+def get_post_cache_versions(post_ids: Iterable[int]) -> dict[int, int]:
+    """
+    Returns the cache version of each post.
+    Missing versions are initialised with the current time, so a version
+    evicted from the cache never points back to a stale fragment
+    """
+
+    keys = {post_id: get_post_cache_version_key(post_id) for post_id in post_ids}
+    cached = cache.get_many(keys.values())
+    versions = {post_id: cached[key] for post_id, key in keys.items() if key in cached}
+
+    for post_id in keys.keys() - versions.keys():
+        version = time.time_ns()
+        # Another request might have initialised it in the meantime
+        if not cache.add(keys[post_id], version, timeout=POST_CACHE_VERSION_TIMEOUT):
+            version = cache.get(keys[post_id], version)
+        versions[post_id] = version
+
+    return versions
+
+
+def _incr_post_cache_versions(post_ids: list[int]):
+    for post_id in post_ids:
+        key = get_post_cache_version_key(post_id)
+
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Not initialised yet, no fragment can be cached under it
+            cache.set(key, time.time_ns(), timeout=POST_CACHE_VERSION_TIMEOUT)
+
+
+def bump_post_cache_versions(post_ids: Iterable[int]):
+    """
+    Invalidates the cached fragments of the posts.
+    Inside of a transaction, versions are bumped again on commit,
+    so fragments built from the data read before the commit are dropped too
+    """
+
+    post_ids = [post_id for post_id in post_ids if post_id]
+    _incr_post_cache_versions(post_ids)
+
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _incr_post_cache_versions(post_ids))
+
+
+def bump_question_posts_cache_versions(question_ids: Iterable[int]):
+    from questions.models import QuestionPost
+
+    bump_post_cache_versions(
+        QuestionPost.objects.filter(question_id__in=question_ids)
+        .values_list("post_id", flat=True)
+        .distinct()
+    )
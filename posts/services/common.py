@@ -1,5 +1,5 @@
 import logging
-from datetime import timedelta, date
+from datetime import datetime, timedelta, date
 
 from django.db.models import Q, Count, Sum, Value, Case, When, F
 from django.db.models.functions import Coalesce
@@ -12,22 +12,22 @@ from projects.models import Project
 from projects.permissions import ObjectPermission
 from projects.services import (
     notify_project_subscriptions_post_open,
+    get_projects_visibility,
     get_site_main_project,
 )
-from questions.models import Question
+from questions.models import AggregateForecast, Question
 from questions.services import (
     create_question,
     create_conditional,
+    get_aggregations_at_time_for_questions,
     create_group_of_questions,
     update_question,
     update_conditional,
     update_group_of_questions,
     update_notebook,
 )
-from questions.types import AggregationMethod
 from users.models import User
 from utils.models import model_update
-from utils.the_math.aggregations import get_aggregations_at_time
 from utils.the_math.measures import prediction_difference_for_sorting
 from .subscriptions import notify_post_status_change
 from ..tasks import run_notify_post_status_change
@@ -195,30 +195,46 @@ def get_post_permission_for_user(post: Post, user: User = None) -> ObjectPermiss
     A small wrapper to get the permission of post
     """
 
-    perm = (
-        Post.objects.annotate_user_permission(user=user)
-        .values_list("user_permission", flat=True)
-        .filter(id=post.id)
-        .first()
+    return get_projects_visibility(user).get_post_permission(post)
+
+
+def get_movement_aggregations(
+    questions: list[Question], time: datetime
+) -> tuple[dict[Question, AggregateForecast], dict[Question, AggregateForecast]]:
+    """
+    Returns the CP of each question at the given time and one week earlier
+    """
+
+    return (
+        get_aggregations_at_time_for_questions(questions, time),
+        get_aggregations_at_time_for_questions(questions, time - timedelta(days=7)),
     )
-    return perm
 
 
-def compute_movement(post: Post) -> float | None:
+def compute_movement(
+    post: Post,
+    aggregations: (
+        tuple[dict[Question, AggregateForecast], dict[Question, AggregateForecast]]
+        | None
+    ) = None,
+) -> float | None:
+    """
+    @param aggregations: precomputed result of get_movement_aggregations
+        for a batch of posts containing this one
+    """
+
     questions = post.get_questions()
+    cps_now, cps_previous = aggregations or get_movement_aggregations(
+        questions, timezone.now()
+    )
     movement = None
-    now = timezone.now()
     for question in questions:
-        cp_now = get_aggregations_at_time(
-            question, now, [AggregationMethod.RECENCY_WEIGHTED]
-        ).get(AggregationMethod.RECENCY_WEIGHTED)
+        cp_now = cps_now.get(question)
 
         if cp_now is None:
             continue
 
-        cp_previous = get_aggregations_at_time(
-            question, now - timedelta(days=7), [AggregationMethod.RECENCY_WEIGHTED]
-        ).get(AggregationMethod.RECENCY_WEIGHTED)
+        cp_previous = cps_previous.get(question)
 
         if cp_previous is None:
             continue
@@ -238,10 +254,9 @@ def compute_sorting_divergence(post: Post) -> dict[int, float]:
     user_divergences = dict()
     questions = post.get_questions()
     now = timezone.now()
+    cps = get_aggregations_at_time_for_questions(questions, now)
     for question in questions:
-        cp = get_aggregations_at_time(
-            question, now, [AggregationMethod.RECENCY_WEIGHTED]
-        ).get(AggregationMethod.RECENCY_WEIGHTED, None)
+        cp = cps.get(question)
         if cp is None:
             continue
 
@@ -359,9 +374,18 @@ def approve_post(post: Post, open_time: date, cp_reveal_time: date):
     for question in questions:
         question.open_time = open_time
         question.cp_reveal_time = cp_reveal_time
+        question.update_global_leaderboard_window()
 
     post.save()
-    Question.objects.bulk_update(questions, fields=["open_time", "cp_reveal_time"])
+    Question.objects.bulk_update(
+        questions,
+        fields=[
+            "open_time",
+            "cp_reveal_time",
+            "global_leaderboard_start_time",
+            "global_leaderboard_end_time",
+        ],
+    )
 
 
 def submit_for_review_post(post: Post):
@@ -70,6 +70,10 @@ def posts_list_api_view(request):
     with_cp = serializers.BooleanField(allow_null=True).run_validation(
         request.query_params.get("with_cp")
     )
+    # latest aggregations and sparklines instead of the full CP history
+    cp_sparkline = serializers.BooleanField(allow_null=True).run_validation(
+        request.query_params.get("cp_sparkline")
+    )
     group_cutoff = (
         serializers.IntegerField(
             allow_null=True, default=3, max_value=3, min_value=0
@@ -87,9 +91,10 @@ def posts_list_api_view(request):
 
     data = serialize_post_many(
         posts,
-        with_cp=with_cp,
+        with_cp=bool(with_cp),
         current_user=request.user,
         group_cutoff=group_cutoff,
+        cp_sparkline=bool(cp_sparkline),
     )
 
     return paginator.get_paginated_response(data)
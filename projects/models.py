@@ -4,6 +4,8 @@ from django.db import models
 from django.db.models import Count, FilteredRelation, Q, F
 from django.db.models.functions import Coalesce
 from django.db.models.query import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from django.utils import timezone as django_timezone
 from sql_util.aggregates import SubqueryAggregate
 
@@ -265,6 +267,37 @@ class Project(TimeStampedModel):
         return self._get_users_for_permissions([ObjectPermission.CURATOR])
 
 
+class ProjectUserPermissionQuerySet(models.QuerySet):
+    """
+    Bulk operations don't send the signals the cached permissions
+    of the users rely on, so they drop the cache of all users
+    """
+
+    def update(self, **kwargs):
+        from projects.services import invalidate_user_projects_permissions
+
+        result = super().update(**kwargs)
+        invalidate_user_projects_permissions()
+
+        return result
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from projects.services import invalidate_user_projects_permissions
+
+        result = super().bulk_create(objs, *args, **kwargs)
+        invalidate_user_projects_permissions()
+
+        return result
+
+    def bulk_update(self, objs, *args, **kwargs):
+        from projects.services import invalidate_user_projects_permissions
+
+        result = super().bulk_update(objs, *args, **kwargs)
+        invalidate_user_projects_permissions()
+
+        return result
+
+
 class ProjectUserPermission(TimeStampedModel):
     """
     Table to override permissions for specific users
@@ -282,6 +315,8 @@ class ProjectUserPermission(TimeStampedModel):
             ),
         ]
 
+    objects = models.Manager.from_queryset(ProjectUserPermissionQuerySet)()
+
 
 class ProjectSubscription(TimeStampedModel):
     user = models.ForeignKey(
@@ -298,3 +333,49 @@ class ProjectSubscription(TimeStampedModel):
                 fields=["user_id", "project_id"],
             )
         ]
+
+
+# Signals are also sent for cascades and queryset deletes
+@receiver(post_save, sender=ProjectUserPermission)
+@receiver(post_delete, sender=ProjectUserPermission)
+def invalidate_project_user_permission(instance: ProjectUserPermission, **kwargs):
+    from projects.services import invalidate_user_projects_permissions
+
+    invalidate_user_projects_permissions([instance.user_id])
+
+
+@receiver(post_delete, sender=Project)
+def invalidate_deleted_project(instance: Project, **kwargs):
+    from projects.services import invalidate_site_main_project_id
+
+    if instance.type == Project.ProjectTypes.SITE_MAIN:
+        invalidate_site_main_project_id()
+
+
+@receiver(pre_save, sender=Project)
+def track_project_visibility(instance: Project, **kwargs):
+    instance._visibility_changed = bool(instance.pk) and (
+        Project.objects.filter(
+            pk=instance.pk, default_permission__isnull=False
+        ).exists()
+        != (instance.default_permission is not None)
+    )
+
+
+@receiver(post_save, sender=Project)
+def invalidate_project_profile_stats(instance: Project, **kwargs):
+    from questions.models import Question
+    from users.services import invalidate_profile_stats
+
+    if not instance._visibility_changed:
+        return
+
+    # Questions of the project were made public or private
+    invalidate_profile_stats(
+        Question.objects.filter(
+            Q(post__default_project=instance)
+            | Q(group__post__default_project=instance)
+            | Q(conditional_yes__post__default_project=instance)
+            | Q(conditional_no__post__default_project=instance)
+        )
+    )
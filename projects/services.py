@@ -1,5 +1,9 @@
-from django.db import IntegrityError
-from django.db.models import Q
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
 
 from notifications.constants import MailingTags
 from notifications.services import (
@@ -56,6 +60,239 @@ def get_site_main_project():
     return obj
 
 
+# 1h
+SITE_MAIN_PROJECT_ID_TIMEOUT = 3600
+# 1h, in case ProjectUserPermissions are changed without signals (raw SQL)
+USER_PROJECTS_PERMISSIONS_TIMEOUT = 3600
+SITE_MAIN_PROJECT_ID_KEY = "site_main_project_id"
+
+
+def get_user_projects_permissions_key(user_id: int | str) -> str:
+    return f"user_projects_permissions:{user_id}"
+
+
+@dataclass
+class ProjectsVisibility:
+    """
+    Permissions of a user in the projects: the default permission of the project,
+    overridden by the ProjectUserPermissions of the user.
+    Default permissions are read from the `default_project` of the posts,
+    only the overrides of the user are given as `default_project_id IN (...)`
+    """
+
+    user_id: int | None
+    site_main_project_id: int
+    # project_id -> permission
+    overrides: dict[int, ObjectPermission]
+
+    def get_override_ids(
+        self, permissions: Iterable[ObjectPermission] = None
+    ) -> list[int]:
+        if permissions is None:
+            return list(self.overrides)
+
+        return [
+            project_id
+            for project_id, permission in self.overrides.items()
+            if permission in permissions
+        ]
+
+    def get_project_permission_filter(
+        self, permissions: Iterable[ObjectPermission] = None
+    ) -> Q:
+        """
+        Filters the posts whose default project grants one of the given
+        permissions to the user, any permission if not given
+        """
+
+        default_q = (
+            Q(default_project__default_permission__isnull=False)
+            if permissions is None
+            else Q(default_project__default_permission__in=permissions)
+        )
+
+        return Q(default_project_id__in=self.get_override_ids(permissions)) | (
+            default_q & ~Q(default_project_id__in=self.get_override_ids())
+        )
+
+    def get_project_permission_annotation(self) -> models.Case:
+        """
+        Permission of the user in the default project of the posts
+        """
+
+        return models.Case(
+            *[
+                models.When(
+                    default_project_id__in=self.get_override_ids([permission]),
+                    then=models.Value(permission),
+                )
+                for permission in sorted(set(self.overrides.values()))
+            ],
+            default=F("default_project__default_permission"),
+            output_field=models.CharField(),
+        )
+
+    def get_posts_filter(self, permissions: list[ObjectPermission] = None) -> Q:
+        """
+        Filters the posts the user can see with one of the given permissions,
+        the equivalent of `PostQuerySet.annotate_user_permission`
+        """
+
+        curated_permissions = [ObjectPermission.ADMIN, ObjectPermission.CURATOR]
+        project_q = self.get_project_permission_filter(permissions)
+
+        # Admin/Curator permissions take precedence over the Creator one
+        author_q = Q(author_id=self.user_id)
+        if permissions is not None:
+            excluded_permissions = set(curated_permissions).difference(permissions)
+            if excluded_permissions:
+                author_q &= ~self.get_project_permission_filter(excluded_permissions)
+
+        # Admins/Curators see pending posts
+        pending_q = Q(default_project_id=self.site_main_project_id) & project_q
+        if permissions is None or set(curated_permissions) & set(permissions):
+            pending_q |= self.get_project_permission_filter(
+                set(curated_permissions)
+                if permissions is None
+                else set(curated_permissions) & set(permissions)
+            )
+
+        return (
+            author_q
+            | Q(pending_q, curation_status=Post.CurationStatus.PENDING)
+            | Q(project_q, curation_status=Post.CurationStatus.APPROVED)
+        )
+
+    def get_permission_annotation(self) -> models.Case:
+        """
+        Annotates the permission of the user for posts filtered by `get_posts_filter`
+        """
+
+        project_permission = self.get_project_permission_annotation()
+
+        return models.Case(
+            # Admin/Curator is more important than Creator
+            models.When(
+                self.get_project_permission_filter(
+                    [ObjectPermission.ADMIN, ObjectPermission.CURATOR]
+                ),
+                then=project_permission,
+            ),
+            models.When(
+                author_id=self.user_id,
+                then=models.Value(ObjectPermission.CREATOR),
+            ),
+            default=project_permission,
+            output_field=models.CharField(),
+        )
+
+    def get_post_permission(self, post: Post) -> ObjectPermission | None:
+        """
+        Permission of the user for the post, None if they can't see it
+        """
+
+        default_permission = (
+            post.default_project.default_permission if post.default_project_id else None
+        )
+        permission = self.overrides.get(post.default_project_id, default_permission)
+        is_curator = permission in [ObjectPermission.ADMIN, ObjectPermission.CURATOR]
+        is_author = post.author_id == self.user_id
+
+        if not (
+            is_author
+            or (
+                post.curation_status == Post.CurationStatus.PENDING
+                and (
+                    is_curator
+                    or (
+                        permission
+                        and post.default_project_id == self.site_main_project_id
+                    )
+                )
+            )
+            or (post.curation_status == Post.CurationStatus.APPROVED and permission)
+        ):
+            return None
+
+        if is_curator:
+            return permission
+
+        if is_author:
+            return ObjectPermission.CREATOR
+
+        return permission
+
+
+def get_projects_visibility(user: User = None) -> ProjectsVisibility:
+    """
+    Returns the ProjectsVisibility of the user.
+    The ProjectUserPermissions of the user are cached,
+    so posts can be filtered by permission without joining them
+    """
+
+    site_main_project_id = cache.get(SITE_MAIN_PROJECT_ID_KEY)
+
+    if site_main_project_id is None:
+        site_main_project_id = get_site_main_project().pk
+        cache.set(
+            SITE_MAIN_PROJECT_ID_KEY,
+            site_main_project_id,
+            timeout=SITE_MAIN_PROJECT_ID_TIMEOUT,
+        )
+
+    user_id = user.id if user else None
+    overrides = {}
+
+    if user_id:
+        key = get_user_projects_permissions_key(user_id)
+        overrides = cache.get(key)
+
+        if overrides is None:
+            overrides = dict(
+                ProjectUserPermission.objects.filter(user_id=user_id).values_list(
+                    "project_id", "permission"
+                )
+            )
+            cache.set(key, overrides, timeout=USER_PROJECTS_PERMISSIONS_TIMEOUT)
+
+    return ProjectsVisibility(
+        user_id=user_id,
+        site_main_project_id=site_main_project_id,
+        overrides=overrides,
+    )
+
+
+def _on_commit_too(f: callable):
+    """
+    Runs f now and once the current transaction is committed,
+    so concurrent requests can't cache the data read before the commit
+    """
+
+    f()
+
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(f)
+
+
+def invalidate_site_main_project_id():
+    _on_commit_too(lambda: cache.delete(SITE_MAIN_PROJECT_ID_KEY))
+
+
+def invalidate_user_projects_permissions(user_ids: Iterable[int] = None):
+    """
+    Drops the cached ProjectUserPermissions of the users, of all users if not given
+    """
+
+    if user_ids is None:
+        _on_commit_too(
+            lambda: cache.delete_pattern(get_user_projects_permissions_key("*"))
+        )
+        return
+
+    keys = [get_user_projects_permissions_key(user_id) for user_id in user_ids]
+    _on_commit_too(lambda: cache.delete_many(keys))
+
+
 def create_private_user_project(user: User):
     """
     All private user projects are created under the "Personal List" project type
@@ -23,7 +23,7 @@ class Command(BaseCommand):
         for question in qs.iterator(chunk_size=100):
 
             try:
-                run_build_question_forecasts(question.id)
+                run_build_question_forecasts(question.id, full_rebuild=True)
             except Exception:
                 logger.exception(
                     "Failed to generate forecast for question %s", question.id
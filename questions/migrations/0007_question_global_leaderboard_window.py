@@ -0,0 +1,60 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+from scoring.models import get_global_leaderboard_window
+
+
+def populate_global_leaderboard_windows(apps, schema_editor):
+    Question = apps.get_model("questions", "Question")
+
+    questions = []
+    for question in Question.objects.only(
+        "open_time", "scheduled_close_time", "resolution_set_time"
+    ).iterator(chunk_size=2000):
+        window = get_global_leaderboard_window(
+            question.open_time,
+            question.scheduled_close_time,
+            question.resolution_set_time,
+        )
+        if not window or not window[0]:
+            continue
+        question.global_leaderboard_start_time = window[0]
+        question.global_leaderboard_end_time = window[1]
+        questions.append(question)
+
+    Question.objects.bulk_update(
+        questions,
+        ["global_leaderboard_start_time", "global_leaderboard_end_time"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0006_alter_aggregateforecast_centers_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="global_leaderboard_end_time",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="global_leaderboard_start_time",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["global_leaderboard_start_time", "global_leaderboard_end_time"],
+                name="questions_q_global__800409_idx",
+            ),
+        ),
+        migrations.RunPython(
+            populate_global_leaderboard_windows, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,128 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:17
+
+import django.db.models.deletion
+import django_better_admin_arrayfield.models.fields
+from django.db import migrations, models
+
+
+def populate_latest_aggregates(apps, schema_editor):
+    AggregateForecast = apps.get_model("questions", "AggregateForecast")
+    QuestionLatestAggregate = apps.get_model("questions", "QuestionLatestAggregate")
+    fields = [
+        "start_time",
+        "end_time",
+        "forecast_values",
+        "forecaster_count",
+        "interval_lower_bounds",
+        "centers",
+        "interval_upper_bounds",
+        "means",
+        "histogram",
+    ]
+
+    latest_aggregates = []
+    for aggregate in (
+        AggregateForecast.objects.order_by("question_id", "method", "-start_time")
+        .distinct("question_id", "method")
+        .iterator(chunk_size=2000)
+    ):
+        latest_aggregates.append(
+            QuestionLatestAggregate(
+                question_id=aggregate.question_id,
+                method=aggregate.method,
+                **{field: getattr(aggregate, field) for field in fields},
+            )
+        )
+
+    QuestionLatestAggregate.objects.bulk_create(latest_aggregates, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("questions", "0007_question_global_leaderboard_window"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuestionLatestAggregate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "method",
+                    models.CharField(
+                        choices=[
+                            ("recency_weighted", "Recency Weighted"),
+                            ("unweighted", "Unweighted"),
+                            ("single_aggregation", "Single Aggregation"),
+                            ("metaculus_prediction", "Metaculus Prediction"),
+                        ],
+                        max_length=200,
+                    ),
+                ),
+                ("start_time", models.DateTimeField()),
+                ("end_time", models.DateTimeField(null=True)),
+                (
+                    "forecast_values",
+                    django_better_admin_arrayfield.models.fields.ArrayField(
+                        base_field=models.FloatField(), max_length=201, size=None
+                    ),
+                ),
+                ("forecaster_count", models.IntegerField(null=True)),
+                (
+                    "interval_lower_bounds",
+                    django_better_admin_arrayfield.models.fields.ArrayField(
+                        base_field=models.FloatField(), null=True, size=None
+                    ),
+                ),
+                (
+                    "centers",
+                    django_better_admin_arrayfield.models.fields.ArrayField(
+                        base_field=models.FloatField(), null=True, size=None
+                    ),
+                ),
+                (
+                    "interval_upper_bounds",
+                    django_better_admin_arrayfield.models.fields.ArrayField(
+                        base_field=models.FloatField(), null=True, size=None
+                    ),
+                ),
+                (
+                    "means",
+                    django_better_admin_arrayfield.models.fields.ArrayField(
+                        base_field=models.FloatField(), null=True, size=None
+                    ),
+                ),
+                (
+                    "histogram",
+                    django_better_admin_arrayfield.models.fields.ArrayField(
+                        base_field=models.FloatField(), null=True, size=100
+                    ),
+                ),
+                (
+                    "question",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="latest_aggregates",
+                        to="questions.question",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="questionlatestaggregate",
+            constraint=models.UniqueConstraint(
+                fields=("question_id", "method"),
+                name="questionlatestaggregate_unique_question_method",
+            ),
+        ),
+        migrations.RunPython(populate_latest_aggregates, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,21 @@
-from datetime import datetime, timedelta
-from typing import TYPE_CHECKING
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable
 
+import numpy as np
 from django_better_admin_arrayfield.models.fields import ArrayField
 from django.db import models
 from django.db.models import Count, Q
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
 from django.utils import timezone
 from sql_util.aggregates import SubqueryAggregate
 
+from posts.services.cache import bump_question_posts_cache_versions
 from questions.constants import QuestionStatus
 from questions.types import AggregationMethod
 from users.models import User
 from utils.models import TimeStampedModel
+from utils.the_math.formulas import cdf_to_pmf
 from utils.the_math.measures import percent_point_function
 
 if TYPE_CHECKING:
@@ -98,6 +103,14 @@ class Question(TimeStampedModel):
     resolution_set_time = models.DateTimeField(db_index=True, null=True, blank=True)
     actual_close_time = models.DateTimeField(db_index=True, null=True, blank=True)
     cp_reveal_time = models.DateTimeField(null=True, blank=True)
+    # the global leaderboard the question counts for,
+    # see update_global_leaderboard_window
+    global_leaderboard_start_time = models.DateTimeField(
+        null=True, blank=True, editable=False
+    )
+    global_leaderboard_end_time = models.DateTimeField(
+        null=True, blank=True, editable=False
+    )
 
     # continuous range fields
     range_max = models.FloatField(null=True, blank=True)
@@ -122,9 +135,30 @@ class Question(TimeStampedModel):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["global_leaderboard_start_time", "global_leaderboard_end_time"]
+            ),
+        ]
+
     def __str__(self):
         return f"{self.type} {self.title}"
 
+    def save(self, **kwargs):
+        self.update_global_leaderboard_window()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {
+                "global_leaderboard_start_time",
+                "global_leaderboard_end_time",
+            }
+
+        super().save(**kwargs)
+
+        # Drop the cached serialized fragments of the posts of the question
+        bump_question_posts_cache_versions([self.pk])
+
     def get_post(self) -> "Post | None":
         posts = [x.post for x in self.related_posts.all()]
 
@@ -158,36 +192,21 @@ class Question(TimeStampedModel):
 
     def get_global_leaderboard_dates(self) -> tuple[datetime, datetime] | None:
         # returns the global leaderboard dates that this question counts for
-        from scoring.models import global_leaderboard_dates
-
-        forecast_horizon_start = self.open_time
-        forecast_horizon_end = self.scheduled_close_time
-        if forecast_horizon_start is None or forecast_horizon_end is None:
-            return (None, None)
-        global_leaderboard_dates = global_leaderboard_dates()
-
-        # iterate over the global leaderboard dates in reverse order
-        # to find the shortest interval that this question counts for
-        shortest_window = (None, None)
-        for gl_start, gl_end in global_leaderboard_dates[::-1]:
-            if forecast_horizon_start < gl_start or gl_end < forecast_horizon_start:
-                continue
-            if forecast_horizon_end > gl_end + timedelta(days=3):
-                continue
-            if (
-                self.resolution_set_time
-                and self.resolution_set_time > gl_end + timedelta(days=100)
-            ):
-                # we allow for a 100 day buffer after the global leaderboard closes
-                # for questions to be resolved
-                continue
-            if shortest_window[0] is None:
-                shortest_window = (gl_start, gl_end)
-            if gl_end - gl_start < shortest_window[1] - shortest_window[0]:
-                shortest_window = (gl_start, gl_end)
-        if shortest_window[0]:
-            return shortest_window
-        return None
+        from scoring.models import get_global_leaderboard_window
+
+        return get_global_leaderboard_window(
+            self.open_time, self.scheduled_close_time, self.resolution_set_time
+        )
+
+    def update_global_leaderboard_window(self):
+        """
+        Stores the global leaderboard dates of the question, so global
+        leaderboards can filter their questions in SQL.
+        Called on save, it has to be called before bulk updates of the
+        open, close or resolution times.
+        """
+        window = self.get_global_leaderboard_dates() or (None, None)
+        self.global_leaderboard_start_time, self.global_leaderboard_end_time = window
 
 
 class Conditional(TimeStampedModel):
@@ -283,6 +302,9 @@ class Forecast(models.Model):
 
     slider_values = models.JSONField(null=True)
 
+    # cache of get_pmf
+    _pmf: np.ndarray | None = None
+
     class Meta:
         indexes = [
             models.Index(fields=["author", "question", "start_time"]),
@@ -307,17 +329,14 @@ class Forecast(models.Model):
             return self.probability_yes_per_category
         return self.continuous_cdf
 
-    def get_pmf(self) -> list[float]:
-        if self.probability_yes:
-            return [1 - self.probability_yes, self.probability_yes]
-        if self.probability_yes_per_category:
-            return self.probability_yes_per_category
-        cdf = self.continuous_cdf
-        pmf = [cdf[0]]
-        for i in range(1, len(cdf)):
-            pmf.append(cdf[i] - cdf[i - 1])
-        pmf.append(1 - cdf[-1])
-        return pmf
+    def get_pmf(self) -> np.ndarray:
+        """computed once per instance, the array must not be modified"""
+        if self._pmf is None:
+            values = np.array(self.get_prediction_values(), dtype=float)
+            if not self.probability_yes and not self.probability_yes_per_category:
+                values = cdf_to_pmf(values)
+            self._pmf = values
+        return self._pmf
 
     def save(self, **kwargs):
         if not self.post:
@@ -344,6 +363,9 @@ class AggregateForecast(models.Model):
     means = ArrayField(models.FloatField(), null=True)
     histogram = ArrayField(models.FloatField(), null=True, size=100)
 
+    # cache of get_pmf
+    _pmf: np.ndarray | None = None
+
     class Meta:
         indexes = [
             models.Index(fields=["question", "start_time"]),
@@ -366,20 +388,104 @@ class AggregateForecast(models.Model):
         if len(self.forecast_values) == CDF_SIZE:
             return self.forecast_values
 
-    def get_pmf(self) -> list[float]:
-        if len(self.forecast_values) == CDF_SIZE:
-            cdf = self.forecast_values
-            pmf = [cdf[0]]
-            for i in range(1, len(cdf)):
-                pmf.append(cdf[i] - cdf[i - 1])
-            pmf.append(1 - cdf[-1])
-            return pmf
-        return self.forecast_values
+    def get_pmf(self) -> np.ndarray:
+        """computed once per instance, the array must not be modified"""
+        if self._pmf is None:
+            values = np.array(self.forecast_values, dtype=float)
+            if len(values) == CDF_SIZE:
+                values = cdf_to_pmf(values)
+            self._pmf = values
+        return self._pmf
 
     def get_prediction_values(self) -> list[float]:
         return self.forecast_values
 
 
+class QuestionLatestAggregate(models.Model):
+    """
+    Copy of the latest AggregateForecast of each question and method, upserted
+    by build_question_forecasts, so the current aggregations of many questions
+    are read without scanning their history
+    """
+
+    question = models.ForeignKey(
+        Question, models.CASCADE, related_name="latest_aggregates"
+    )
+    method = models.CharField(max_length=200, choices=AggregationMethod.choices)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField(null=True)
+    forecast_values = ArrayField(models.FloatField(), max_length=CDF_SIZE)
+    forecaster_count = models.IntegerField(null=True)
+    interval_lower_bounds = ArrayField(models.FloatField(), null=True)
+    centers = ArrayField(models.FloatField(), null=True)
+    interval_upper_bounds = ArrayField(models.FloatField(), null=True)
+    means = ArrayField(models.FloatField(), null=True)
+    histogram = ArrayField(models.FloatField(), null=True, size=100)
+
+    # fields copied from the AggregateForecast
+    AGGREGATE_FIELDS = [
+        "start_time",
+        "end_time",
+        "forecast_values",
+        "forecaster_count",
+        "interval_lower_bounds",
+        "centers",
+        "interval_upper_bounds",
+        "means",
+        "histogram",
+    ]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name="questionlatestaggregate_unique_question_method",
+                fields=["question_id", "method"],
+            )
+        ]
+
+    @classmethod
+    def from_aggregate_forecast(
+        cls, aggregate_forecast: AggregateForecast
+    ) -> "QuestionLatestAggregate":
+        return cls(
+            question_id=aggregate_forecast.question_id,
+            method=aggregate_forecast.method,
+            **{
+                field: getattr(aggregate_forecast, field)
+                for field in cls.AGGREGATE_FIELDS
+            },
+        )
+
+    def to_aggregate_forecast(self) -> AggregateForecast:
+        """unsaved AggregateForecast, as stored in the history"""
+        return AggregateForecast(
+            question_id=self.question_id,
+            method=self.method,
+            **{field: getattr(self, field) for field in self.AGGREGATE_FIELDS},
+        )
+
+
+def get_pmf_matrix(forecasts: Iterable[Forecast | AggregateForecast]) -> np.ndarray:
+    """
+    Returns the pmfs of forecasts on a single question as a (forecasts, buckets)
+    matrix. The pmfs that are not cached yet are computed together and cached
+    on their forecasts.
+    """
+    forecasts = list(forecasts)
+    if not forecasts:
+        return np.empty((0, 0))
+    missing = [forecast for forecast in forecasts if forecast._pmf is None]
+    if missing:
+        values = np.array(
+            [forecast.get_prediction_values() for forecast in missing], dtype=float
+        )
+        if values.shape[1] == CDF_SIZE:
+            values = cdf_to_pmf(values)
+        for forecast, pmf in zip(missing, values):
+            forecast._pmf = pmf
+    return np.array([forecast._pmf for forecast in forecasts])
+
+
 class QuestionPost(models.Model):
     """
     Postgres View of Post<>Question relations
@@ -395,3 +501,11 @@ class QuestionPost(models.Model):
     class Meta:
         managed = False
         db_table = "questions_question_post"
+
+
+@receiver(pre_delete, sender=Question)
+def invalidate_question_profile_stats(instance: Question, **kwargs):
+    from users.services import invalidate_profile_stats
+
+    # Before the forecasts and scores are deleted along with the question
+    invalidate_profile_stats(Question.objects.filter(pk=instance.pk))
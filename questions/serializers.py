@@ -413,6 +413,46 @@ class ForecastWriteSerializer(serializers.ModelSerializer):
         return data
 
 
+def serialize_question_my_forecasts(question: Question) -> dict:
+    """
+    Serializes the forecasts and scores of the request user,
+    prefetched with `PostQuerySet.prefetch_user_forecasts`
+    """
+
+    scores = question.user_scores
+    archived_scores = question.user_archived_scores
+    user_forecasts = question.request_user_forecasts
+    my_forecasts = {
+        "history": MyForecastSerializer(
+            user_forecasts,
+            context={"include_forecast_values": False},
+            many=True,
+        ).data,
+        "latest": (
+            MyForecastSerializer(
+                user_forecasts[-1],
+            ).data
+            if user_forecasts
+            else None
+        ),
+        "score_data": dict(),
+    }
+    for score in scores:
+        my_forecasts["score_data"][score.score_type + "_score"] = score.score
+        if score.score_type == "peer":
+            my_forecasts["score_data"]["coverage"] = score.coverage
+        if score.score_type == "relative_legacy":
+            my_forecasts["score_data"]["weighted_coverage"] = score.coverage
+    for score in archived_scores:
+        my_forecasts["score_data"][score.score_type + "_archived_score"] = score.score
+        if score.score_type == "peer":
+            my_forecasts["score_data"]["coverage"] = score.coverage
+        if score.score_type == "relative_legacy":
+            my_forecasts["score_data"]["weighted_coverage"] = score.coverage
+
+    return my_forecasts
+
+
 def serialize_question(
     question: Question,
     with_cp: bool = False,
@@ -420,9 +460,14 @@ def serialize_question(
     post: Post | None = None,
     aggregate_forecasts: list[AggregateForecast] = None,
     full_forecast_values: bool = False,
+    aggregation_sparklines: dict[str, dict] | None = None,
 ):
     """
     Serializes question object
+
+    When aggregation_sparklines (see get_aggregation_sparklines_for_questions)
+    are given, aggregate_forecasts are the latest ones of each method and the
+    sparklines are serialized instead of the history
     """
 
     serialized_data = QuestionSerializer(question).data
@@ -444,6 +489,8 @@ def serialize_question(
             and question.cp_reveal_time > django.utils.timezone.now()
         ):
             aggregate_forecasts = []
+            if aggregation_sparklines is not None:
+                aggregation_sparklines = {}
         elif aggregate_forecasts is None:
             aggregate_forecasts = question.aggregate_forecasts.all()
 
@@ -473,13 +520,14 @@ def serialize_question(
                     ]["weighted_coverage"] = score.coverage
 
         for method, forecasts in aggregate_forecasts_by_method.items():
-            serialized_data["aggregations"][method]["history"] = (
-                AggregateForecastSerializer(
-                    forecasts,
-                    many=True,
-                    context={"include_forecast_values": full_forecast_values},
-                ).data
-            )
+            if aggregation_sparklines is None:
+                serialized_data["aggregations"][method]["history"] = (
+                    AggregateForecastSerializer(
+                        forecasts,
+                        many=True,
+                        context={"include_forecast_values": full_forecast_values},
+                    ).data
+                )
             serialized_data["aggregations"][method]["latest"] = (
                 (
                     AggregateForecastSerializer(
@@ -491,53 +539,16 @@ def serialize_question(
                 else None
             )
 
+        for method, sparkline in (aggregation_sparklines or {}).items():
+            if method in serialized_data["aggregations"]:
+                serialized_data["aggregations"][method]["sparkline"] = sparkline
+
         if (
             current_user
             and not current_user.is_anonymous
             and hasattr(question, "request_user_forecasts")
         ):
-            scores = question.user_scores
-            archived_scores = question.user_archived_scores
-            user_forecasts = question.request_user_forecasts
-            serialized_data["my_forecasts"] = {
-                "history": MyForecastSerializer(
-                    user_forecasts,
-                    context={"include_forecast_values": False},
-                    many=True,
-                ).data,
-                "latest": (
-                    MyForecastSerializer(
-                        user_forecasts[-1],
-                    ).data
-                    if user_forecasts
-                    else None
-                ),
-                "score_data": dict(),
-            }
-            for score in scores:
-                serialized_data["my_forecasts"]["score_data"][
-                    score.score_type + "_score"
-                ] = score.score
-                if score.score_type == "peer":
-                    serialized_data["my_forecasts"]["score_data"][
-                        "coverage"
-                    ] = score.coverage
-                if score.score_type == "relative_legacy":
-                    serialized_data["my_forecasts"]["score_data"][
-                        "weighted_coverage"
-                    ] = score.coverage
-            for score in archived_scores:
-                serialized_data["my_forecasts"]["score_data"][
-                    score.score_type + "_archived_score"
-                ] = score.score
-                if score.score_type == "peer":
-                    serialized_data["my_forecasts"]["score_data"][
-                        "coverage"
-                    ] = score.coverage
-                if score.score_type == "relative_legacy":
-                    serialized_data["my_forecasts"]["score_data"][
-                        "weighted_coverage"
-                    ] = score.coverage
+            serialized_data["my_forecasts"] = serialize_question_my_forecasts(question)
 
     return serialized_data
 
@@ -548,6 +559,7 @@ def serialize_conditional(
     current_user: User = None,
     post: Post = None,
     aggregate_forecasts: dict[Question, AggregateForecast] = None,
+    aggregation_sparklines: dict[Question, dict[str, dict]] = None,
 ):
     # Serialization of basic data
     serialized_data = ConditionalSerializer(conditional).data
@@ -574,6 +586,11 @@ def serialize_conditional(
         current_user=current_user,
         post=post,
         aggregate_forecasts=question_yes_aggregate_forecasts,
+        aggregation_sparklines=(
+            aggregation_sparklines.get(conditional.question_yes, {})
+            if aggregation_sparklines is not None
+            else None
+        ),
     )
     question_no_aggregate_forecasts = (
         aggregate_forecasts.get(conditional.question_no) or []
@@ -586,6 +603,11 @@ def serialize_conditional(
         current_user=current_user,
         post=post,
         aggregate_forecasts=question_no_aggregate_forecasts,
+        aggregation_sparklines=(
+            aggregation_sparklines.get(conditional.question_no, {})
+            if aggregation_sparklines is not None
+            else None
+        ),
     )
 
     return serialized_data
@@ -597,6 +619,7 @@ def serialize_group(
     current_user: User = None,
     post: Post = None,
     aggregate_forecasts: dict[Question, AggregateForecast] = None,
+    aggregation_sparklines: dict[Question, dict[str, dict]] = None,
 ):
     # Serialization of basic data
     serialized_data = GroupOfQuestionsSerializer(group).data
@@ -615,6 +638,11 @@ def serialize_group(
                     if aggregate_forecasts
                     else None
                 ),
+                aggregation_sparklines=(
+                    aggregation_sparklines.get(question, {})
+                    if aggregation_sparklines is not None
+                    else None
+                ),
             )
         )
 
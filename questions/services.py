@@ -2,8 +2,10 @@ import logging
 from collections.abc import Iterable
 from datetime import datetime
 
+from django.core.cache import cache
 from django.db import transaction
-from django.db.models import QuerySet
+from django.db.models import Count, Q, F, IntegerField, Window
+from django.db.models.functions import Mod, RowNumber
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
@@ -12,7 +14,6 @@ from posts.models import PostUserSnapshot, PostSubscription, Notebook
 from posts.services.subscriptions import create_subscription_cp_change
 from posts.tasks import run_on_post_forecast
 from projects.permissions import ObjectPermission
-from projects.models import Project
 from questions.constants import ResolutionType
 from questions.models import (
     Question,
@@ -20,18 +21,29 @@ from questions.models import (
     Conditional,
     Forecast,
     AggregateForecast,
+    QuestionLatestAggregate,
 )
 from questions.types import AggregationMethod
-from scoring.models import Score, Leaderboard
-from scoring.utils import score_question, update_project_leaderboard
+from scoring.utils import (
+    get_resolution_score_types,
+    score_question,
+    update_leaderboards_from_question_scores,
+)
 from users.models import User
+from users.services import update_profile_stats_from_forecast
 from utils.dtypes import generate_map_from_list
 from utils.models import model_update
-from utils.the_math.aggregations import get_aggregation_history
+from utils.the_math.aggregations import (
+    get_aggregation_history,
+    get_aggregations_at_time,
+)
 from utils.the_math.measures import percent_point_function
 
 logger = logging.getLogger(__name__)
 
+# number of points of the aggregation sparklines shown in feeds
+SPARKLINE_SIZE = 20
+
 
 def get_forecast_initial_dict(question: Question) -> dict:
     data = {
@@ -59,14 +71,137 @@ def get_forecast_initial_dict(question: Question) -> dict:
     return data
 
 
+# Number of incremental builds after which the history is rebuilt from scratch,
+# so the stored AggregateForecasts get minimized again
+QUESTION_FORECASTS_MAX_APPENDS = 128
+# 7d
+QUESTION_FORECASTS_STATE_TIMEOUT = 3600 * 24 * 7
+
+
+def get_question_forecasts_state_key(question_id: int, aggregation_method: str):
+    return f"question_forecasts_state:{question_id}:{aggregation_method}"
+
+
+def invalidate_question_forecasts_state(question: Question):
+    """
+    Forces the next `build_question_forecasts` call to rebuild the whole history
+    """
+
+    cache.delete_many(
+        [
+            get_question_forecasts_state_key(question.pk, method)
+            for method in AggregationMethod
+        ]
+    )
+
+
+def update_question_latest_aggregate(
+    question: Question,
+    aggregation_method: str,
+    aggregate_forecast: AggregateForecast | None,
+):
+    """
+    Upserts the QuestionLatestAggregate of the question,
+    deletes it when the question has no aggregation history
+    """
+
+    if aggregate_forecast is None:
+        QuestionLatestAggregate.objects.filter(
+            question=question, method=aggregation_method
+        ).delete()
+        return
+
+    QuestionLatestAggregate.objects.bulk_create(
+        [QuestionLatestAggregate.from_aggregate_forecast(aggregate_forecast)],
+        update_conflicts=True,
+        unique_fields=["question", "method"],
+        update_fields=QuestionLatestAggregate.AGGREGATE_FIELDS,
+    )
+
+
+def append_question_forecasts(
+    question: Question,
+    aggregation_method: str = AggregationMethod.RECENCY_WEIGHTED,
+) -> bool:
+    """
+    Appends the AggregateForecasts introduced since the last build of the question.
+    Returns False if the stored state is missing or stale
+    and the whole history needs to be rebuilt.
+    """
+
+    state_key = get_question_forecasts_state_key(question.pk, aggregation_method)
+    state = cache.get(state_key)
+
+    if not state or state["appends"] >= QUESTION_FORECASTS_MAX_APPENDS:
+        return False
+
+    last_entry = (
+        question.aggregate_forecasts.filter(method=aggregation_method)
+        .order_by("-start_time")
+        .first()
+    )
+
+    if not last_entry or last_entry.start_time != state["start_time"]:
+        return False
+
+    # Every forecast the stored history was built from must still be there,
+    # otherwise (e.g. a forecast was deleted) timesteps before the cutoff are stale
+    counts = question.user_forecasts.exclude(author__is_bot=True).aggregate(
+        total=Count("id"),
+        new=Count("id", filter=Q(start_time__gt=last_entry.start_time)),
+    )
+
+    if counts["total"] - counts["new"] != state["forecasts_count"]:
+        return False
+
+    new_entries = get_aggregation_history(
+        question,
+        aggregation_methods=[aggregation_method],
+        minimize=False,
+        include_stats=True,
+        after=last_entry.start_time,
+    )[aggregation_method]
+
+    if new_entries:
+        # Only the latest entry carries the histogram
+        last_entry.end_time = new_entries[0].start_time
+        last_entry.histogram = None
+
+        with transaction.atomic():
+            last_entry.save(update_fields=["end_time", "histogram"])
+            AggregateForecast.objects.bulk_create(new_entries, batch_size=50)
+            update_question_latest_aggregate(
+                question, aggregation_method, new_entries[-1]
+            )
+
+        state.update(
+            start_time=new_entries[-1].start_time,
+            appends=state["appends"] + 1,
+        )
+
+    state["forecasts_count"] = counts["total"]
+    cache.set(state_key, state, timeout=QUESTION_FORECASTS_STATE_TIMEOUT)
+
+    return True
+
+
 def build_question_forecasts(
     question: Question,
     aggregation_method: str = AggregationMethod.RECENCY_WEIGHTED,
+    full_rebuild: bool = False,
 ):
     """
     Builds the AggregateForecasts for a question
     Stores them in the database
+
+    Unless `full_rebuild` is set, only timesteps introduced since the previous build
+    are appended to the stored history.
     """
+
+    if not full_rebuild and append_question_forecasts(question, aggregation_method):
+        return
+
+    forecasts_count = question.user_forecasts.exclude(author__is_bot=True).count()
     aggregation_history = get_aggregation_history(
         question,
         aggregation_methods=[aggregation_method],
@@ -75,7 +210,12 @@ def build_question_forecasts(
     )[aggregation_method]
 
     # overwrite old history with new history, minimizing the amount deleted and created
-    previous_history = question.aggregate_forecasts.filter(method=aggregation_method)
+    # read once in order, so the overwritten and deleted entries don't overlap
+    previous_history = list(
+        question.aggregate_forecasts.filter(method=aggregation_method).order_by(
+            "start_time"
+        )
+    )
     to_overwrite, to_delete = (
         previous_history[: len(aggregation_history)],
         previous_history[len(aggregation_history) :],
@@ -95,6 +235,29 @@ def build_question_forecasts(
         AggregateForecast.objects.bulk_update(overwriters, fields, batch_size=50)
         AggregateForecast.objects.filter(id__in=[old.id for old in to_delete]).delete()
         AggregateForecast.objects.bulk_create(to_create, batch_size=50)
+        # the latest entry of the stored history, as written above
+        update_question_latest_aggregate(
+            question,
+            aggregation_method,
+            question.aggregate_forecasts.filter(method=aggregation_method)
+            .order_by("-start_time")
+            .first(),
+        )
+
+    state_key = get_question_forecasts_state_key(question.pk, aggregation_method)
+
+    if aggregation_history:
+        cache.set(
+            state_key,
+            {
+                "start_time": aggregation_history[-1].start_time,
+                "forecasts_count": forecasts_count,
+                "appends": 0,
+            },
+            timeout=QUESTION_FORECASTS_STATE_TIMEOUT,
+        )
+    else:
+        cache.delete(state_key)
 
 
 def build_question_forecasts_for_user(
@@ -136,11 +299,16 @@ def create_question(*, title: str = None, **kwargs) -> Question:
 
 
 def update_question(question: Question, **kwargs) -> Question:
+    include_bots_in_aggregates = question.include_bots_in_aggregates
+
     question, _ = model_update(
         instance=question,
         data=kwargs,
     )
 
+    if question.include_bots_in_aggregates != include_bots_in_aggregates:
+        invalidate_question_forecasts_state(question)
+
     return question
 
 
@@ -498,56 +666,25 @@ def unresolve_question(question: Question):
     post.update_pseudo_materialized_fields()
     post.save()
 
+    invalidate_question_forecasts_state(question)
+
     # TODO: set up unresolution notifications
     # in the "resolve_question" function, scoring is handled in the same task
     # as notifications. So this should be moved in the same way after notifications
     # are generated
     # scoring
-    score_types = [
-        Score.ScoreTypes.BASELINE,
-        Score.ScoreTypes.PEER,
-        Score.ScoreTypes.RELATIVE_LEGACY,
-    ]
     spot_forecast_time = question.cp_reveal_time
-    if spot_forecast_time:
-        score_types.append(Score.ScoreTypes.SPOT_PEER)
-    score_question(
+    previous_scores, new_scores = score_question(
         question,
         None,  # None is the equivalent of unsetting scores
         spot_forecast_time=(
             spot_forecast_time.timestamp() if spot_forecast_time else None
         ),
-        score_types=score_types,
+        score_types=get_resolution_score_types(question),
     )
 
     # Update leaderboards
-    post = question.get_post()
-    projects: QuerySet[Project] = [post.default_project] + list(post.projects.all())
-    for project in projects:
-        if project.type == Project.ProjectTypes.SITE_MAIN:
-            continue
-        leaderboards = project.leaderboards.all()
-        for leaderboard in leaderboards:
-            update_project_leaderboard(project, leaderboard)
-
-    main_site_project = post.projects.filter(
-        type=Project.ProjectTypes.SITE_MAIN
-    ).first()
-    if main_site_project:
-        global_leaderboard_window = question.get_global_leaderboard_dates()
-        if global_leaderboard_window is not None:
-            global_leaderboards = Leaderboard.objects.filter(
-                project__type=Project.ProjectTypes.SITE_MAIN,
-                start_time=global_leaderboard_window[0],
-                end_time=global_leaderboard_window[1],
-            ).exclude(
-                score_type__in=[
-                    Leaderboard.ScoreTypes.COMMENT_INSIGHT,
-                    Leaderboard.ScoreTypes.QUESTION_WRITING,
-                ]
-            )
-            for leaderboard in global_leaderboards:
-                update_project_leaderboard(main_site_project, leaderboard)
+    update_leaderboards_from_question_scores(question, previous_scores, new_scores)
 
 
 def close_question(question: Question, actual_close_time: datetime | None = None):
@@ -616,6 +753,9 @@ def create_forecast(
     # Update cache
     PostUserSnapshot.update_last_forecast_date(question.get_post(), user)
     post.update_forecasts_count()
+    update_profile_stats_from_forecast(
+        user, question, is_first_forecast=prev_forecasts is None
+    )
 
     # Auto-subscribe user to CP changes
     if (
@@ -668,21 +808,147 @@ def create_forecast_bulk(*, user: User = None, forecasts: list[dict] = None):
         run_on_post_forecast.send_with_options(args=(post.id,), delay=10_000)
 
 
+def get_latest_aggregates_for_questions(
+    questions: Iterable[Question],
+    aggregation_methods: Iterable[AggregationMethod] | None = None,
+) -> dict[int, dict[str, QuestionLatestAggregate]]:
+    """
+    Returns the QuestionLatestAggregates of the questions by question id and method
+    """
+
+    qs = QuestionLatestAggregate.objects.filter(question__in=questions)
+    if aggregation_methods is not None:
+        qs = qs.filter(method__in=aggregation_methods)
+
+    latest_map: dict[int, dict[str, QuestionLatestAggregate]] = {}
+    for latest in qs:
+        latest_map.setdefault(latest.question_id, {})[latest.method] = latest
+
+    return latest_map
+
+
 def get_recency_weighted_for_questions(
     questions: Iterable[Question],
 ) -> dict[Question, AggregateForecast]:
+    questions = list(questions)
+    latest_map = get_latest_aggregates_for_questions(
+        questions, [AggregationMethod.RECENCY_WEIGHTED]
+    )
+
+    aggregations_map = {
+        question_id: by_method[
+            AggregationMethod.RECENCY_WEIGHTED
+        ].to_aggregate_forecast()
+        for question_id, by_method in latest_map.items()
+    }
+
+    return {q: aggregations_map.get(q.pk) for q in questions}
+
+
+def get_aggregations_at_time_for_questions(
+    questions: Iterable[Question],
+    time: datetime,
+    aggregation_method: AggregationMethod = AggregationMethod.RECENCY_WEIGHTED,
+) -> dict[Question, AggregateForecast | None]:
+    """
+    Looks up the stored aggregation active at the given time for each question
+    in a single query. Only questions without any stored history are recomputed.
+    """
+
+    questions = list(questions)
+    aggregations_map: dict[int, AggregateForecast | None] = {}
+
+    # the latest aggregations answer for the questions they started before the time
+    for question_id, by_method in get_latest_aggregates_for_questions(
+        questions, [aggregation_method]
+    ).items():
+        latest = by_method[aggregation_method]
+        if latest.start_time <= time:
+            aggregations_map[question_id] = (
+                latest.to_aggregate_forecast()
+                if latest.end_time is None or latest.end_time > time
+                else None
+            )
+
+    history_questions = [q for q in questions if q.pk not in aggregations_map]
     qs = (
         AggregateForecast.objects.filter(
-            question__in=questions, method=AggregationMethod.RECENCY_WEIGHTED
+            question__in=history_questions,
+            method=aggregation_method,
+            start_time__lte=time,
         )
         .order_by("question_id", "-start_time")
         .distinct("question_id")
     )
-    aggregations_map = {x.question_id: x for x in qs}
+    aggregations_map.update(
+        (x.question_id, x) for x in qs if x.end_time is None or x.end_time > time
+    )
+
+    missing = [q for q in history_questions if q.pk not in aggregations_map]
+    if missing:
+        with_history = set(
+            AggregateForecast.objects.filter(
+                question__in=missing, method=aggregation_method
+            )
+            .values_list("question_id", flat=True)
+            .distinct()
+        )
+        for question in missing:
+            if question.pk in with_history:
+                continue
+            aggregations_map[question.pk] = get_aggregations_at_time(
+                question, time, [aggregation_method]
+            ).get(aggregation_method)
 
     return {q: aggregations_map.get(q.pk) for q in questions}
 
 
+def get_group_cutoff_questions(
+    questions: list[Question], group_cutoff: int
+) -> list[Question]:
+    """
+    Keeps the top first N questions of each group, by their latest
+    recency weighted aggregation
+    """
+
+    questions = list(questions)
+    group_questions = [q for q in questions if q.group_id]
+
+    recently_weighted = get_recency_weighted_for_questions(questions)
+    group_questions_map = generate_map_from_list(group_questions, lambda q: q.group_id)
+
+    def sorting_key(q: Question):
+        """
+        Extracts question aggregation forecast value
+        """
+
+        aggregation = recently_weighted.get(q)
+
+        if (
+            not aggregation
+            or not aggregation.forecast_values
+            or len(aggregation.forecast_values) < 2
+        ):
+            return 0
+
+        match q.type:
+            case "binary":
+                return aggregation.forecast_values[1]
+            case "numeric" | "date":
+                return aggregation.centers[0]
+            case "multiple_choice":
+                return aggregation.forecast_values[0]
+
+    for group_questions in group_questions_map.values():
+        group_questions = sorted(group_questions, key=sorting_key, reverse=True)
+
+        # Exclude other questions from the list
+        for q in group_questions[group_cutoff:]:
+            questions.remove(q)
+
+    return questions
+
+
 def get_aggregated_forecasts_for_questions(
     questions: Iterable[Question], group_cutoff: int = None
 ):
@@ -698,47 +964,87 @@ def get_aggregated_forecasts_for_questions(
     questions_map = {q.pk: q for q in questions}
 
     if group_cutoff is not None:
-        group_questions = [q for q in questions if q.group_id]
+        questions = get_group_cutoff_questions(questions, group_cutoff)
 
-        recently_weighted = get_recency_weighted_for_questions(questions)
-        group_questions_map = generate_map_from_list(
-            group_questions, lambda q: q.group_id
-        )
+    qs = AggregateForecast.objects.filter(question__in=questions).order_by("start_time")
 
-        def sorting_key(q: Question):
-            """
-            Extracts question aggregation forecast value
-            """
+    forecasts_map = {q: [] for q in questions}
 
-            aggregation = recently_weighted.get(q)
+    for forecast in qs:
+        forecasts_map[questions_map[forecast.question_id]].append(forecast)
 
-            if (
-                not aggregation
-                or not aggregation.forecast_values
-                or len(aggregation.forecast_values) < 2
-            ):
-                return 0
+    return forecasts_map
 
-            match q.type:
-                case "binary":
-                    return aggregation.forecast_values[1]
-                case "numeric" | "date":
-                    return aggregation.centers[0]
-                case "multiple_choice":
-                    return aggregation.forecast_values[0]
 
-        for group_questions in group_questions_map.values():
-            group_questions = sorted(group_questions, key=sorting_key, reverse=True)
+def get_latest_aggregated_forecasts_for_questions(
+    questions: Iterable[Question], group_cutoff: int = None
+) -> dict[Question, list[AggregateForecast]]:
+    """
+    Extracts the latest aggregated forecast of each method for the given questions
+    from their QuestionLatestAggregates, the compact alternative of
+    get_aggregated_forecasts_for_questions for feeds
+    """
 
-            # Exclude other questions from the list
-            for q in group_questions[group_cutoff:]:
-                questions.remove(q)
+    questions = list(questions)
 
-    qs = AggregateForecast.objects.filter(question__in=questions).order_by("start_time")
+    if group_cutoff is not None:
+        questions = get_group_cutoff_questions(questions, group_cutoff)
 
-    forecasts_map = {q: [] for q in questions}
+    latest_map = get_latest_aggregates_for_questions(questions)
 
-    for forecast in qs:
-        forecasts_map[questions_map[forecast.question_id]].append(forecast)
+    return {
+        q: [
+            latest.to_aggregate_forecast()
+            for latest in latest_map.get(q.pk, {}).values()
+        ]
+        for q in questions
+    }
 
-    return forecasts_map
+
+def get_aggregation_sparklines_for_questions(
+    questions: Iterable[Question], size: int = SPARKLINE_SIZE
+) -> dict[Question, dict[str, dict]]:
+    """
+    Downsampled history of the centers of the aggregations of each question
+    and method: at most `size` aggregations evenly spaced in the history,
+    the latest one included.
+    Only the centers of the sampled aggregations are fetched, in a single query.
+    """
+
+    questions = list(questions)
+    questions_map = {q.pk: q for q in questions}
+    partition = [F("question_id"), F("method")]
+
+    qs = (
+        AggregateForecast.objects.filter(question__in=questions, centers__isnull=False)
+        .annotate(
+            row=Window(RowNumber(), partition_by=partition, order_by="-start_time"),
+            total=Window(Count("id"), partition_by=partition),
+        )
+        # every step-th aggregation from the latest one, step = ceil(total / size)
+        .annotate(
+            offset=Mod(
+                F("row") - 1,
+                (F("total") + size - 1) / size,
+                output_field=IntegerField(),
+            )
+        )
+        .filter(offset=0)
+        .order_by("question_id", "method", "start_time")
+        .values_list("question_id", "method", "start_time", "centers")
+    )
+
+    sparklines = {q: {} for q in questions}
+
+    for question_id, method, start_time, centers in qs:
+        question = questions_map[question_id]
+        sparkline = sparklines[question].setdefault(
+            method, {"timestamps": [], "centers": []}
+        )
+        sparkline["timestamps"].append(start_time.timestamp())
+        # the serialized centers of binary aggregations skip the "no" value
+        sparkline["centers"].append(
+            centers[1:] if question.type == Question.QuestionType.BINARY else centers
+        )
+
+    return sparklines
@@ -8,18 +8,22 @@ from notifications.services import (
     NotificationPostParams,
     NotificationQuestionParams,
 )
-from projects.models import Project
+from posts.services.cache import bump_question_posts_cache_versions
 from questions.models import Question
 from questions.services import build_question_forecasts
-from scoring.models import Score, Leaderboard
-from scoring.utils import score_question, update_project_leaderboard
+from scoring.models import Score
+from scoring.utils import (
+    get_resolution_score_types,
+    score_question,
+    update_leaderboards_from_question_scores,
+)
 from users.models import User
 from utils.dramatiq import concurrency_retries, task_concurrent_limit
 
 
 @dramatiq.actor(max_backoff=10_000, retry_when=concurrency_retries(max_retries=20))
 @task_concurrent_limit(
-    lambda question_id: f"build-question-forecasts-{question_id}",
+    lambda question_id, **kwargs: f"build-question-forecasts-{question_id}",
     # We want only one task for the same question id be executed at the same time
     # To ensure all forecasts will be included in the AggregatedForecasts model
     limit=1,
@@ -27,7 +31,7 @@ from utils.dramatiq import concurrency_retries, task_concurrent_limit
     # So it's fine to set mutex lock timeout for this duration
     ttl=60_000,
 )
-def run_build_question_forecasts(question_id: int):
+def run_build_question_forecasts(question_id: int, full_rebuild: bool = False):
     """
     The current concurrency limiter is not ideal because it does not execute consecutive tasks
     with the same question_id sequentially. Instead,
@@ -39,7 +43,8 @@ def run_build_question_forecasts(question_id: int):
     """
 
     question = Question.objects.get(id=question_id)
-    build_question_forecasts(question)
+    build_question_forecasts(question, full_rebuild=full_rebuild)
+    bump_question_posts_cache_versions([question.pk])
 
 
 @dramatiq.actor()
@@ -48,21 +53,14 @@ def resolve_question_and_send_notifications(question_id: int):
     post = question.get_post()
 
     # scoring
-    score_types = [
-        Score.ScoreTypes.BASELINE,
-        Score.ScoreTypes.PEER,
-        Score.ScoreTypes.RELATIVE_LEGACY,
-    ]
     spot_forecast_time = question.cp_reveal_time
-    if spot_forecast_time:
-        score_types.append(Score.ScoreTypes.SPOT_PEER)
-    score_question(
+    previous_scores, new_scores = score_question(
         question,
         question.resolution,
         spot_forecast_time=(
             spot_forecast_time.timestamp() if spot_forecast_time else None
         ),
-        score_types=score_types,
+        score_types=get_resolution_score_types(question),
     )
 
     scores = (
@@ -88,27 +86,7 @@ def resolve_question_and_send_notifications(question_id: int):
 
     # Update leaderboards
     post = question.get_post()
-    projects = [post.default_project] + list(post.projects.all())
-    for project in projects:
-        if project.type == Project.ProjectTypes.SITE_MAIN:
-            continue
-
-        leaderboards = project.leaderboards.all()
-        for leaderboard in leaderboards:
-            update_project_leaderboard(project, leaderboard)
-
-    main_site_project = post.projects.filter(
-        type=Project.ProjectTypes.SITE_MAIN
-    ).first()
-    if main_site_project:
-        global_leaderboard_window = question.get_global_leaderboard_dates()
-        if global_leaderboard_window is not None:
-            global_leaderboards = Leaderboard.objects.filter(
-                start_time=global_leaderboard_window[0],
-                end_time=global_leaderboard_window[1],
-            )
-            for leaderboard in global_leaderboards:
-                update_project_leaderboard(main_site_project, leaderboard)
+    update_leaderboards_from_question_scores(question, previous_scores, new_scores)
 
     # Send notifications
     for score in scores:
@@ -0,0 +1,30 @@
+import logging
+
+import dramatiq
+
+from scoring.models import Leaderboard
+from scoring.utils import update_project_leaderboard
+
+logger = logging.getLogger(__name__)
+
+
+@dramatiq.actor
+def job_update_leaderboard(leaderboard_id: int):
+    leaderboard = Leaderboard.objects.select_related("project").get(id=leaderboard_id)
+    update_project_leaderboard(leaderboard.project, leaderboard)
+
+
+@dramatiq.actor
+def job_update_leaderboards():
+    """
+    Rebuilds every leaderboard from scratch. This reconciles the incremental
+    updates made when questions resolve (see update_leaderboard_from_question_scores)
+    """
+
+    leaderboard_ids = (
+        Leaderboard.objects.filter(project__isnull=False)
+        .exclude(score_type=Leaderboard.ScoreTypes.MANUAL)
+        .values_list("id", flat=True)
+    )
+    for leaderboard_id in leaderboard_ids:
+        job_update_leaderboard.send(leaderboard_id)
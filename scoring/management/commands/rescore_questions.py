@@ -0,0 +1,143 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import batched
+
+import django
+from django import db
+from django.core.management.base import BaseCommand
+
+from questions.models import Question
+from scoring.utils import get_resolution_score_types, score_question
+
+logger = logging.getLogger(__name__)
+
+
+def init_worker():
+    django.setup()
+    # connections inherited from the parent process can't be shared,
+    # each worker opens its own
+    db.connections.close_all()
+
+
+def rescore_questions(question_ids: tuple[int, ...]) -> tuple[list[int], list[int]]:
+    """rescores the questions, returns the ids of the rescored and failed ones"""
+    rescored, failed = [], []
+    for question in Question.objects.filter(id__in=question_ids).order_by("id"):
+        spot_forecast_time = question.cp_reveal_time
+        try:
+            score_question(
+                question,
+                question.resolution,
+                spot_forecast_time=(
+                    spot_forecast_time.timestamp() if spot_forecast_time else None
+                ),
+                score_types=get_resolution_score_types(question),
+            )
+        except Exception:
+            logger.exception("Failed to rescore question %s", question.id)
+            failed.append(question.id)
+        else:
+            rescored.append(question.id)
+    db.close_old_connections()
+    return rescored, failed
+
+
+def read_checkpoint(path: str) -> set[int]:
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {int(line) for line in f if line.strip()}
+
+
+class Command(BaseCommand):
+    help = """
+    Rescores all resolved questions, e.g. after a change to the scoring rules.
+    Questions are split into batches scored by a pool of worker processes.
+    The ids of the rescored questions are appended to the checkpoint file
+    as batches complete, and are skipped when the command is run again.
+    Leaderboards are not updated.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="number of worker processes",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=20,
+            help="number of questions sent to a worker at a time",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            default="rescore_questions.checkpoint",
+            help="file listing the ids of the questions already rescored",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="ignore and clear the checkpoint file",
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options["checkpoint"]
+        if options["restart"] and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        done = read_checkpoint(checkpoint)
+
+        question_ids = [
+            question_id
+            for question_id in Question.objects.filter(resolution__isnull=False)
+            .exclude(resolution__in=["ambiguous", "annulled"])
+            .order_by("id")
+            .values_list("id", flat=True)
+            if question_id not in done
+        ]
+        c = len(question_ids)
+        print(
+            f"Rescoring {c} questions with {options['workers']} workers, "
+            f"{len(done)} already rescored."
+        )
+        if not c:
+            return
+
+        # connections must not be inherited by the workers
+        db.connections.close_all()
+        i = 0
+        failed: list[int] = []
+        tm = time.time()
+        with (
+            ProcessPoolExecutor(
+                max_workers=options["workers"], initializer=init_worker
+            ) as executor,
+            open(checkpoint, "a") as checkpoint_file,
+        ):
+            futures = [
+                executor.submit(rescore_questions, batch)
+                for batch in batched(question_ids, options["batch_size"])
+            ]
+            for future in as_completed(futures):
+                rescored, batch_failed = future.result()
+                checkpoint_file.writelines(
+                    f"{question_id}\n" for question_id in rescored
+                )
+                checkpoint_file.flush()
+                failed += batch_failed
+
+                i += len(rescored) + len(batch_failed)
+                print(
+                    f"Processed {int(i / c * 100)}% ({i}/{c}) "
+                    f"dur:{round(time.time() - tm)}s "
+                    f"remaining:{round((time.time() - tm) / i * (c - i))}s",
+                    end="\r",
+                )
+        print()
+
+        if failed:
+            print(f"Failed to rescore questions: {sorted(failed)}")
@@ -1,4 +1,4 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 from django.db import models
 from django.db.models.query import QuerySet, Q
@@ -148,6 +148,9 @@ class Leaderboard(TimeStampedModel):
         return f"{self.score_type} Leaderboard for {self.project.name}"
 
     def get_questions(self) -> list[Question]:
+        return list(self.get_questions_queryset())
+
+    def get_questions_queryset(self) -> QuerySet[Question]:
         if self.project:
             questions = Question.objects.filter(
                 Q(post__projects=self.project)
@@ -164,12 +167,10 @@ class Leaderboard(TimeStampedModel):
 
         if self.score_type == self.ScoreTypes.COMMENT_INSIGHT:
             # post must be published
-            return list(
-                questions.filter(
-                    Q(post__published_at__lt=self.end_time)
-                    | Q(group__post__published_at__lt=self.end_time)
-                ).distinct("pk")
-            )
+            return questions.filter(
+                Q(post__published_at__lt=self.end_time)
+                | Q(group__post__published_at__lt=self.end_time)
+            ).distinct("pk")
         elif self.score_type == self.ScoreTypes.QUESTION_WRITING:
             # post must be published, and can't be resolved before the start_time
             # of the leaderboard
@@ -180,7 +181,7 @@ class Leaderboard(TimeStampedModel):
                 Post.CurationStatus.DRAFT,
                 Post.CurationStatus.REJECTED,
             ]
-            return list(
+            return (
                 questions.filter(
                     Q(post__published_at__lt=self.end_time)
                     | Q(group__post__published_at__lt=self.end_time)
@@ -203,12 +204,12 @@ class Leaderboard(TimeStampedModel):
 
         if self.start_time and self.end_time:
             # global leaderboard
-            window = (self.start_time, self.end_time)
-            questions = [
-                q for q in questions if q.get_global_leaderboard_dates() == window
-            ]
+            questions = questions.filter(
+                global_leaderboard_start_time=self.start_time,
+                global_leaderboard_end_time=self.end_time,
+            )
 
-        return list(questions)
+        return questions
 
 
 class LeaderboardEntry(TimeStampedModel):
@@ -535,6 +536,38 @@ def global_leaderboard_dates() -> list[tuple[datetime, datetime]]:
     ]
 
 
+def get_global_leaderboard_window(
+    open_time: datetime | None,
+    scheduled_close_time: datetime | None,
+    resolution_set_time: datetime | None,
+) -> tuple[datetime, datetime] | None:
+    """the global leaderboard dates a question with these times counts for"""
+    forecast_horizon_start = open_time
+    forecast_horizon_end = scheduled_close_time
+    if forecast_horizon_start is None or forecast_horizon_end is None:
+        return (None, None)
+
+    # iterate over the global leaderboard dates in reverse order
+    # to find the shortest interval that this question counts for
+    shortest_window = (None, None)
+    for gl_start, gl_end in global_leaderboard_dates()[::-1]:
+        if forecast_horizon_start < gl_start or gl_end < forecast_horizon_start:
+            continue
+        if forecast_horizon_end > gl_end + timedelta(days=3):
+            continue
+        if resolution_set_time and resolution_set_time > gl_end + timedelta(days=100):
+            # we allow for a 100 day buffer after the global leaderboard closes
+            # for questions to be resolved
+            continue
+        if shortest_window[0] is None:
+            shortest_window = (gl_start, gl_end)
+        if gl_end - gl_start < shortest_window[1] - shortest_window[0]:
+            shortest_window = (gl_start, gl_end)
+    if shortest_window[0]:
+        return shortest_window
+    return None
+
+
 def global_leaderboard_dates_and_score_types() -> (
     list[tuple[datetime, datetime, Leaderboard.ScoreTypes]]
 ):
@@ -1,14 +1,17 @@
 from dataclasses import dataclass
-from datetime import datetime
-from collections import defaultdict
-from typing import Sequence
+from datetime import datetime, timezone as dt_timezone
+from typing import Iterable, Sequence
 
+import numpy as np
+from django.core.cache import cache
 from django.utils import timezone
 
 from questions.models import Question
 from scoring.models import Score
 from users.models import User
 
+REPUTATION_INDEX_TIMEOUT = 3600 * 24
+
 
 @dataclass
 class Reputation:
@@ -25,20 +28,152 @@ def reputation_value(scores: Sequence[Score]) -> float:
     )
 
 
+@dataclass
+class ReputationIndex:
+    """cumulative public peer score and coverage sums of a single user,
+    ordered by the time each score was calculated"""
+
+    times: np.ndarray
+    score_sums: np.ndarray
+    coverage_sums: np.ndarray
+
+    @classmethod
+    def from_scores(
+        cls, scores: Sequence[tuple[datetime, float, float]]
+    ) -> "ReputationIndex":
+        """scores is a list of (edited_at, score, coverage) ordered by edited_at"""
+        if not scores:
+            return cls(np.empty(0), np.empty(0), np.empty(0))
+        times, score_values, coverages = zip(*scores)
+        return cls(
+            np.array([time.timestamp() for time in times]),
+            np.cumsum(score_values),
+            np.cumsum(coverages),
+        )
+
+    def value_at(self, time: datetime) -> float:
+        index = np.searchsorted(self.times, time.timestamp(), side="right")
+        if index == 0:
+            return 1e-6
+        return max(
+            self.score_sums[index - 1] / (30 + self.coverage_sums[index - 1]), 1e-6
+        )
+
+    def change_times(self, start: datetime, end: datetime) -> list[datetime]:
+        """times in (start, end] at which the reputation changes"""
+        times = self.times[
+            (self.times > start.timestamp()) & (self.times <= end.timestamp())
+        ]
+        # scores calculated at the same time change the reputation once
+        return [
+            datetime.fromtimestamp(time, tz=dt_timezone.utc)
+            for time in np.unique(times)
+        ]
+
+
+@dataclass
+class ReputationTable:
+    """reputation indexes of many users packed in sorted arrays,
+    to look up the reputations of a whole forecast set at once"""
+
+    user_ids: np.ndarray  # sorted
+    time_ranks: np.ndarray  # sorted times of all indexes
+    keys: np.ndarray  # user position * (len(time_ranks) + 1) + 1 + time rank
+    values: np.ndarray  # reputation after each key
+
+    @classmethod
+    def from_indexes(cls, indexes: dict[int, ReputationIndex]) -> "ReputationTable":
+        user_ids = np.array(sorted(indexes), dtype=int)
+        times = [indexes[user_id].times for user_id in user_ids]
+        time_ranks = np.unique(np.concatenate(times)) if times else np.empty(0)
+        keys = [
+            position * (len(time_ranks) + 1)
+            + 1
+            + np.searchsorted(time_ranks, user_times)
+            for position, user_times in enumerate(times)
+        ]
+        values = [
+            np.maximum(
+                indexes[user_id].score_sums / (30 + indexes[user_id].coverage_sums),
+                1e-6,
+            )
+            for user_id in user_ids
+        ]
+        return cls(
+            user_ids=user_ids,
+            time_ranks=time_ranks,
+            keys=np.concatenate(keys) if keys else np.empty(0, dtype=int),
+            values=np.concatenate(values) if values else np.empty(0),
+        )
+
+    def values_at(self, user_ids: Sequence[int], time: datetime) -> np.ndarray:
+        if len(self.keys) == 0:
+            return np.full(len(user_ids), 1e-6)
+        positions = np.searchsorted(self.user_ids, user_ids)
+        rank = np.searchsorted(self.time_ranks, time.timestamp(), side="right")
+        user_keys = positions * (len(self.time_ranks) + 1)
+        latest = np.searchsorted(self.keys, user_keys + rank, side="right") - 1
+        # users without any score before the time keep the minimum reputation
+        found = (latest >= 0) & (self.keys[np.maximum(latest, 0)] > user_keys)
+        return np.where(found, self.values[np.maximum(latest, 0)], 1e-6)
+
+
+def get_reputation_index_key(user_id: int) -> str:
+    return f"reputation_index:{user_id}"
+
+
+def get_reputation_indexes(user_ids: Iterable[int]) -> dict[int, ReputationIndex]:
+    """
+    Returns the reputation index of each user.
+    Indexes missing from the cache are built from a single Score query.
+    """
+    keys = {user_id: get_reputation_index_key(user_id) for user_id in set(user_ids)}
+    cached = cache.get_many(keys.values())
+    indexes: dict[int, ReputationIndex] = {
+        user_id: cached[key] for user_id, key in keys.items() if key in cached
+    }
+    missing = [user_id for user_id in keys if user_id not in indexes]
+    if not missing:
+        return indexes
+
+    scores_by_user: dict[int, list[tuple[datetime, float, float]]] = {
+        user_id: [] for user_id in missing
+    }
+    peer_scores = (
+        Score.objects.filter(
+            user_id__in=missing,
+            score_type=Score.ScoreTypes.PEER,
+            question__in=Question.objects.filter_public(),
+        )
+        .order_by("edited_at")
+        .values_list("user_id", "edited_at", "score", "coverage")
+    )
+    for user_id, edited_at, score, coverage in peer_scores:
+        scores_by_user[user_id].append((edited_at, score, coverage))
+
+    built = {
+        user_id: ReputationIndex.from_scores(scores)
+        for user_id, scores in scores_by_user.items()
+    }
+    cache.set_many(
+        {keys[user_id]: index for user_id, index in built.items()},
+        timeout=REPUTATION_INDEX_TIMEOUT,
+    )
+    indexes.update(built)
+    return indexes
+
+
+def invalidate_reputation_indexes(user_ids: Iterable[int]):
+    cache.delete_many(
+        [get_reputation_index_key(user_id) for user_id in user_ids if user_id]
+    )
+
+
 def get_reputation_at_time(user: User, time: datetime | None = None) -> Reputation:
     """
     Returns the reputation of a user at a given time.
     """
-    if time is None:
-        time = timezone.now()
-    peer_scores = Score.objects.filter(
-        user=user,
-        score_type=Score.ScoreTypes.PEER,
-        question__in=Question.objects.filter_public(),
-        edited_at__lte=time,
-    ).distinct()
-    value = reputation_value(peer_scores)
-    return Reputation(user, value, time)
+    return get_reputations_at_time([user], time)[0]
 
 
 def get_reputations_at_time(
@@ -49,20 +184,8 @@ def get_reputations_at_time(
     """
     if time is None:
         time = timezone.now()
-    peer_scores = Score.objects.filter(
-        user__in=users,
-        score_type=Score.ScoreTypes.PEER,
-        question__in=Question.objects.filter_public(),
-        edited_at__lte=time,
-    ).distinct()
-    user_scores: dict[User, list[Score]] = defaultdict(list)
-    for score in peer_scores:
-        user_scores[score.user].append(score)
-    reputations = []
-    for user in users:
-        value = reputation_value(peer_scores)
-        reputations.append(Reputation(user, value, time))
-    return reputations
+    indexes = get_reputation_indexes(user.id for user in users)
+    return [Reputation(user, indexes[user.id].value_at(time), time) for user in users]
 
 
 def get_reputations_during_interval(
@@ -73,31 +196,12 @@ def get_reputations_during_interval(
     The reputation can change during the interval."""
     if end is None:
         end = timezone.now()
-    all_peer_scores = (
-        Score.objects.filter(
-            user__in=users,
-            score_type=Score.ScoreTypes.PEER,
-            question__in=Question.objects.filter_public(),
-            edited_at__lte=end,
-        )
-        .prefetch_related("user", "question")
-        .distinct()
-    )
-    old_peer_scores = list(
-        all_peer_scores.filter(edited_at__lte=start).order_by("edited_at")
-    )
-    new_peer_scores = list(
-        all_peer_scores.filter(edited_at__gt=start).order_by("edited_at")
-    )
-    scores_by_user: dict[User, dict[Question, Score]] = defaultdict(dict)
-    for score in old_peer_scores:
-        scores_by_user[score.user][score.question] = score
-    reputations: dict[User, list[Reputation]] = defaultdict(list)
+    indexes = get_reputation_indexes(user.id for user in users)
+    reputations: dict[User, list[Reputation]] = {}
     for user in users:
-        value = reputation_value(scores_by_user[user].values())
-        reputations[user].append(Reputation(user, value, start))
-    for score in new_peer_scores:
-        scores_by_user[score.user][score.question] = score
-        value = reputation_value(scores_by_user[user].values())
-        reputations[user].append(Reputation(score.user, value, score.edited_at))
+        index = indexes[user.id]
+        reputations[user] = [
+            Reputation(user, index.value_at(time), time)
+            for time in [start] + index.change_times(start, end)
+        ]
     return reputations
@@ -1,14 +1,13 @@
 from dataclasses import dataclass
-from datetime import datetime
 
 import numpy as np
 from django.db.models import Prefetch
-from scipy.stats.mstats import gmean
 
-from questions.models import AggregateForecast, Forecast, Question
+from questions.models import AggregateForecast, Forecast, Question, get_pmf_matrix
 from questions.types import AggregationMethod
 from scoring.models import Score
 from users.models import User
+from utils.dtypes import generate_map_from_list
 from utils.the_math.aggregations import get_aggregation_history
 
 
@@ -19,6 +18,38 @@ class AggregationEntry:
     timestamp: float
 
 
+def get_forecast_times(
+    forecasts: list[Forecast | AggregateForecast],
+) -> tuple[np.ndarray, np.ndarray]:
+    """start and end timestamps of the forecasts, ends are inf for the
+    forecasts that haven't ended"""
+    starts = np.array(
+        [forecast.start_time.timestamp() for forecast in forecasts], dtype=float
+    )
+    ends = np.array(
+        [
+            forecast.end_time.timestamp() if forecast.end_time else np.inf
+            for forecast in forecasts
+        ],
+        dtype=float,
+    )
+    return starts, ends
+
+
+def get_forecast_events(
+    forecasts: list[Forecast | AggregateForecast],
+) -> tuple[list[float], dict[int, list[int]], dict[int, list[int]]]:
+    """Returns the sorted timestamps at which forecasts start or end, along with
+    the indexes of the forecasts starting and ending at each of them"""
+    starts, ends = get_forecast_times(forecasts)
+    timesteps = np.unique(np.concatenate([starts, ends[np.isfinite(ends)]]))
+    start_indexes = np.searchsorted(timesteps, starts).tolist()
+    end_indexes = np.searchsorted(timesteps, ends).tolist()
+    starting = generate_map_from_list(range(len(forecasts)), lambda i: start_indexes[i])
+    ending = generate_map_from_list(range(len(forecasts)), lambda i: end_indexes[i])
+    return timesteps.tolist(), starting, ending
+
+
 def get_geometric_means(
     forecasts: list[Forecast | AggregateForecast],
     include_bots: bool = False,
@@ -30,23 +61,36 @@ def get_geometric_means(
             for f in forecasts
             if (isinstance(f, AggregateForecast) or f.author.is_bot is False)
         ]
+    if not included_forecasts:
+        return []
+
+    # sweep over the timesteps keeping the sum of the log pmfs of the active
+    # forecasts. Zeros are counted apart, they make the geometric mean 0
+    pmfs = get_pmf_matrix(included_forecasts)
+    zeros = pmfs <= 0
+    with np.errstate(divide="ignore"):
+        log_pmfs = np.where(zeros, 0, np.log(pmfs))
+    log_sums = np.zeros(pmfs.shape[1])
+    zero_counts = np.zeros(pmfs.shape[1], dtype=int)
+    predictors = 0
+
     geometric_means = []
-    timesteps: set[datetime] = set()
-    for forecast in included_forecasts:
-        timesteps.add(forecast.start_time.timestamp())
-        if forecast.end_time:
-            timesteps.add(forecast.end_time.timestamp())
-    for timestep in sorted(timesteps):
-        prediction_values = [
-            f.get_pmf()
-            for f in included_forecasts
-            if f.start_time.timestamp() <= timestep
-            and (f.end_time is None or f.end_time.timestamp() > timestep)
-        ]
-        if not prediction_values:
+    timesteps, starting, ending = get_forecast_events(included_forecasts)
+    for i, timestep in enumerate(timesteps):
+        # forecasts starting and ending at the same time are never active
+        if added := starting.get(i):
+            log_sums += log_pmfs[added].sum(axis=0)
+            zero_counts += zeros[added].sum(axis=0)
+            predictors += len(added)
+        if removed := ending.get(i):
+            log_sums -= log_pmfs[removed].sum(axis=0)
+            zero_counts -= zeros[removed].sum(axis=0)
+            predictors -= len(removed)
+        if not predictors:
+            # drop the rounding errors accumulated so far
+            log_sums[:] = 0
             continue  # TODO: doesn't account for going from 1 active forecast to 0
-        geometric_mean = gmean(prediction_values, axis=0)
-        predictors = len(prediction_values)
+        geometric_mean = np.where(zero_counts > 0, 0, np.exp(log_sums / predictors))
         geometric_means.append(
             AggregationEntry(
                 geometric_mean, predictors if predictors > 1 else 0, timestep
@@ -58,23 +102,21 @@ def get_geometric_means(
 def get_medians(
     forecasts: list[Forecast | AggregateForecast],
 ) -> list[AggregationEntry]:
+    if not forecasts:
+        return []
+    pmfs = get_pmf_matrix(forecasts)
+    active: dict[int, None] = dict()
+
     medians = []
-    timesteps: set[datetime] = set()
-    for forecast in forecasts:
-        timesteps.add(forecast.start_time.timestamp())
-        if forecast.end_time:
-            timesteps.add(forecast.end_time.timestamp())
-    for timestep in sorted(timesteps):
-        prediction_values = [
-            f.get_pmf()
-            for f in forecasts
-            if f.start_time.timestamp() <= timestep
-            and (f.end_time is None or f.end_time.timestamp() > timestep)
-        ]
-        if not prediction_values:
+    timesteps, starting, ending = get_forecast_events(forecasts)
+    for i, timestep in enumerate(timesteps):
+        active.update(dict.fromkeys(starting.get(i, [])))
+        for index in ending.get(i, []):
+            active.pop(index, None)
+        if not active:
             continue  # TODO: doesn't account for going from 1 active forecast to 0
-        median = np.median(prediction_values, axis=0)
-        predictors = len(prediction_values)
+        median = np.median(pmfs[list(active)], axis=0)
+        predictors = len(active)
         medians.append(
             AggregationEntry(median, predictors if predictors > 1 else 0, timestep)
         )
@@ -87,6 +129,24 @@ class ForecastScore:
     coverage: float = 0
 
 
+def get_baseline_scores(
+    probabilities: np.ndarray,
+    bucket_count: int,
+    resolution_bucket: int,
+    question_type: str,
+    open_bounds_count: int,
+) -> np.ndarray:
+    """baseline scores of forecasts giving the probabilities to the resolution"""
+    with np.errstate(divide="ignore"):
+        if question_type in ["binary", "multiple_choice"]:
+            return 100 * np.log(probabilities * bucket_count) / np.log(bucket_count)
+        if resolution_bucket in [0, bucket_count - 1]:
+            baseline = 0.05
+        else:
+            baseline = (1 - 0.05 * open_bounds_count) / (bucket_count - 2)
+        return 100 * np.log(probabilities / baseline) / 2
+
+
 def evaluate_forecasts_baseline_accuracy(
     forecasts: list[Forecast | AggregateForecast],
     resolution_bucket: int,
@@ -96,35 +156,29 @@ def evaluate_forecasts_baseline_accuracy(
     question_type: str,
     open_bounds_count: int,
 ) -> list[ForecastScore]:
+    if not forecasts:
+        return []
     total_duration = forecast_horizon_end - forecast_horizon_start
-    forecast_scores: list[tuple[float, float]] = []
-    for forecast in forecasts:
-        forecast_start = max(forecast.start_time.timestamp(), forecast_horizon_start)
-        forecast_end = (
-            actual_close_time
-            if forecast.end_time is None
-            else min(forecast.end_time.timestamp(), actual_close_time)
-        )
-        forecast_duration = forecast_end - forecast_start
-        if forecast_duration <= 0:
+    starts, ends = get_forecast_times(forecasts)
+    durations = np.minimum(ends, actual_close_time) - np.maximum(
+        starts, forecast_horizon_start
+    )
+    pmfs = get_pmf_matrix(forecasts)
+    scores = get_baseline_scores(
+        pmfs[:, resolution_bucket],
+        pmfs.shape[1],
+        resolution_bucket,
+        question_type,
+        open_bounds_count,
+    )
+
+    forecast_scores: list[ForecastScore] = []
+    for score, duration in zip(scores.tolist(), durations.tolist()):
+        if duration <= 0:
             forecast_scores.append(ForecastScore(0))
             continue
-        forecast_coverage = forecast_duration / total_duration
-        pmf = forecast.get_pmf()
-        if question_type in ["binary", "multiple_choice"]:
-            forecast_score = (
-                100 * np.log(pmf[resolution_bucket] * len(pmf)) / np.log(len(pmf))
-            )
-        else:
-            if resolution_bucket in [0, len(pmf) - 1]:
-                baseline = 0.05
-            else:
-                baseline = (1 - 0.05 * open_bounds_count) / (len(pmf) - 2)
-            forecast_score = 100 * np.log(pmf[resolution_bucket] / baseline) / 2
-        forecast_scores.append(
-            ForecastScore(forecast_score * forecast_coverage, forecast_coverage)
-        )
-
+        coverage = duration / total_duration
+        forecast_scores.append(ForecastScore(score * coverage, coverage))
     return forecast_scores
 
 
@@ -135,28 +189,22 @@ def evaluate_forecasts_baseline_spot_forecast(
     question_type: str,
     open_bounds_count: int,
 ) -> list[ForecastScore]:
-    forecast_scores: list[float] = []
-    for forecast in forecasts:
-        start = forecast.start_time.timestamp()
-        end = (
-            float("inf") if forecast.end_time is None else forecast.end_time.timestamp()
-        )
-        if start <= spot_forecast_timestamp < end:
-            pmf = forecast.get_pmf()
-            if question_type in ["binary", "multiple_choice"]:
-                forecast_score = (
-                    100 * np.log(pmf[resolution_bucket] * len(pmf)) / np.log(len(pmf))
-                )
-            else:
-                if resolution_bucket in [0, len(pmf) - 1]:
-                    baseline = 0.05
-                else:
-                    baseline = (1 - 0.05 * open_bounds_count) / (len(pmf) - 2)
-                forecast_score = 100 * np.log(pmf[resolution_bucket] / baseline) / 2
-            forecast_scores.append(ForecastScore(forecast_score, 1.0))
-        else:
-            forecast_scores.append(ForecastScore(0))
-    return forecast_scores
+    if not forecasts:
+        return []
+    starts, ends = get_forecast_times(forecasts)
+    active = (starts <= spot_forecast_timestamp) & (spot_forecast_timestamp < ends)
+    pmfs = get_pmf_matrix(forecasts)
+    scores = get_baseline_scores(
+        pmfs[:, resolution_bucket],
+        pmfs.shape[1],
+        resolution_bucket,
+        question_type,
+        open_bounds_count,
+    )
+    return [
+        ForecastScore(score, 1.0) if is_active else ForecastScore(0)
+        for score, is_active in zip(scores.tolist(), active.tolist())
+    ]
 
 
 def evaluate_forecasts_peer_accuracy(
@@ -177,47 +225,82 @@ def evaluate_forecasts_peer_accuracy(
     for gm in geometric_mean_forecasts:
         gm.timestamp = max(gm.timestamp, forecast_horizon_start)
     total_duration = forecast_horizon_end - forecast_horizon_start
-    forecast_scores: list[float] = []
-    for forecast in forecasts:
-        forecast_start = max(forecast.start_time.timestamp(), forecast_horizon_start)
-        forecast_end = (
-            actual_close_time
-            if forecast.end_time is None
-            else min(forecast.end_time.timestamp(), actual_close_time)
+    if not forecasts:
+        return []
+
+    # geometric mean i is held over the interval from its timestamp to the next
+    # one (or the close time), forecasts are scored on the intervals starting
+    # while they are active. Those form a contiguous range of intervals.
+    gm_timestamps = np.array([gm.timestamp for gm in geometric_mean_forecasts])
+    interval_count = int(np.count_nonzero(gm_timestamps < actual_close_time))
+    durations = np.diff(np.append(gm_timestamps[:interval_count], actual_close_time))
+    factors = np.array(
+        [
+            gm.num_forecasters / (gm.num_forecasters - 1)
+            for gm in geometric_mean_forecasts[:interval_count]
+        ]
+    )
+    gm_probabilities = np.array(
+        [gm.pmf[resolution_bucket] for gm in geometric_mean_forecasts[:interval_count]]
+    )
+
+    starts, ends = get_forecast_times(forecasts)
+    starts = np.maximum(starts, forecast_horizon_start)
+    ends = np.minimum(ends, actual_close_time)
+    probabilities = get_pmf_matrix(forecasts)[:, resolution_bucket]
+    first = np.searchsorted(gm_timestamps[:interval_count], starts)
+    last = np.searchsorted(gm_timestamps[:interval_count], ends)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_gm_probabilities = np.log(gm_probabilities)
+        log_probabilities = np.log(probabilities)
+
+    def cumulative(values: np.ndarray) -> np.ndarray:
+        return np.concatenate([[0], np.cumsum(values)])
+
+    # sum over the range of intervals of score * duration, split into the part
+    # depending on the forecast and the one depending on the geometric means
+    finite = np.isfinite(log_gm_probabilities)
+    weighted_durations = cumulative(factors * durations)
+    weighted_log_gms = cumulative(
+        factors * durations * np.where(finite, log_gm_probabilities, 0)
+    )
+    coverages = cumulative(durations)
+    non_finite_counts = cumulative(~finite)
+
+    scale = 100 / total_duration
+    if question_type in ["numeric", "date"]:
+        scale /= 2
+    with np.errstate(invalid="ignore"):
+        scores = scale * (
+            log_probabilities * (weighted_durations[last] - weighted_durations[first])
+            - (weighted_log_gms[last] - weighted_log_gms[first])
         )
-        if (forecast_end - forecast_start) <= 0:
+    coverages = (coverages[last] - coverages[first]) / total_duration
+    active = ends - starts > 0
+
+    forecast_scores: list[ForecastScore] = []
+    for i in range(len(forecasts)):
+        if not active[i]:
             forecast_scores.append(ForecastScore(0))
             continue
-
-        pmf = forecast.get_pmf()
-        interval_scores: list[float | None] = []
-        for gm in geometric_mean_forecasts:
-            if forecast_start <= gm.timestamp < forecast_end:
+        if non_finite_counts[last[i]] > non_finite_counts[first[i]] or not np.isfinite(
+            log_probabilities[i]
+        ):
+            # infinite log scores, keep their exact interval by interval behaviour
+            forecast_score = 0
+            forecast_coverage = 0
+            for j in range(first[i], last[i]):
                 score = (
-                    100
-                    * (gm.num_forecasters / (gm.num_forecasters - 1))
-                    * np.log(pmf[resolution_bucket] / gm.pmf[resolution_bucket])
+                    100 * factors[j] * np.log(probabilities[i] / gm_probabilities[j])
                 )
                 if question_type in ["numeric", "date"]:
                     score /= 2
-                interval_scores.append(score)
-            else:
-                interval_scores.append(None)
-
-        forecast_score = 0
-        forecast_coverage = 0
-        times = [
-            gm.timestamp
-            for gm in geometric_mean_forecasts
-            if gm.timestamp < actual_close_time
-        ] + [actual_close_time]
-        for i in range(len(times) - 1):
-            if interval_scores[i] is None:
-                continue
-            interval_duration = times[i + 1] - times[i]
-            forecast_score += interval_scores[i] * interval_duration / total_duration
-            forecast_coverage += interval_duration / total_duration
-        forecast_scores.append(ForecastScore(forecast_score, forecast_coverage))
+                forecast_score += score * durations[j] / total_duration
+                forecast_coverage += durations[j] / total_duration
+            forecast_scores.append(ForecastScore(forecast_score, forecast_coverage))
+            continue
+        forecast_scores.append(ForecastScore(scores[i], coverages[i]))
 
     return forecast_scores
 
@@ -238,30 +321,28 @@ def evaluate_forecasts_peer_spot_forecast(
     g = None
     for gm in geometric_mean_forecasts[::-1]:
         if gm.timestamp < spot_forecast_timestamp:
-            g = gm.pmf
+            g = gm
             break
-    if g is None:
+    if g is None or not forecasts:
         return [ForecastScore(0)] * len(forecasts)
 
-    forecast_scores: list[float] = []
-    for forecast in forecasts:
-        start = forecast.start_time.timestamp()
-        end = (
-            float("inf") if forecast.end_time is None else forecast.end_time.timestamp()
-        )
-        if start <= spot_forecast_timestamp < end:
-            pmf = forecast.get_pmf()
-            forecast_score = (
-                100
-                * (gm.num_forecasters / (gm.num_forecasters - 1))
-                * np.log(pmf[resolution_bucket] / gm.pmf[resolution_bucket])
+    starts, ends = get_forecast_times(forecasts)
+    active = (starts <= spot_forecast_timestamp) & (spot_forecast_timestamp < ends)
+    with np.errstate(divide="ignore"):
+        scores = (
+            100
+            * (g.num_forecasters / (g.num_forecasters - 1))
+            * np.log(
+                get_pmf_matrix(forecasts)[:, resolution_bucket]
+                / g.pmf[resolution_bucket]
             )
-            if question_type in ["numeric", "date"]:
-                forecast_score /= 2
-            forecast_scores.append(ForecastScore(forecast_score, 1.0))
-        else:
-            forecast_scores.append(ForecastScore(0))
-    return forecast_scores
+        )
+    if question_type in ["numeric", "date"]:
+        scores /= 2
+    return [
+        ForecastScore(score, 1.0) if is_active else ForecastScore(0)
+        for score, is_active in zip(scores.tolist(), active.tolist())
+    ]
 
 
 def evaluate_forecasts_legacy_relative(
@@ -271,50 +352,69 @@ def evaluate_forecasts_legacy_relative(
     forecast_horizon_start: float,
     actual_close_time: float,
 ) -> list[ForecastScore]:
-    baseline_forecasts = [
-        AggregationEntry(
-            timestamp=max(bf.start_time.timestamp(), forecast_horizon_start),
-            pmf=bf.get_pmf(),
-            num_forecasters=bf.forecaster_count,
-        )
-        for bf in base_forecasts
-    ]
+    if not forecasts:
+        return []
     total_duration = actual_close_time - forecast_horizon_start
-    forecast_scores: list[float] = []
-    for forecast in forecasts:
-        forecast_start = max(forecast.start_time.timestamp(), forecast_horizon_start)
-        forecast_end = (
-            actual_close_time
-            if forecast.end_time is None
-            else min(forecast.end_time.timestamp(), actual_close_time)
-        )
-        if (forecast_end - forecast_start) <= 0:
+
+    # base forecast i is held over the interval from its start to the next one
+    # (or the close time), forecasts are scored on the intervals starting while
+    # they are active. Those form a contiguous range of intervals.
+    base_starts, _ = get_forecast_times(base_forecasts)
+    base_starts = np.maximum(base_starts, forecast_horizon_start)
+    interval_count = int(np.count_nonzero(base_starts < actual_close_time))
+    base_starts = base_starts[:interval_count]
+    durations = np.diff(np.append(base_starts, actual_close_time))
+    base_probabilities = get_pmf_matrix(base_forecasts[:interval_count])
+    base_probabilities = (
+        base_probabilities[:, resolution_bucket] if interval_count else np.empty(0)
+    )
+
+    starts, ends = get_forecast_times(forecasts)
+    starts = np.maximum(starts, forecast_horizon_start)
+    ends = np.minimum(ends, actual_close_time)
+    probabilities = get_pmf_matrix(forecasts)[:, resolution_bucket]
+    first = np.searchsorted(base_starts, starts)
+    last = np.searchsorted(base_starts, ends)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_base_probabilities = np.log2(base_probabilities)
+        log_probabilities = np.log2(probabilities)
+
+    def cumulative(values: np.ndarray) -> np.ndarray:
+        return np.concatenate([[0], np.cumsum(values)])
+
+    finite = np.isfinite(log_base_probabilities)
+    coverages = cumulative(durations)
+    weighted_log_bases = cumulative(
+        durations * np.where(finite, log_base_probabilities, 0)
+    )
+    non_finite_counts = cumulative(~finite)
+    with np.errstate(invalid="ignore"):
+        scores = (
+            log_probabilities * (coverages[last] - coverages[first])
+            - (weighted_log_bases[last] - weighted_log_bases[first])
+        ) / total_duration
+    coverages = (coverages[last] - coverages[first]) / total_duration
+    active = ends - starts > 0
+
+    forecast_scores: list[ForecastScore] = []
+    for i in range(len(forecasts)):
+        if not active[i]:
             forecast_scores.append(ForecastScore(0))
             continue
-
-        pmf = forecast.get_pmf()
-        interval_scores: list[float | None] = []
-        for bf in baseline_forecasts:
-            if forecast_start <= bf.timestamp < forecast_end:
-                score = np.log2(pmf[resolution_bucket] / bf.pmf[resolution_bucket])
-                interval_scores.append(score)
-            else:
-                interval_scores.append(None)
-
-        forecast_score = 0
-        forecast_coverage = 0
-        times = [
-            bf.timestamp
-            for bf in baseline_forecasts
-            if bf.timestamp < actual_close_time
-        ] + [actual_close_time]
-        for i in range(len(times) - 1):
-            if interval_scores[i] is None:
-                continue
-            interval_duration = times[i + 1] - times[i]
-            forecast_score += interval_scores[i] * interval_duration / total_duration
-            forecast_coverage += interval_duration / total_duration
-        forecast_scores.append(ForecastScore(forecast_score, forecast_coverage))
+        if non_finite_counts[last[i]] > non_finite_counts[first[i]] or not np.isfinite(
+            log_probabilities[i]
+        ):
+            # infinite log scores, keep their exact interval by interval behaviour
+            forecast_score = 0
+            forecast_coverage = 0
+            for j in range(first[i], last[i]):
+                score = np.log2(probabilities[i] / base_probabilities[j])
+                forecast_score += score * durations[j] / total_duration
+                forecast_coverage += durations[j] / total_duration
+            forecast_scores.append(ForecastScore(forecast_score, forecast_coverage))
+            continue
+        forecast_scores.append(ForecastScore(scores[i], coverages[i]))
 
     return forecast_scores
 
@@ -347,6 +447,13 @@ def evaluate_question(
             user_forecasts, include_bots=question.include_bots_in_aggregates
         )
 
+    # position of the author of each forecast in user_ids, to sum the scores
+    # of each user at once
+    user_ids, user_indexes = np.unique(
+        np.array([forecast.author_id for forecast in user_forecasts], dtype=int),
+        return_inverse=True,
+    )
+
     scores: list[Score] = []
     for score_type in score_types:
         match score_type:
@@ -446,14 +553,19 @@ def evaluate_question(
             case other:
                 raise NotImplementedError(f"Score type {other} not implemented")
 
-        user_ids = {forecast.author_id for forecast in user_forecasts}
-        for user_id in user_ids:
-            user_score = 0
-            user_coverage = 0
-            for forecast, score in zip(user_forecasts, user_scores):
-                if forecast.author_id == user_id:
-                    user_score += score.score
-                    user_coverage += score.coverage
+        user_score_sums = np.bincount(
+            user_indexes,
+            weights=[score.score for score in user_scores],
+            minlength=len(user_ids),
+        )
+        user_coverage_sums = np.bincount(
+            user_indexes,
+            weights=[score.coverage for score in user_scores],
+            minlength=len(user_ids),
+        )
+        for user_id, user_score, user_coverage in zip(
+            user_ids.tolist(), user_score_sums.tolist(), user_coverage_sums.tolist()
+        ):
             if user_coverage > 0:
                 scores.append(
                     Score(
@@ -6,13 +6,22 @@ from io import StringIO
 
 import numpy as np
 from django.db import transaction
-from django.db.models import QuerySet, Q, Sum, IntegerField, OuterRef, Exists
+from django.db.models import (
+    Count,
+    Exists,
+    IntegerField,
+    OuterRef,
+    Q,
+    QuerySet,
+    Sum,
+)
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 from sql_util.aggregates import SubqueryAggregate
 
 from comments.models import Comment
 from posts.models import Post
+from posts.services.cache import bump_question_posts_cache_versions
 from projects.models import Project
 from questions.models import Question, Forecast, QuestionPost
 from questions.types import AggregationMethod
@@ -23,27 +32,44 @@ from scoring.models import (
     Leaderboard,
     MedalExclusionRecord,
 )
+from scoring.reputation import invalidate_reputation_indexes
 from scoring.score_math import evaluate_question
 from users.models import User
+from users.services import update_profile_stats_from_question_scores
 from utils.dtypes import generate_map_from_list
 from utils.the_math.formulas import string_location_to_bucket_index
 from utils.the_math.measures import decimal_h_index
 
 
+def get_resolution_score_types(question: Question) -> list[str]:
+    """score types calculated when the question resolves"""
+    score_types = [
+        Score.ScoreTypes.BASELINE,
+        Score.ScoreTypes.PEER,
+        Score.ScoreTypes.RELATIVE_LEGACY,
+    ]
+    if question.cp_reveal_time:
+        score_types.append(Score.ScoreTypes.SPOT_PEER)
+    return score_types
+
+
 def score_question(
     question: Question,
     resolution: str,
     spot_forecast_time: float | None = None,
     score_types: list[str] | None = None,
-):
+) -> tuple[list[Score], list[Score]]:
+    """
+    Replaces the scores of the question, returns the previous and new scores
+    """
     resolution_bucket = string_location_to_bucket_index(resolution, question)
     spot_forecast_time = spot_forecast_time or (
         question.cp_reveal_time.timestamp() if question.cp_reveal_time else None
     )
     score_types = score_types or [c[0] for c in Score.ScoreTypes.choices]
 
-    previous_scores = Score.objects.filter(
-        question=question, score_type__in=score_types
+    previous_scores = list(
+        Score.objects.filter(question=question, score_type__in=score_types)
     )
     previous_scores_map = {
         (score.user_id, score.aggregation_method, score.score_type): score.id
@@ -66,9 +92,55 @@ def score_question(
         new_score.edited_at = question.resolution_set_time
 
     with transaction.atomic():
-        previous_scores.delete()
+        Score.objects.filter(question=question, score_type__in=score_types).delete()
         Score.objects.bulk_create(new_scores, batch_size=500)
 
+    bump_question_posts_cache_versions([question.pk])
+
+    if Score.ScoreTypes.PEER in score_types:
+        invalidate_reputation_indexes(
+            {user_id for user_id, _, _ in previous_scores_map}
+            | {score.user_id for score in new_scores}
+        )
+        update_profile_stats_from_question_scores(question, previous_scores, new_scores)
+
+    return previous_scores, new_scores
+
+
+# leaderboards whose entries only depend on the scores of their own user
+INCREMENTAL_LEADERBOARD_SCORE_TYPES = [
+    Leaderboard.ScoreTypes.PEER_GLOBAL,
+    Leaderboard.ScoreTypes.PEER_GLOBAL_LEGACY,
+    Leaderboard.ScoreTypes.PEER_TOURNAMENT,
+    Leaderboard.ScoreTypes.SPOT_PEER_TOURNAMENT,
+    Leaderboard.ScoreTypes.BASELINE_GLOBAL,
+]
+
+
+def get_leaderboard_entry_divisor(
+    leaderboard: Leaderboard, entry: LeaderboardEntry
+) -> float:
+    """the sum of the scores of an entry is divided by this to get its score"""
+    match leaderboard.score_type:
+        case Leaderboard.ScoreTypes.PEER_GLOBAL:
+            return max(30, entry.coverage)
+        case Leaderboard.ScoreTypes.PEER_GLOBAL_LEGACY:
+            return max(40, entry.contribution_count)
+    return 1
+
+
+def set_leaderboard_entry_score(
+    leaderboard: Leaderboard, entry: LeaderboardEntry, score_sum: float
+):
+    """sets the score and take of an entry from the sum of its scores,
+    coverage and contribution_count must be set already"""
+    entry.score = score_sum / get_leaderboard_entry_divisor(leaderboard, entry)
+    if leaderboard.score_type in (
+        Leaderboard.ScoreTypes.PEER_TOURNAMENT,
+        Leaderboard.ScoreTypes.SPOT_PEER_TOURNAMENT,
+    ):
+        entry.take = max(entry.score, 0) ** 2
+
 
 def generate_scoring_leaderboard_entries(
     questions: list[Question],
@@ -97,12 +169,21 @@ def generate_scoring_leaderboard_entries(
             question__scheduled_close_time__lte=leaderboard.finalize_time
         )
 
-    calculated_scores = calculated_scores.annotate(
-        archived_exists=Exists(archived_scores_subquery)
-    ).filter(archived_exists=False)
+    calculated_scores = calculated_scores.filter(~Exists(archived_scores_subquery))
 
-    scores = list(archived_scores) + list(calculated_scores)
-    scores = sorted(scores, key=lambda x: x.user_id or x.score)
+    # scores are summed in the database, one row per user or aggregation method
+    # for each of the archived and calculated scores
+    totals = [
+        row
+        for scores in [archived_scores, calculated_scores]
+        for row in scores.values("user_id", "aggregation_method")
+        .annotate(
+            score_sum=Sum("score"),
+            coverage_sum=Sum("coverage"),
+            count=Count("id"),
+        )
+        .order_by("user_id", "aggregation_method")
+    ]
 
     entries: dict[int | AggregationMethod, LeaderboardEntry] = {}
     now = timezone.now()
@@ -113,32 +194,23 @@ def generate_scoring_leaderboard_entries(
             if q.resolution and q.resolution not in ["annulled", "ambiguous"]
         ]
     )
-    for score in scores:
-        identifier = score.user_id or score.aggregation_method
+    for row in totals:
+        identifier = row["user_id"] or row["aggregation_method"]
         if identifier not in entries:
             entries[identifier] = LeaderboardEntry(
-                user_id=score.user_id,
-                aggregation_method=score.aggregation_method,
+                user_id=row["user_id"],
+                aggregation_method=row["aggregation_method"],
                 score=0,
                 coverage=0,
                 contribution_count=0,
                 calculated_on=now,
             )
-        entries[identifier].score += score.score
-        entries[identifier].coverage += score.coverage
-        entries[identifier].contribution_count += 1
-    if leaderboard.score_type == Leaderboard.ScoreTypes.PEER_GLOBAL:
-        for entry in entries.values():
-            entry.score /= max(30, entry.coverage)
-    elif leaderboard.score_type == Leaderboard.ScoreTypes.PEER_GLOBAL_LEGACY:
+        entries[identifier].score += row["score_sum"]
+        entries[identifier].coverage += row["coverage_sum"]
+        entries[identifier].contribution_count += row["count"]
+    if leaderboard.score_type in INCREMENTAL_LEADERBOARD_SCORE_TYPES:
         for entry in entries.values():
-            entry.score /= max(40, entry.contribution_count)
-    elif leaderboard.score_type in (
-        Leaderboard.ScoreTypes.PEER_TOURNAMENT,
-        Leaderboard.ScoreTypes.SPOT_PEER_TOURNAMENT,
-    ):
-        for entry in entries.values():
-            entry.take = max(entry.score, 0) ** 2
+            set_leaderboard_entry_score(leaderboard, entry, entry.score)
     elif leaderboard.score_type == Leaderboard.ScoreTypes.RELATIVE_LEGACY_TOURNAMENT:
         for entry in entries.values():
             entry.coverage /= maximum_coverage
@@ -403,6 +475,183 @@ def update_project_leaderboard(
     # new entries
     new_entries = generate_project_leaderboard(project, leaderboard)
 
+    return save_leaderboard_entries(leaderboard, new_entries)
+
+
+def update_leaderboard_from_question_scores(
+    project: Project,
+    leaderboard: Leaderboard,
+    question: Question,
+    previous_scores: list[Score],
+    new_scores: list[Score],
+) -> list[LeaderboardEntry]:
+    """
+    Updates the leaderboard with the change of the scores of a single question
+    (see score_question), then re-ranks its entries. The scores of the other
+    questions of the leaderboard are not read again.
+
+    Leaderboards whose entries depend on more than the scores of their own user
+    are fully rebuilt, as are leaderboards of questions with archived scores,
+    which take precedence over the calculated ones in the full rebuild.
+    Full rebuilds also reconcile the incremental updates,
+    see scoring.jobs.job_update_leaderboards.
+
+    The leaderboard row is locked until the entries are saved, so concurrent
+    updates of the same leaderboard are applied one after the other.
+    """
+    with transaction.atomic():
+        leaderboard = Leaderboard.objects.select_for_update().get(pk=leaderboard.pk)
+
+        if (
+            leaderboard.score_type not in INCREMENTAL_LEADERBOARD_SCORE_TYPES
+            or ArchivedScore.objects.filter(
+                question=question,
+                score_type=Leaderboard.ScoreTypes.get_base_score(
+                    leaderboard.score_type
+                ),
+            ).exists()
+        ):
+            return update_project_leaderboard(project, leaderboard)
+
+        leaderboard.project = project
+        leaderboard.save()
+
+        return _update_leaderboard_entries_from_question_scores(
+            leaderboard, question, previous_scores, new_scores
+        )
+
+
+def _update_leaderboard_entries_from_question_scores(
+    leaderboard: Leaderboard,
+    question: Question,
+    previous_scores: list[Score],
+    new_scores: list[Score],
+) -> list[LeaderboardEntry]:
+    entries = {
+        (entry.user_id, entry.aggregation_method): entry
+        for entry in leaderboard.entries.all()
+    }
+    # Same questions as the full rebuild,
+    # see generate_scoring_leaderboard_entries
+    if (
+        leaderboard.finalize_time
+        and question.scheduled_close_time > leaderboard.finalize_time
+    ) or not leaderboard.get_questions_queryset().filter(pk=question.pk).exists():
+        # the question doesn't count for this leaderboard
+        return list(entries.values())
+
+    score_type = Leaderboard.ScoreTypes.get_base_score(leaderboard.score_type)
+    score_sums = {
+        key: entry.score * get_leaderboard_entry_divisor(leaderboard, entry)
+        for key, entry in entries.items()
+    }
+    changed_keys = set()
+    for scores, sign in [(previous_scores, -1), (new_scores, 1)]:
+        for score in scores:
+            if score.score_type != score_type:
+                continue
+            key = (score.user_id, score.aggregation_method)
+            if key not in entries:
+                entries[key] = LeaderboardEntry(
+                    user_id=score.user_id,
+                    aggregation_method=score.aggregation_method,
+                    score=0,
+                    coverage=0,
+                    contribution_count=0,
+                )
+                score_sums[key] = 0
+            entry = entries[key]
+            score_sums[key] += sign * score.score
+            entry.coverage += sign * score.coverage
+            entry.contribution_count += sign
+            changed_keys.add(key)
+
+    updated_entries = []
+    for key, entry in entries.items():
+        if entry.contribution_count <= 0:
+            # all the scores of the entry were removed
+            continue
+        if key in changed_keys:
+            set_leaderboard_entry_score(leaderboard, entry, score_sums[key])
+        # ranks, medals and prizes are assigned again
+        entry.rank = None
+        entry.excluded = False
+        entry.medal = None
+        entry.percent_prize = None
+        entry.prize = None
+        updated_entries.append(entry)
+
+    return save_leaderboard_entries(leaderboard, updated_entries)
+
+
+def get_question_leaderboards(
+    question: Question,
+) -> list[tuple[Project, Leaderboard]]:
+    """
+    Returns the leaderboards which depend on the scores of the question,
+    each with the project it is generated for
+    """
+
+    post = question.get_post()
+    leaderboards = []
+
+    for project in [post.default_project] + list(post.projects.all()):
+        if project.type == Project.ProjectTypes.SITE_MAIN:
+            continue
+
+        leaderboards += [
+            (project, leaderboard) for leaderboard in project.leaderboards.all()
+        ]
+
+    main_site_project = post.projects.filter(
+        type=Project.ProjectTypes.SITE_MAIN
+    ).first()
+    global_leaderboard_window = (
+        question.get_global_leaderboard_dates() if main_site_project else None
+    )
+
+    if global_leaderboard_window is not None:
+        global_leaderboards = Leaderboard.objects.filter(
+            project__type=Project.ProjectTypes.SITE_MAIN,
+            start_time=global_leaderboard_window[0],
+            end_time=global_leaderboard_window[1],
+        ).exclude(
+            score_type__in=[
+                Leaderboard.ScoreTypes.COMMENT_INSIGHT,
+                Leaderboard.ScoreTypes.QUESTION_WRITING,
+            ]
+        )
+        leaderboards += [
+            (main_site_project, leaderboard) for leaderboard in global_leaderboards
+        ]
+
+    return leaderboards
+
+
+def update_leaderboards_from_question_scores(
+    question: Question,
+    previous_scores: list[Score],
+    new_scores: list[Score],
+):
+    """
+    Updates all the leaderboards of the question after it was (un)resolved
+    """
+
+    for project, leaderboard in get_question_leaderboards(question):
+        update_leaderboard_from_question_scores(
+            project, leaderboard, question, previous_scores, new_scores
+        )
+
+
+def save_leaderboard_entries(
+    leaderboard: Leaderboard, new_entries: list[LeaderboardEntry]
+) -> list[LeaderboardEntry]:
+    """
+    Assigns ranks, prizes and medals to the entries,
+    then replaces the entries of the leaderboard with them
+    """
+    project = leaderboard.project
+
     # assign ranks - also applies exclusions
     new_entries = assign_ranks(
         new_entries,
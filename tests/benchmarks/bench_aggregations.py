@@ -0,0 +1,228 @@
+"""
+End to end timings of the aggregation and scoring pipeline on synthetic
+binary, multiple choice and numeric questions (see generators.py).
+Results are emitted as JSON so runs can be compared across commits.
+
+Functions other than calculate_aggregation_entry read the question from the
+database: each case is written inside a transaction that is rolled back once
+it has been timed.
+
+Usage:
+    python -m tests.benchmarks.bench_aggregations \
+        [--sizes tiny small] [--types binary] [--functions evaluate_question] \
+        [--repeat 3] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "metaculus_web.settings")
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.db import transaction  # noqa: E402
+
+from questions.services import build_question_forecasts  # noqa: E402
+from questions.types import AggregationMethod  # noqa: E402
+from scoring.models import Score  # noqa: E402
+from scoring.score_math import evaluate_question  # noqa: E402
+from tests.benchmarks.generators import (  # noqa: E402
+    QUESTION_TYPES,
+    SIZES,
+    SyntheticQuestion,
+    generate_question,
+    persist_question,
+)
+from utils.the_math.aggregations import (  # noqa: E402
+    ForecastRows,
+    calculate_aggregation_entry,
+    generate_recency_weights,
+    get_aggregation_history,
+    get_user_forecast_history,
+)
+from utils.the_math.formulas import string_location_to_bucket_index  # noqa: E402
+
+
+class Rollback(Exception):
+    pass
+
+
+def bench_calculate_aggregation_entry(synthetic: SyntheticQuestion):
+    # the largest forecast set of the history. Users are not saved, so the
+    # forecasts are numbered instead
+    forecasts = synthetic.forecasts
+    history = get_user_forecast_history(
+        ForecastRows(
+            author_ids=np.arange(len(forecasts)),
+            start_times=[f.start_time for f in forecasts],
+            end_times=[f.end_time for f in forecasts],
+            forecasts_values=np.array([f.get_prediction_values() for f in forecasts]),
+        )
+    )
+    forecast_set = history.get_forecast_set(int(history.get_active_counts().argmax()))
+    weights = generate_recency_weights(len(forecast_set.forecasts_values))
+
+    def run():
+        calculate_aggregation_entry(
+            forecast_set,
+            synthetic.question.type,
+            weights,
+            method=AggregationMethod.RECENCY_WEIGHTED,
+            include_stats=True,
+            histogram=True,
+        )
+
+    return run
+
+
+def bench_get_aggregation_history(synthetic: SyntheticQuestion):
+    def run():
+        get_aggregation_history(
+            synthetic.question,
+            [AggregationMethod.RECENCY_WEIGHTED, AggregationMethod.UNWEIGHTED],
+            minimize=False,
+        )
+
+    return run
+
+
+def bench_evaluate_question(synthetic: SyntheticQuestion):
+    question = synthetic.question
+    resolution_bucket = string_location_to_bucket_index(question.resolution, question)
+
+    def run():
+        evaluate_question(
+            question,
+            resolution_bucket,
+            [
+                Score.ScoreTypes.BASELINE,
+                Score.ScoreTypes.PEER,
+                Score.ScoreTypes.RELATIVE_LEGACY,
+            ],
+        )
+
+    return run
+
+
+def bench_build_question_forecasts(synthetic: SyntheticQuestion):
+    def run():
+        build_question_forecasts(synthetic.question, full_rebuild=True)
+
+    return run
+
+
+BENCHMARKS = {
+    "calculate_aggregation_entry": (bench_calculate_aggregation_entry, False),
+    "get_aggregation_history": (bench_get_aggregation_history, True),
+    "evaluate_question": (bench_evaluate_question, True),
+    "build_question_forecasts": (bench_build_question_forecasts, True),
+}
+
+
+def timeit(f, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_case(
+    question_type: str, size: str, functions: list[str], repeat: int, seed: int
+) -> dict:
+    forecasts, users = SIZES[size]
+    synthetic = generate_question(question_type, forecasts, users, seed=seed)
+    timings = {}
+
+    for name in functions:
+        setup, needs_database = BENCHMARKS[name]
+        if not needs_database:
+            timings[name] = timeit(setup(synthetic), repeat)
+
+    database_functions = [name for name in functions if BENCHMARKS[name][1]]
+    if database_functions:
+        try:
+            with transaction.atomic():
+                persist_question(synthetic)
+                for name in database_functions:
+                    timings[name] = timeit(BENCHMARKS[name][0](synthetic), repeat)
+                raise Rollback
+        except Rollback:
+            pass
+
+    return {
+        "question_type": question_type,
+        "size": size,
+        "forecasts": forecasts,
+        "users": users,
+        # best of `repeat` runs, in seconds
+        "timings": {name: timings[name] for name in functions},
+    }
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=list(SIZES))
+    parser.add_argument(
+        "--types", nargs="+", choices=QUESTION_TYPES, default=QUESTION_TYPES
+    )
+    parser.add_argument(
+        "--functions", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS)
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the JSON results to")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        for question_type in args.types:
+            result = run_case(
+                question_type, size, args.functions, args.repeat, args.seed
+            )
+            print(
+                f"{size:>8} {question_type:>16} "
+                + " ".join(f"{k}={v:.3f}s" for k, v in result["timings"].items()),
+                file=sys.stderr,
+            )
+            results.append(result)
+
+    report = json.dumps(
+        {
+            "commit": get_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "results": results,
+        },
+        indent=2,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
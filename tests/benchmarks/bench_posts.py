@@ -0,0 +1,142 @@
+"""
+Query counts and timings of `serialize_post_many` on pages of feed posts of
+increasing size, half of them groups of questions (see generators.py).
+Fails when the query count depends on the page size, or when the time per post
+grows with it by more than --max-slowdown.
+
+Posts are written inside a transaction that is rolled back once they have been
+timed. Cached post fragments are dropped before each cold run.
+
+Usage:
+    python -m tests.benchmarks.bench_posts \
+        [--sizes 10 50 100 200] [--repeat 3] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "metaculus_web.settings")
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from posts.serializers import serialize_post_many  # noqa: E402
+from posts.services.cache import bump_post_cache_versions  # noqa: E402
+from tests.benchmarks.bench_aggregations import Rollback, get_commit  # noqa: E402
+from tests.benchmarks.generators import persist_feed_posts  # noqa: E402
+
+
+def bench_page(posts, cold: bool, repeat: int) -> tuple[int, float]:
+    """returns the query count and the best time of `repeat` runs"""
+    ids = [post.pk for post in posts]
+    author = posts[0].author
+    queries, best = None, float("inf")
+
+    for _ in range(repeat):
+        if cold:
+            bump_post_cache_versions(ids)
+
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as context:
+            serialize_post_many(ids, with_cp=True, current_user=author, group_cutoff=3)
+        best = min(best, time.perf_counter() - start)
+        queries = len(context)
+
+    return queries, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 50, 100, 200])
+    parser.add_argument("--group-size", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=2.0,
+        help="max ratio of the time per post of the largest and smallest pages",
+    )
+    parser.add_argument("--output", help="file to write the JSON results to")
+    args = parser.parse_args()
+    sizes = sorted(args.sizes)
+
+    results = []
+    try:
+        with transaction.atomic():
+            posts = persist_feed_posts(
+                sizes[-1], group_size=args.group_size, seed=args.seed
+            )
+            # Warms up the lookups cached for the whole process
+            bench_page(posts[:1], cold=True, repeat=1)
+
+            for size in sizes:
+                result = {"size": size}
+                for mode in ["cold", "warm"]:
+                    queries, seconds = bench_page(
+                        posts[:size], cold=mode == "cold", repeat=args.repeat
+                    )
+                    result[mode] = {"queries": queries, "seconds": seconds}
+                print(
+                    f"{size:>6} posts "
+                    + " ".join(
+                        f"{mode}={result[mode]['seconds']:.3f}s"
+                        f"/{result[mode]['queries']}q"
+                        for mode in ["cold", "warm"]
+                    ),
+                    file=sys.stderr,
+                )
+                results.append(result)
+            raise Rollback
+    except Rollback:
+        pass
+
+    errors = []
+    for mode in ["cold", "warm"]:
+        queries = {result[mode]["queries"] for result in results}
+        if len(queries) > 1:
+            errors.append(f"{mode} query count depends on the page size: {queries}")
+
+        smallest, largest = results[0], results[-1]
+        slowdown = (largest[mode]["seconds"] / largest["size"]) / (
+            smallest[mode]["seconds"] / smallest["size"]
+        )
+        if slowdown > args.max_slowdown:
+            errors.append(
+                f"{mode} time per post is {slowdown:.1f}x slower "
+                f"for {largest['size']} posts than for {smallest['size']}"
+            )
+
+    report = json.dumps(
+        {
+            "commit": get_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "group_size": args.group_size,
+            "results": results,
+            "errors": errors,
+        },
+        indent=2,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+    for error in errors:
+        print(error, file=sys.stderr)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
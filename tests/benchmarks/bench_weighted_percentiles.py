@@ -0,0 +1,93 @@
+"""
+Compares the per-timestep weighted_percentile_2d loop used to aggregate
+a forecast history against the batched weighted_percentile_3d kernel.
+
+Usage:
+    python -m tests.benchmarks.bench_weighted_percentiles
+"""
+
+import time
+
+import numpy as np
+
+from utils.the_math.measures import weighted_percentile_2d, weighted_percentile_3d
+
+PERCENTILES = [25.0, 50.0, 75.0]
+
+
+def generate_history(
+    timesteps: int, forecasters: int, outcomes: int, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """padded (timesteps, forecasters, outcomes) stack where the number of active
+    forecasters grows from 1 to `forecasters` over the history"""
+    rng = np.random.default_rng(seed)
+    values = rng.dirichlet(np.ones(outcomes), size=(timesteps, forecasters))
+    sizes = np.linspace(1, forecasters, timesteps).astype(int)
+    mask = np.arange(forecasters) < sizes[:, np.newaxis]
+    weights = np.exp(np.sqrt(np.arange(forecasters) + 1) - np.sqrt(sizes[:, None]))
+    return values, np.where(mask, weights, 0), mask
+
+
+def run_loop(values, weights, mask):
+    results = []
+    for set_values, set_weights, set_mask in zip(values, weights, mask):
+        # calculate_aggregation_entry computes the median and the quartiles
+        weighted_percentile_2d(set_values[set_mask], set_weights[set_mask], [50.0])
+        results.append(
+            weighted_percentile_2d(
+                set_values[set_mask], set_weights[set_mask], PERCENTILES
+            )
+        )
+    return np.array(results)
+
+
+def run_batched(values, weights, mask, chunk_size: int = 256):
+    results = []
+    for i in range(0, len(values), chunk_size):
+        chunk = slice(i, i + chunk_size)
+        size = mask[chunk].sum(axis=1).max()
+        results.append(
+            weighted_percentile_3d(
+                values[chunk, :size],
+                weights[chunk, :size],
+                mask[chunk, :size],
+                PERCENTILES,
+            ).transpose(1, 0, 2)
+        )
+    return np.concatenate(results)
+
+
+def timeit(f, *args, repeat: int = 3) -> tuple[float, np.ndarray]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    print(
+        f"{'timesteps':>10} {'forecasters':>12} {'outcomes':>9} "
+        f"{'loop (s)':>10} {'batched (s)':>12} {'speedup':>8}"
+    )
+    for timesteps, forecasters, outcomes in [
+        (100, 50, 2),
+        (1_000, 200, 2),
+        (5_000, 1_000, 2),
+        (1_000, 200, 5),
+        (5_000, 1_000, 10),
+    ]:
+        args = generate_history(timesteps, forecasters, outcomes)
+        loop_time, loop_result = timeit(run_loop, *args)
+        batched_time, batched_result = timeit(run_batched, *args)
+        np.testing.assert_allclose(batched_result, loop_result)
+        print(
+            f"{timesteps:>10} {forecasters:>12} {outcomes:>9} "
+            f"{loop_time:>10.3f} {batched_time:>12.3f} "
+            f"{loop_time / batched_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
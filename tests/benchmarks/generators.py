@@ -0,0 +1,205 @@
+"""
+Synthetic questions and forecast histories for the benchmarks.
+
+Forecasts are generated in memory, the way users forecast on the site: each new
+forecast of a user ends their previous one. `persist_question` writes a
+generated question to the database, `persist_feed_posts` a page of feed posts.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from posts.models import Post
+from questions.models import (
+    CDF_SIZE,
+    AggregateForecast,
+    Forecast,
+    GroupOfQuestions,
+    Question,
+)
+from questions.types import AggregationMethod
+from users.models import User
+
+# name: (forecasts, users)
+SIZES = {
+    "tiny": (10, 10),
+    "small": (1_000, 200),
+    "medium": (10_000, 2_000),
+    "large": (100_000, 20_000),
+}
+QUESTION_TYPES = ["binary", "multiple_choice", "numeric"]
+OPTIONS = ["a", "b", "c", "d", "e"]
+OPEN_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+CLOSE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class SyntheticQuestion:
+    question: Question
+    users: list[User]
+    forecasts: list[Forecast]
+
+
+def generate_prediction_values(
+    question_type: str, count: int, rng: np.random.Generator
+) -> list[dict]:
+    """keyword arguments setting the prediction of count forecasts"""
+    match question_type:
+        case "binary":
+            return [
+                {"probability_yes": p}
+                for p in np.round(rng.uniform(0.01, 0.99, count), 3).tolist()
+            ]
+        case "multiple_choice":
+            values = 0.01 + 0.95 * rng.dirichlet(np.ones(len(OPTIONS)), count)
+            values /= values.sum(axis=1, keepdims=True)
+            return [{"probability_yes_per_category": v} for v in values.tolist()]
+        case _:
+            # logistic cdfs, the question has open bounds on both sides
+            x = np.linspace(0, 1, CDF_SIZE)
+            locations = rng.uniform(0.2, 0.8, (count, 1))
+            scales = rng.uniform(0.02, 0.2, (count, 1))
+            cdfs = 1 / (1 + np.exp(-(x - locations) / scales))
+            cdfs = 0.01 + 0.98 * (cdfs - cdfs[:, :1]) / (cdfs[:, -1:] - cdfs[:, :1])
+            return [{"continuous_cdf": cdf} for cdf in cdfs.tolist()]
+
+
+def generate_question(
+    question_type: str, forecasts: int, users: int, seed: int = 0
+) -> SyntheticQuestion:
+    """unsaved question resolved at CLOSE_TIME, with forecasts spread over
+    its lifetime by randomly picked users"""
+    rng = np.random.default_rng(seed)
+    question = Question(
+        type=question_type,
+        title=f"Benchmark {question_type} question",
+        open_time=OPEN_TIME,
+        scheduled_close_time=CLOSE_TIME,
+        scheduled_resolve_time=CLOSE_TIME,
+        actual_close_time=CLOSE_TIME,
+        actual_resolve_time=CLOSE_TIME,
+        resolution_set_time=CLOSE_TIME,
+    )
+    match question_type:
+        case "binary":
+            question.resolution = "yes"
+        case "multiple_choice":
+            question.options = OPTIONS
+            question.resolution = OPTIONS[1]
+        case _:
+            question.range_min = 0
+            question.range_max = 100
+            question.open_lower_bound = True
+            question.open_upper_bound = True
+            question.resolution = "42.0"
+
+    authors = [
+        User(username=f"benchmark_{seed}_{i}", email=f"benchmark_{seed}_{i}@test.com")
+        for i in range(users)
+    ]
+    duration = (CLOSE_TIME - OPEN_TIME).total_seconds()
+    offsets = np.sort(rng.uniform(0, duration, forecasts))
+    # every user forecasts at least once when there are enough forecasts
+    author_indexes = rng.permutation(
+        np.concatenate(
+            [np.arange(min(users, forecasts)), rng.integers(0, users, forecasts)]
+        )[:forecasts]
+    )
+
+    generated: list[Forecast] = []
+    latest: dict[int, Forecast] = {}
+    for offset, author_index, prediction in zip(
+        offsets.tolist(),
+        author_indexes.tolist(),
+        generate_prediction_values(question_type, forecasts, rng),
+    ):
+        start_time = OPEN_TIME + timedelta(seconds=offset)
+        if previous := latest.get(author_index):
+            previous.end_time = start_time
+        forecast = Forecast(
+            question=question,
+            author=authors[author_index],
+            start_time=start_time,
+            **prediction,
+        )
+        latest[author_index] = forecast
+        generated.append(forecast)
+
+    return SyntheticQuestion(question, authors, generated)
+
+
+def persist_question(synthetic: SyntheticQuestion, batch_size: int = 5000):
+    """saves the question with a post, its users and its forecasts"""
+    from tests.unit.test_posts.factories import factory_post
+
+    User.objects.bulk_create(synthetic.users, batch_size=batch_size)
+    synthetic.question.save()
+    post = factory_post(author=synthetic.users[0], question=synthetic.question)
+    for forecast in synthetic.forecasts:
+        forecast.post = post
+    Forecast.objects.bulk_create(synthetic.forecasts, batch_size=batch_size)
+    post.update_forecasts_count()
+
+
+def persist_feed_posts(
+    count: int, group_size: int = 5, aggregations: int = 20, seed: int = 0
+) -> list[Post]:
+    """saves count public posts alternating between binary question and group
+    posts, each question with a recency weighted aggregation history"""
+    from questions.services import update_question_latest_aggregate
+    from tests.unit.test_posts.factories import factory_post
+    from tests.unit.test_projects.factories import factory_project
+    from tests.unit.test_questions.factories import create_question
+
+    rng = np.random.default_rng(seed)
+    author = User.objects.create(
+        username=f"benchmark_feed_{seed}", email=f"benchmark_feed_{seed}@test.com"
+    )
+    project = factory_project()
+    posts = []
+
+    for i in range(count):
+        if i % 2:
+            group = GroupOfQuestions.objects.create()
+            questions = [
+                create_question(question_type="binary", group=group)
+                for _ in range(group_size)
+            ]
+            post = factory_post(
+                author=author, group_of_questions=group, default_project=project
+            )
+        else:
+            questions = [create_question(question_type="binary")]
+            post = factory_post(
+                author=author, question=questions[0], default_project=project
+            )
+        posts.append(post)
+
+        for question in questions:
+            start_times = np.sort(
+                rng.uniform(0, (CLOSE_TIME - OPEN_TIME).total_seconds(), aggregations)
+            )
+            history = [
+                AggregateForecast(
+                    question=question,
+                    method=AggregationMethod.RECENCY_WEIGHTED,
+                    start_time=OPEN_TIME + timedelta(seconds=offset),
+                    forecast_values=[1 - p, p],
+                    interval_lower_bounds=[p * 0.9],
+                    centers=[p],
+                    interval_upper_bounds=[min(1.0, p * 1.1)],
+                    forecaster_count=10,
+                )
+                for offset, p in zip(
+                    start_times.tolist(),
+                    np.round(rng.uniform(0.01, 0.99, aggregations), 3).tolist(),
+                )
+            ]
+            AggregateForecast.objects.bulk_create(history)
+            update_question_latest_aggregate(
+                question, AggregationMethod.RECENCY_WEIGHTED, history[-1]
+            )
+
+    return posts
@@ -1,5 +1,6 @@
 import dramatiq
 import pytest
+from django.core.cache import cache
 
 
 @pytest.fixture(autouse=True)
@@ -7,6 +8,12 @@ def enable_db_access_for_all_tests(db):
     pass
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Cached post fragments are keyed by ids, which are reused between tests
+    cache.clear()
+
+
 @pytest.fixture
 def broker():
     broker = dramatiq.get_broker()
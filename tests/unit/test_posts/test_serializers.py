@@ -0,0 +1,130 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_dynamic_fixture import G
+
+from posts.models import Post, Vote
+from posts.serializers import serialize_post, serialize_post_many
+from posts.services.cache import (
+    bump_post_cache_versions,
+    get_post_cache_versions,
+    get_post_fragment_key,
+)
+from questions.models import GroupOfQuestions, Question
+from tests.unit.fixtures import *  # noqa
+from tests.unit.test_posts.factories import factory_post
+from tests.unit.test_projects.factories import factory_project
+from tests.unit.test_questions.factories import create_question, factory_forecast
+
+
+def test_serialize_post_many__fragment_cache(user1, user2):
+    question = create_question(question_type=Question.QuestionType.BINARY)
+    post = factory_post(
+        author=user1, question=question, default_project=factory_project()
+    )
+    factory_forecast(author=user1, question=question, post=post, probability_yes=0.7)
+
+    data = serialize_post_many([post], with_cp=True, current_user=user1)[0]
+    version = get_post_cache_versions([post.pk])[post.pk]
+
+    assert cache.get(get_post_fragment_key(post.pk, version, "1:None:0"))
+    assert len(data["question"]["my_forecasts"]["history"]) == 1
+    assert data["vote"] == {"score": 0, "user_vote": None}
+
+    # The cached fragment doesn't leak the fields of other users
+    data = serialize_post_many([post], with_cp=True, current_user=user2)[0]
+
+    assert get_post_cache_versions([post.pk])[post.pk] == version
+    assert data["question"]["my_forecasts"]["history"] == []
+    assert data["user_permission"] == post.default_project.default_permission
+
+    # Votes drop the cached fragment
+    Vote.objects.create(user=user2, post=post, direction=Vote.VoteDirection.UP)
+    post.update_vote_score()
+
+    assert get_post_cache_versions([post.pk])[post.pk] != version
+    assert serialize_post_many([post], current_user=user1)[0]["vote"] == {
+        "score": 1,
+        "user_vote": None,
+    }
+
+    data = serialize_post_many([post], with_cp=True, current_user=user2)[0]
+    post.user_permission = data["user_permission"]
+    post.user_vote = 1
+
+    assert data["vote"] == {"score": 1, "user_vote": 1}
+    # Matches the uncached serialization, which isn't prefetching user forecasts
+    data["question"].pop("my_forecasts")
+    assert data == serialize_post(post, with_cp=True, current_user=user2)
+
+
+def test_serialize_post_many__fragment_cache_relations(user1, user2):
+    project = factory_project(name="Before")
+    post = factory_post(author=user1, default_project=factory_project())
+    serialize_post_many([post])
+
+    def get_projects_names():
+        data = serialize_post_many([post])[0]
+        return [p["name"] for p in data["projects"].get("category", [])]
+
+    # Projects and coauthors are changed without saving the post
+    post.projects.add(project)
+    assert "Before" in get_projects_names()
+
+    project.name = "After"
+    project.save()
+    assert "After" in get_projects_names()
+
+    project.posts.clear()
+    assert "After" not in get_projects_names()
+
+    post.coauthors.add(user2)
+    assert [
+        c["username"] for c in serialize_post_many([post])[0]["coauthors"]
+    ] == [user2.username]
+
+
+@pytest.mark.parametrize("cp_sparkline", [False, True])
+def test_serialize_post_many__query_count(user1, cp_sparkline):
+    project = factory_project()
+    posts: list[Post] = []
+
+    for i in range(8):
+        if i % 2:
+            group = G(GroupOfQuestions)
+            for _ in range(3):
+                create_question(question_type=Question.QuestionType.BINARY, group=group)
+            posts.append(
+                factory_post(
+                    author=user1, group_of_questions=group, default_project=project
+                )
+            )
+        else:
+            question = create_question(question_type=Question.QuestionType.BINARY)
+            posts.append(
+                factory_post(author=user1, question=question, default_project=project)
+            )
+            factory_forecast(author=user1, question=question, post=posts[-1])
+
+    def count_queries(page: list[Post]) -> int:
+        # Serializes the page without cached fragments
+        bump_post_cache_versions([post.pk for post in page])
+
+        with CaptureQueriesContext(connection) as context:
+            data = serialize_post_many(
+                page,
+                with_cp=True,
+                current_user=user1,
+                with_subscriptions=True,
+                group_cutoff=2,
+                cp_sparkline=cp_sparkline,
+            )
+
+        assert [post["id"] for post in data] == [post.pk for post in page]
+        return len(context)
+
+    # Warms up the lookups cached for the whole process
+    count_queries(posts[:2])
+
+    assert count_queries(posts[:2]) == count_queries(posts[::-1])
@@ -9,7 +9,9 @@ from rest_framework.reverse import reverse
 from posts.models import Post, PostUserSnapshot, PostSubscription
 from projects.models import Project
 from projects.services import get_site_main_project
-from questions.models import Question
+from questions.models import AggregateForecast, Question
+from questions.services import update_question_latest_aggregate
+from questions.types import AggregationMethod
 from tests.unit.fixtures import *  # noqa
 from tests.unit.test_comments.factories import factory_comment
 from tests.unit.test_posts.factories import factory_post
@@ -239,6 +241,33 @@ def test_posts_list(anon_client):
     assert response.data
 
 
+def test_posts_list__cp_sparkline(user1, anon_client):
+    question = create_question(question_type=Question.QuestionType.BINARY)
+    factory_post(author=user1, question=question)
+    now = timezone.now()
+    for days, value in [(3, 0.2), (2, 0.4), (1, 0.6)]:
+        aggregate = AggregateForecast.objects.create(
+            question=question,
+            method=AggregationMethod.RECENCY_WEIGHTED,
+            start_time=now - datetime.timedelta(days=days),
+            forecast_values=[1 - value, value],
+            centers=[1 - value, value],
+        )
+    update_question_latest_aggregate(
+        question, AggregationMethod.RECENCY_WEIGHTED, aggregate
+    )
+
+    response = anon_client.get("/api/posts/?with_cp=true&cp_sparkline=true")
+
+    assert response.status_code == status.HTTP_200_OK
+    aggregation = response.data["results"][0]["question"]["aggregations"][
+        "recency_weighted"
+    ]
+    assert aggregation["history"] == []
+    assert aggregation["latest"]["forecast_values"] == [0.4, 0.6]
+    assert aggregation["sparkline"]["centers"] == [[0.2], [0.4], [0.6]]
+
+
 def test_posts_list__filters(user1, user1_client):
     url = reverse("post-list")
 
@@ -1,7 +1,12 @@
 from notifications.models import Notification
 from posts.models import Post
+from posts.services.common import get_post_permission_for_user
+from projects.models import ProjectUserPermission
 from projects.permissions import ObjectPermission
-from projects.services import notify_project_subscriptions_post_open
+from projects.services import (
+    invite_user_to_project,
+    notify_project_subscriptions_post_open,
+)
 from tests.unit.fixtures import *  # noqa
 from tests.unit.test_posts.factories import factory_post
 from tests.unit.test_projects.factories import factory_project
@@ -72,3 +77,48 @@ def test_notify_project_subscriptions_post_open__private_question(user1, user2):
             "recipient_id", flat=True
         )
     ) == {user1.pk}
+
+
+def test_projects_visibility(user1, user2):
+    project = factory_project(default_permission=None)
+    post = factory_post(author=user2, default_project=project)
+
+    def get_visible_ids(user=None):
+        return set(
+            Post.objects.filter_permission(user=user).values_list("id", flat=True)
+        )
+
+    assert post.id not in get_visible_ids(user1)
+    assert get_post_permission_for_user(post, user=user1) is None
+
+    # Cached visibility is dropped when users are invited
+    invite_user_to_project(project, user1, permission=ObjectPermission.CURATOR)
+
+    assert post.id in get_visible_ids(user1)
+    assert get_post_permission_for_user(post, user=user1) == ObjectPermission.CURATOR
+    assert (
+        Post.objects.annotate_user_permission(user=user1)
+        .get(pk=post.pk)
+        .user_permission
+        == ObjectPermission.CURATOR
+    )
+
+    # Bulk updates too
+    ProjectUserPermission.objects.filter(user=user1).update(
+        permission=ObjectPermission.VIEWER
+    )
+
+    assert get_post_permission_for_user(post, user=user1) == ObjectPermission.VIEWER
+
+    # And queryset deletes
+    ProjectUserPermission.objects.filter(user=user1, project=project).delete()
+
+    assert post.id not in get_visible_ids(user1)
+
+    # And when projects are made public
+    project.default_permission = ObjectPermission.VIEWER
+    project.save()
+
+    assert post.id in get_visible_ids()
+    assert get_post_permission_for_user(post, user=user1) == ObjectPermission.VIEWER
+    assert get_post_permission_for_user(post, user=user2) == ObjectPermission.CREATOR
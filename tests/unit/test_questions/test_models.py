@@ -0,0 +1,29 @@
+import numpy as np
+
+from questions.models import AggregateForecast, Forecast, get_pmf_matrix
+
+
+def test_get_pmf_matrix():
+    cdf = np.linspace(0.1, 0.9, 201)
+    forecasts = [Forecast(continuous_cdf=cdf.tolist()) for _ in range(3)]
+    cached_pmf = forecasts[1].get_pmf()
+
+    pmfs = get_pmf_matrix(forecasts)
+
+    assert pmfs.shape == (3, 202)
+    np.testing.assert_allclose(pmfs.sum(axis=1), 1)
+    np.testing.assert_allclose(pmfs[:, 0], 0.1)
+    np.testing.assert_allclose(pmfs[:, -1], 0.1)
+    np.testing.assert_allclose(pmfs[:, 1:-1], 0.004)
+    # pmfs are computed once, then reused
+    assert forecasts[1].get_pmf() is cached_pmf
+    np.testing.assert_array_equal(forecasts[0].get_pmf(), pmfs[0])
+    assert forecasts[0].get_pmf() is forecasts[0].get_pmf()
+
+    assert get_pmf_matrix(
+        [Forecast(probability_yes=0.25), Forecast(probability_yes=0.75)]
+    ).tolist() == [[0.75, 0.25], [0.25, 0.75]]
+    assert get_pmf_matrix([AggregateForecast(forecast_values=[0.5, 0.5])]).tolist() == [
+        [0.5, 0.5]
+    ]
+    assert get_pmf_matrix([]).shape == (0, 0)
@@ -0,0 +1,210 @@
+from datetime import timedelta
+
+import pytest  # noqa
+from django.core.cache import cache
+from django.utils import timezone
+
+from questions.models import AggregateForecast, QuestionLatestAggregate
+from questions.services import (
+    append_question_forecasts,
+    build_question_forecasts,
+    get_aggregation_sparklines_for_questions,
+    get_aggregations_at_time_for_questions,
+    get_latest_aggregated_forecasts_for_questions,
+    update_question_latest_aggregate,
+)
+from questions.types import AggregationMethod
+from tests.unit.fixtures import *  # noqa
+from tests.unit.test_posts.factories import factory_post
+from tests.unit.test_questions.factories import factory_forecast
+from tests.unit.test_questions.fixtures import *  # noqa
+from utils.the_math.aggregations import get_aggregation_history
+
+
+class TestBuildQuestionForecasts:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        cache.clear()
+
+    def get_stored_history(self, question):
+        history = [
+            (x.start_time, x.end_time, x.forecast_values, x.forecaster_count)
+            for x in AggregateForecast.objects.filter(
+                question=question, method=AggregationMethod.RECENCY_WEIGHTED
+            ).order_by("start_time")
+        ]
+        # the latest aggregation is kept in sync with the history
+        latest = QuestionLatestAggregate.objects.filter(
+            question=question, method=AggregationMethod.RECENCY_WEIGHTED
+        ).first()
+        assert (
+            latest
+            and (
+                latest.start_time,
+                latest.end_time,
+                latest.forecast_values,
+                latest.forecaster_count,
+            )
+        ) == (history[-1] if history else None)
+        return history
+
+    def test_append_matches_full_history(self, question_binary, user1, user2):
+        factory_post(author=user1, question=question_binary)
+        now = timezone.now()
+
+        factory_forecast(
+            author=user1,
+            question=question_binary,
+            start_time=now - timedelta(days=3),
+            end_time=now - timedelta(days=1),
+            probability_yes=0.4,
+        )
+        factory_forecast(
+            author=user2,
+            question=question_binary,
+            start_time=now - timedelta(days=2),
+            probability_yes=0.6,
+        )
+        build_question_forecasts(question_binary)
+
+        factory_forecast(
+            author=user1,
+            question=question_binary,
+            start_time=now - timedelta(hours=12),
+            probability_yes=0.8,
+        )
+
+        assert append_question_forecasts(question_binary)
+
+        expected = get_aggregation_history(
+            question_binary,
+            [AggregationMethod.RECENCY_WEIGHTED],
+            minimize=False,
+        )[AggregationMethod.RECENCY_WEIGHTED]
+
+        assert self.get_stored_history(question_binary) == [
+            (x.start_time, x.end_time, x.forecast_values, x.forecaster_count)
+            for x in expected
+        ]
+
+    def test_forecast_deletion_invalidates_state(self, question_binary, user1, user2):
+        factory_post(author=user1, question=question_binary)
+        now = timezone.now()
+
+        factory_forecast(
+            author=user1,
+            question=question_binary,
+            start_time=now - timedelta(days=3),
+            probability_yes=0.4,
+        )
+        forecast = factory_forecast(
+            author=user2,
+            question=question_binary,
+            start_time=now - timedelta(days=2),
+            probability_yes=0.6,
+        )
+        build_question_forecasts(question_binary)
+        forecast.delete()
+
+        assert not append_question_forecasts(question_binary)
+
+        build_question_forecasts(question_binary)
+        # the remaining entry is the current, open-ended aggregation
+        assert [
+            (start_time, end_time, forecaster_count)
+            for start_time, end_time, _, forecaster_count in self.get_stored_history(
+                question_binary
+            )
+        ] == [(now - timedelta(days=3), None, 1)]
+
+
+def test_get_aggregations_at_time_for_questions(
+    question_binary, question_numeric, user1
+):
+    factory_post(author=user1, question=question_binary)
+    now = timezone.now()
+
+    for start, end, value in [
+        (now - timedelta(days=10), now - timedelta(days=5), 0.25),
+        (now - timedelta(days=4), None, 0.75),
+    ]:
+        aggregate = AggregateForecast.objects.create(
+            question=question_binary,
+            method=AggregationMethod.RECENCY_WEIGHTED,
+            start_time=start,
+            end_time=end,
+            forecast_values=[1 - value, value],
+        )
+
+    def get_values(time):
+        aggregations = get_aggregations_at_time_for_questions(
+            [question_binary, question_numeric], time
+        )
+        # question_numeric has neither stored history nor forecasts
+        assert aggregations[question_numeric] is None
+        aggregation = aggregations[question_binary]
+        return aggregation and aggregation.forecast_values
+
+    assert get_values(now) == [0.25, 0.75]
+    assert get_values(now - timedelta(days=7)) == [0.75, 0.25]
+    # stored history without an active entry is not recomputed
+    assert get_values(now - timedelta(days=4, hours=12)) is None
+    assert get_values(now - timedelta(days=11)) is None
+
+    # the same, with the latest aggregation stored
+    update_question_latest_aggregate(
+        question_binary, AggregationMethod.RECENCY_WEIGHTED, aggregate
+    )
+    assert get_values(now) == [0.25, 0.75]
+    assert get_values(now - timedelta(days=7)) == [0.75, 0.25]
+    assert get_values(now - timedelta(days=4, hours=12)) is None
+    assert get_values(now - timedelta(days=11)) is None
+
+
+def test_get_aggregation_sparklines_for_questions(
+    question_binary, question_numeric, user1
+):
+    factory_post(author=user1, question=question_binary)
+    now = timezone.now()
+
+    for method, count in [
+        (AggregationMethod.RECENCY_WEIGHTED, 50),
+        (AggregationMethod.UNWEIGHTED, 3),
+    ]:
+        for i in range(count):
+            value = i / 100
+            aggregate = AggregateForecast.objects.create(
+                question=question_binary,
+                method=method,
+                start_time=now - timedelta(days=count - i),
+                end_time=now - timedelta(days=count - i - 1) if i < count - 1 else None,
+                forecast_values=[1 - value, value],
+                centers=[1 - value, value],
+            )
+        update_question_latest_aggregate(question_binary, method, aggregate)
+
+    sparklines = get_aggregation_sparklines_for_questions(
+        [question_binary, question_numeric], size=20
+    )
+
+    assert sparklines[question_numeric] == {}
+    # every third aggregation, counted from the latest one
+    sparkline = sparklines[question_binary][AggregationMethod.RECENCY_WEIGHTED]
+    assert sparkline["centers"] == [[i / 100] for i in range(1, 50, 3)]
+    assert sparkline["timestamps"] == sorted(sparkline["timestamps"])
+    assert sparkline["timestamps"][-1] == pytest.approx(
+        (now - timedelta(days=1)).timestamp()
+    )
+    sparkline = sparklines[question_binary][AggregationMethod.UNWEIGHTED]
+    assert sparkline["centers"] == [[0.0], [0.01], [0.02]]
+
+    latest = get_latest_aggregated_forecasts_for_questions(
+        [question_binary, question_numeric]
+    )
+    assert latest[question_numeric] == []
+    assert sorted(
+        (x.method, x.forecast_values[1]) for x in latest[question_binary]
+    ) == [
+        (AggregationMethod.RECENCY_WEIGHTED, 0.49),
+        (AggregationMethod.UNWEIGHTED, 0.02),
+    ]
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+
+from questions.models import Question
+from scoring.models import Leaderboard
+from tests.unit.test_questions.factories import create_question
+
+
+def dt(year: int, month: int = 1) -> datetime:
+    return datetime(year, month, 1, tzinfo=timezone.utc)
+
+
+def test_global_leaderboard_get_questions():
+    def create(open_time, scheduled_close_time):
+        return create_question(
+            question_type=Question.QuestionType.BINARY,
+            open_time=open_time,
+            scheduled_close_time=scheduled_close_time,
+        )
+
+    question_2024 = create(dt(2024, 3), dt(2024, 10))
+    question_2024_2025 = create(dt(2024, 3), dt(2025, 6))
+    create(dt(2023, 3), dt(2023, 10))
+
+    assert (
+        question_2024.global_leaderboard_start_time,
+        question_2024.global_leaderboard_end_time,
+    ) == (dt(2024), dt(2025))
+
+    leaderboard = Leaderboard.objects.create(
+        score_type=Leaderboard.ScoreTypes.PEER_GLOBAL,
+        start_time=dt(2024),
+        end_time=dt(2025),
+    )
+    assert leaderboard.get_questions() == [question_2024]
+
+    # the window follows the close time
+    question_2024_2025.scheduled_close_time = dt(2024, 11)
+    question_2024_2025.save(update_fields=["scheduled_close_time"])
+    assert {q.id for q in leaderboard.get_questions()} == {
+        question_2024.id,
+        question_2024_2025.id,
+    }
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from scoring.reputation import ReputationIndex, ReputationTable
+
+
+def dt(day: int) -> datetime:
+    return datetime(2024, 1, day, tzinfo=timezone.utc)
+
+
+def test_reputation_index():
+    index = ReputationIndex.from_scores(
+        [(dt(2), 30.0, 0.5), (dt(4), 15.0, 1.0), (dt(4), -6.0, 0.5)]
+    )
+
+    assert index.value_at(dt(1)) == 1e-6
+    assert index.value_at(dt(2)) == pytest.approx(30 / 30.5)
+    assert index.value_at(dt(3)) == pytest.approx(30 / 30.5)
+    assert index.value_at(dt(5)) == pytest.approx(39 / 32)
+    assert index.change_times(dt(1), dt(5)) == [dt(2), dt(4)]
+    assert index.change_times(dt(2), dt(3)) == []
+
+    assert ReputationIndex.from_scores([]).value_at(dt(1)) == 1e-6
+
+
+def test_reputation_table():
+    indexes = {
+        3: ReputationIndex.from_scores([(dt(2), 30.0, 0.5), (dt(4), 15.0, 1.0)]),
+        1: ReputationIndex.from_scores([(dt(3), 6.0, 1.0), (dt(3), 3.0, 1.0)]),
+        2: ReputationIndex.from_scores([]),
+    }
+    table = ReputationTable.from_indexes(indexes)
+
+    for day in range(1, 6):
+        np.testing.assert_allclose(
+            table.values_at([1, 2, 3], dt(day)),
+            [indexes[user_id].value_at(dt(day)) for user_id in [1, 2, 3]],
+        )
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from questions.models import AggregateForecast, Forecast
+from scoring.score_math import (
+    AggregationEntry,
+    evaluate_forecasts_legacy_relative,
+    evaluate_forecasts_peer_accuracy,
+    get_geometric_means,
+)
+from users.models import User
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def at(seconds: float) -> datetime:
+    return START + timedelta(seconds=seconds)
+
+
+def test_evaluate_forecasts_peer_accuracy():
+    start = START.timestamp()
+    forecasts = [
+        Forecast(start_time=at(0), end_time=at(50), probability_yes=0.6),
+        Forecast(start_time=at(25), end_time=None, probability_yes=0.9),
+        Forecast(start_time=at(120), end_time=None, probability_yes=0.9),
+    ]
+    geometric_means = [
+        AggregationEntry(np.array([0.5, 0.5]), 2, start),
+        AggregationEntry(np.array([0.2, 0.8]), 3, start + 50),
+    ]
+
+    scores = evaluate_forecasts_peer_accuracy(
+        forecasts,
+        forecasts,
+        resolution_bucket=1,
+        forecast_horizon_start=start,
+        actual_close_time=start + 100,
+        forecast_horizon_end=start + 100,
+        question_type="binary",
+        geometric_means=geometric_means,
+    )
+
+    # forecasts are scored over the intervals of the geometric means starting
+    # while they are active
+    assert scores[0].score == pytest.approx(100 * 2 * np.log(0.6 / 0.5) * 0.5)
+    assert scores[0].coverage == pytest.approx(0.5)
+    assert scores[1].score == pytest.approx(100 * 1.5 * np.log(0.9 / 0.8) * 0.5)
+    assert scores[1].coverage == pytest.approx(0.5)
+    assert (scores[2].score, scores[2].coverage) == (0, 0)
+
+
+def test_evaluate_forecasts_legacy_relative():
+    start = START.timestamp()
+    forecasts = [
+        Forecast(start_time=at(0), end_time=None, probability_yes=0.5),
+        Forecast(start_time=at(25), end_time=at(75), probability_yes=0.25),
+        Forecast(start_time=at(60), end_time=at(60), probability_yes=0.5),
+    ]
+    community_forecasts = [
+        AggregateForecast(
+            start_time=at(0), end_time=at(50), forecast_values=[0.5, 0.5]
+        ),
+        AggregateForecast(
+            start_time=at(50), end_time=None, forecast_values=[0.75, 0.25]
+        ),
+    ]
+
+    scores = evaluate_forecasts_legacy_relative(
+        forecasts,
+        community_forecasts,
+        resolution_bucket=1,
+        forecast_horizon_start=start,
+        actual_close_time=start + 100,
+    )
+
+    assert scores[0].score == pytest.approx(0.5)
+    assert scores[0].coverage == pytest.approx(1)
+    assert scores[1].score == pytest.approx(0)
+    assert scores[1].coverage == pytest.approx(0.5)
+    assert (scores[2].score, scores[2].coverage) == (0, 0)
+
+
+def test_get_geometric_means():
+    user = User(is_bot=False)
+    forecasts = [
+        Forecast(author=user, start_time=at(0), end_time=at(20), probability_yes=0.2),
+        Forecast(author=user, start_time=at(10), end_time=None, probability_yes=0.8),
+        Forecast(author=user, start_time=at(15), end_time=at(15), probability_yes=0.5),
+        Forecast(author=user, start_time=at(30), end_time=None, probability_yes=0.4),
+    ]
+
+    geometric_means = get_geometric_means(forecasts)
+
+    assert [gm.timestamp for gm in geometric_means] == [
+        at(t).timestamp() for t in [0, 10, 15, 20, 30]
+    ]
+    assert [gm.num_forecasters for gm in geometric_means] == [0, 2, 2, 0, 2]
+    expected = [
+        [0.8, 0.2],
+        np.sqrt([0.8 * 0.2, 0.2 * 0.8]),
+        np.sqrt([0.8 * 0.2, 0.2 * 0.8]),
+        [0.2, 0.8],
+        np.sqrt([0.2 * 0.6, 0.8 * 0.4]),
+    ]
+    for gm, pmf in zip(geometric_means, expected):
+        np.testing.assert_allclose(gm.pmf, pmf)
@@ -0,0 +1,144 @@
+import pytest
+
+from projects.models import Project
+from questions.models import Question
+from scoring.models import ArchivedScore, Leaderboard, Score
+from scoring.utils import (
+    generate_scoring_leaderboard_entries,
+    update_leaderboard_from_question_scores,
+    update_project_leaderboard,
+)
+from tests.unit.fixtures import *  # noqa
+from tests.unit.test_posts.factories import factory_post
+from tests.unit.test_projects.factories import factory_project
+from tests.unit.test_questions.factories import create_question
+
+
+@pytest.mark.parametrize(
+    "score_type",
+    [Leaderboard.ScoreTypes.PEER_GLOBAL, Leaderboard.ScoreTypes.PEER_TOURNAMENT],
+)
+def test_update_leaderboard_from_question_scores(score_type, user1, user2):
+    project = factory_project(type=Project.ProjectTypes.TOURNAMENT)
+    leaderboard = Leaderboard.objects.create(project=project, score_type=score_type)
+    # fully rebuilt after each change
+    reference = Leaderboard.objects.create(project=project, score_type=score_type)
+    question1, question2 = [
+        create_question(question_type=Question.QuestionType.BINARY, resolution="yes")
+        for _ in range(2)
+    ]
+    for question in [question1, question2]:
+        factory_post(author=user1, question=question, default_project=project)
+
+    def create_scores(question, user_scores):
+        return [
+            Score.objects.create(
+                question=question,
+                user=user,
+                score=score,
+                coverage=coverage,
+                score_type=Score.ScoreTypes.PEER,
+            )
+            for user, score, coverage in user_scores
+        ]
+
+    def assert_matches_rebuild():
+        def get_entries(leaderboard):
+            return sorted(
+                (entry.user_id, entry.rank, entry.coverage, entry.contribution_count)
+                + (pytest.approx(entry.score), pytest.approx(entry.take))
+                for entry in leaderboard.entries.all()
+            )
+
+        update_project_leaderboard(project, reference)
+        assert get_entries(leaderboard) == get_entries(reference)
+
+    create_scores(question1, [(user1, 40.0, 0.5), (user2, -10.0, 1.0)])
+    update_project_leaderboard(project, leaderboard)
+
+    # question2 resolves
+    new_scores = create_scores(question2, [(user1, -60.0, 1.0), (user2, 20.0, 0.25)])
+    update_leaderboard_from_question_scores(
+        project, leaderboard, question2, [], new_scores
+    )
+    assert_matches_rebuild()
+
+    # question1 is rescored, user2 doesn't have a score on it anymore
+    previous_scores = list(question1.scores.all())
+    question1.scores.all().delete()
+    new_scores = create_scores(question1, [(user1, 15.0, 0.75)])
+    update_leaderboard_from_question_scores(
+        project, leaderboard, question1, previous_scores, new_scores
+    )
+    assert_matches_rebuild()
+    assert leaderboard.entries.get(user=user2).contribution_count == 1
+
+    # question2 has archived scores, which take precedence in the full rebuild
+    ArchivedScore.objects.create(
+        question=question2,
+        user=user2,
+        score=5.0,
+        coverage=1.0,
+        score_type=Score.ScoreTypes.PEER,
+    )
+    update_project_leaderboard(project, leaderboard)
+    previous_scores = list(question2.scores.all())
+    question2.scores.all().delete()
+    new_scores = create_scores(question2, [(user1, -20.0, 1.0), (user2, 50.0, 0.5)])
+    update_leaderboard_from_question_scores(
+        project, leaderboard, question2, previous_scores, new_scores
+    )
+    assert_matches_rebuild()
+
+    # question3 doesn't belong to the project of the leaderboard
+    question3 = create_question(
+        question_type=Question.QuestionType.BINARY, resolution="yes"
+    )
+    factory_post(author=user1, question=question3)
+    new_scores = create_scores(question3, [(user1, 100.0, 1.0)])
+    update_leaderboard_from_question_scores(
+        project, leaderboard, question3, [], new_scores
+    )
+    assert_matches_rebuild()
+
+
+def test_generate_scoring_leaderboard_entries(user1, user2):
+    leaderboard = Leaderboard(score_type=Leaderboard.ScoreTypes.PEER_TOURNAMENT)
+    questions = [
+        create_question(question_type=Question.QuestionType.BINARY, resolution="yes")
+        for _ in range(3)
+    ]
+    for question, user, score in [
+        (questions[0], user1, 10.0),
+        (questions[1], user1, 5.0),
+        (questions[1], user2, -5.0),
+        (questions[2], user2, 1.0),
+        (questions[0], None, 2.0),
+    ]:
+        Score.objects.create(
+            question=question,
+            user=user,
+            aggregation_method=None if user else "recency_weighted",
+            score=score,
+            coverage=0.5,
+            score_type=Score.ScoreTypes.PEER,
+        )
+    ArchivedScore.objects.create(
+        question=questions[0],
+        user=user2,
+        score=3.0,
+        coverage=1.0,
+        score_type=Score.ScoreTypes.PEER,
+    )
+
+    entries = generate_scoring_leaderboard_entries(questions[:2], leaderboard)
+
+    assert [
+        (e.user_id, e.aggregation_method, e.score, e.coverage, e.contribution_count)
+        for e in entries
+    ] == [
+        (user1.id, None, 15.0, 1.0, 2),
+        (None, "recency_weighted", 2.0, 0.5, 1),
+        (user2.id, None, -2.0, 1.5, 2),
+    ]
+    assert [e.take for e in entries] == [225.0, 4.0, 0.0]
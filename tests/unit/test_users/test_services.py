@@ -0,0 +1,239 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from projects.permissions import ObjectPermission
+from questions.models import Question
+from scoring.models import Score
+from tests.unit.fixtures import *  # noqa
+from tests.unit.test_posts.factories import factory_post
+from tests.unit.test_projects.factories import factory_project
+from tests.unit.test_questions.factories import create_question, factory_forecast
+from users.models import UserProfileStats
+from users.services import (
+    CALIBRATION_BINS,
+    build_user_profile_stats,
+    drop_stale_profile_stats,
+    get_calibration_bin_sums,
+    get_calibration_curve,
+    get_calibration_curves,
+    get_score_bins,
+    get_score_histogram,
+    get_user_profile_stats,
+    get_users_calibration_curves,
+    update_profile_stats_from_forecast,
+    update_profile_stats_from_question_scores,
+)
+
+
+def dt(month: int) -> datetime:
+    return datetime(2024, month, 1, tzinfo=timezone.utc)
+
+
+def test_get_score_histogram():
+    scores = [-75.5, -50.0, -3.2, 0.0, 0.5, 12.0, 49.9]
+    histogram = get_score_histogram(min(scores), max(scores), get_score_bins(scores))
+
+    # bins span at least [-50, 50), the lowest score is left out of the first bin
+    # like in the original histogram
+    assert len(histogram) == 21
+    assert histogram[0] == {"bin_start": -75, "bin_end": -69, "score_count": 0}
+    assert {
+        b["bin_start"]: b["score_count"] for b in histogram if b["score_count"]
+    } == {
+        -51: 1,
+        -9: 1,
+        -3: 2,
+        9: 1,
+        45: 1,
+    }
+    assert get_score_histogram(None, None, {}) == []
+
+
+def test_get_calibration_bin_sums():
+    rows = [
+        # active over the whole lifetime of the question
+        ("a", 0.01, dt(1), None, dt(1), dt(5), "no"),
+        # active over a quarter of it
+        ("a", 0.51, dt(2), dt(3), dt(1), dt(5), "yes"),
+        ("a", 0.52, dt(4), None, dt(1), dt(5), "no"),
+        ("b", 0.99, dt(1), dt(2), dt(1), dt(5), "yes"),
+        # forecasts on questions closed when they open aren't counted
+        ("b", 0.5, dt(1), None, dt(1), dt(1), "yes"),
+    ]
+    bin_sums = get_calibration_bin_sums(rows)
+
+    counts, weight_sums, resolution_sums = bin_sums["a"]
+    assert len(counts) == len(CALIBRATION_BINS)
+    assert counts[0] == 1 and counts[10] == 2 and sum(counts) == 3
+    assert weight_sums[0] == pytest.approx(1)
+    # days are 31, 29, 31 and 30 long
+    assert weight_sums[10] == pytest.approx((29 + 30) / 121)
+    assert resolution_sums[10] == pytest.approx(29 / 121)
+    assert resolution_sums[0] == 0
+    assert sum(bin_sums["b"][0]) == 1
+
+    curves = get_calibration_curves(bin_sums)
+    assert curves["a"] == get_calibration_curve(*bin_sums["a"])
+    assert curves["a"][0]["middle_quartile"] == 0
+    assert curves["a"][10]["middle_quartile"] == pytest.approx(29 / 59)
+    assert curves["a"][1]["middle_quartile"] is None
+    assert curves["b"][20]["middle_quartile"] == 1
+    assert get_calibration_bin_sums([]) == {}
+
+
+def test_update_profile_stats(user1, user2):
+    project = factory_project()
+    questions = [
+        create_question(
+            question_type=Question.QuestionType.BINARY,
+            open_time=dt(1),
+            actual_close_time=dt(7),
+        )
+        for _ in range(2)
+    ]
+    posts = [
+        factory_post(author=user2, question=question, default_project=project)
+        for question in questions
+    ]
+
+    def get_values(stats: UserProfileStats, approx=lambda value: value):
+        return (
+            stats.score_count,
+            approx(stats.score_sum),
+            stats.score_min,
+            stats.score_max,
+            stats.score_bins,
+            stats.score_scatter_plot,
+            stats.forecasts_count,
+            stats.questions_predicted_count,
+            stats.calibration_counts,
+            approx(stats.calibration_weight_sums),
+            approx(stats.calibration_resolution_sums),
+        )
+
+    def assert_matches_rebuild():
+        stats = UserProfileStats.objects.get(user=user1)
+        # only the expected side is approximated
+        assert get_values(stats) == get_values(
+            build_user_profile_stats(user1), pytest.approx
+        )
+
+    stats = get_user_profile_stats(user1)
+    assert stats.forecasts_count == 0
+    assert stats.score_count == 0
+
+    for question, post, month, probability_yes in [
+        (questions[0], posts[0], 2, 0.3),
+        (questions[0], posts[0], 4, 0.8),
+        (questions[1], posts[1], 3, 0.1),
+    ]:
+        previous = question.user_forecasts.filter(author=user1).first()
+        if previous:
+            previous.end_time = dt(month)
+            previous.save()
+        factory_forecast(
+            author=user1,
+            question=question,
+            post=post,
+            start_time=dt(month),
+            probability_yes=probability_yes,
+        )
+        update_profile_stats_from_forecast(
+            user1, question, is_first_forecast=previous is None
+        )
+        assert_matches_rebuild()
+
+    for question, resolution, score in [
+        (questions[0], "yes", 12.5),
+        (questions[1], "no", -30.25),
+    ]:
+        question.resolution = resolution
+        question.save()
+        new_scores = [
+            Score.objects.create(
+                question=question,
+                user=user1,
+                score=score,
+                coverage=1.0,
+                score_type=Score.ScoreTypes.PEER,
+            )
+        ]
+        update_profile_stats_from_question_scores(question, [], new_scores)
+        assert_matches_rebuild()
+
+    stats = UserProfileStats.objects.get(user=user1)
+    assert stats.score_count == 2
+    assert stats.forecasts_count == 3
+    assert stats.questions_predicted_count == 2
+    assert sum(stats.calibration_counts) == 3
+
+    assert [p["question_id"] for p in stats.score_scatter_plot] == [
+        q.pk for q in questions
+    ]
+
+    # rescored questions drop the stats of their forecasters
+    previous_scores = list(questions[0].scores.all())
+    update_profile_stats_from_question_scores(questions[0], previous_scores, [])
+    assert not UserProfileStats.objects.filter(user=user1).exists()
+
+
+def test_invalidate_profile_stats(user1):
+    project = factory_project()
+    question = create_question(question_type=Question.QuestionType.BINARY)
+    post = factory_post(author=user1, question=question, default_project=project)
+    factory_forecast(author=user1, question=question, post=post)
+
+    def has_stats() -> bool:
+        return UserProfileStats.objects.filter(user=user1).exists()
+
+    # Questions made private
+    assert get_user_profile_stats(user1).forecasts_count == 1
+    project.default_permission = None
+    project.save()
+    assert not has_stats()
+
+    assert get_user_profile_stats(user1).forecasts_count == 0
+    project.name = "Renamed"
+    project.save()
+    assert has_stats()
+
+    # Deleted posts
+    project.default_permission = ObjectPermission.FORECASTER
+    project.save()
+    assert get_user_profile_stats(user1).forecasts_count == 1
+    post.delete()
+    assert not has_stats()
+
+    # Stale stats
+    stats = get_user_profile_stats(user1)
+    drop_stale_profile_stats()
+    assert has_stats()
+    stats.built_at = dt(1)
+    stats.save()
+    drop_stale_profile_stats()
+    assert not has_stats()
+
+
+def test_get_users_calibration_curves(user1, user2):
+    question = create_question(
+        question_type=Question.QuestionType.BINARY,
+        open_time=dt(1),
+        actual_close_time=dt(3),
+        resolution="yes",
+    )
+    post = factory_post(
+        author=user1, question=question, default_project=factory_project()
+    )
+    factory_forecast(
+        author=user1,
+        question=question,
+        post=post,
+        start_time=dt(1),
+        probability_yes=0.9,
+    )
+
+    curves = get_users_calibration_curves([user1.id, user2.id])
+
+    assert curves[user1.id][18]["middle_quartile"] == 1
+    assert curves[user2.id] == get_calibration_curve([], [], [])
@@ -0,0 +1,188 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from questions.models import Forecast
+from questions.types import AggregationMethod
+from users.models import User
+from tests.unit.fixtures import *  # noqa
+from tests.unit.test_posts.factories import factory_post
+from tests.unit.test_questions.factories import factory_forecast
+from tests.unit.test_questions.fixtures import *  # noqa
+from utils.the_math.aggregations import (
+    ForecastRows,
+    generate_recency_weights,
+    get_aggregation_series,
+    get_binary_history_quartiles,
+    get_user_forecast_history,
+    minimize_forecast_history,
+    minimize_history_by_shape,
+)
+from utils.the_math.measures import weighted_percentile_2d
+
+
+def dt(day: int) -> datetime:
+    return datetime(2024, 1, day, tzinfo=timezone.utc)
+
+
+def test_get_user_forecast_history():
+    user1, user2 = User(id=1, username="user1"), User(id=2, username="user2")
+    forecasts = [
+        Forecast(author=user1, start_time=dt(1), end_time=dt(3), probability_yes=0.2),
+        Forecast(author=user2, start_time=dt(2), end_time=dt(4), probability_yes=0.6),
+        Forecast(author=user1, start_time=dt(3), end_time=None, probability_yes=0.4),
+    ]
+
+    # the forecast ending at the last timestep leaves no empty set behind
+    history = get_user_forecast_history(forecasts)
+    forecast_sets = list(history)
+
+    assert len(history) == 4
+    assert [fs.timestep for fs in forecast_sets] == [dt(1), dt(2), dt(3), dt(4)]
+    assert [fs.user_ids for fs in forecast_sets] == [
+        [1],
+        [1, 2],
+        [2, 1],
+        [1],
+    ]
+    np.testing.assert_allclose(
+        forecast_sets[2].forecasts_values, [[0.4, 0.6], [0.6, 0.4]]
+    )
+    assert forecast_sets[2].timesteps == [dt(2), dt(3)]
+
+    history = get_user_forecast_history(forecasts, after=dt(2))
+    assert [fs.timestep for fs in history] == [dt(3), dt(4)]
+
+
+@pytest.mark.parametrize(
+    "method", [AggregationMethod.RECENCY_WEIGHTED, AggregationMethod.UNWEIGHTED]
+)
+def test_get_binary_history_quartiles(method):
+    rng = np.random.default_rng(0)
+    users = [User(id=i, username=f"user{i}") for i in range(5)]
+    forecasts = []
+    latest: dict[int, Forecast] = {}
+    for day in range(1, 29):
+        user = users[rng.integers(len(users))]
+        if previous := latest.get(user.id):
+            previous.end_time = dt(day)
+        latest[user.id] = Forecast(
+            author=user,
+            start_time=dt(day),
+            probability_yes=round(rng.uniform(0.01, 0.99), 2),
+        )
+        forecasts.append(latest[user.id])
+
+    history = get_user_forecast_history(forecasts)
+    quartiles = get_binary_history_quartiles(history, method)
+
+    assert quartiles.shape == (len(history), 3, 2)
+    for forecast_set, set_quartiles in zip(history, quartiles):
+        weights = (
+            generate_recency_weights(len(forecast_set.forecasts_values))
+            if method == AggregationMethod.RECENCY_WEIGHTED
+            else None
+        )
+        np.testing.assert_allclose(
+            set_quartiles,
+            weighted_percentile_2d(
+                forecast_set.forecasts_values, weights, [25.0, 50.0, 75.0]
+            ),
+        )
+
+
+def test_forecast_rows_from_queryset(question_binary, user1, user2):
+    factory_post(author=user1, question=question_binary)
+    factory_forecast(
+        author=user1,
+        question=question_binary,
+        start_time=dt(1),
+        end_time=dt(3),
+        probability_yes=0.2,
+    )
+    factory_forecast(
+        author=user2, question=question_binary, start_time=dt(2), probability_yes=0.6
+    )
+    forecasts = question_binary.user_forecasts.order_by("start_time")
+
+    rows = ForecastRows.from_queryset(forecasts, chunk_size=1)
+    expected = ForecastRows.from_forecasts(forecasts)
+
+    assert rows.author_ids.tolist() == [user1.id, user2.id]
+    assert rows.start_times == expected.start_times == [dt(1), dt(2)]
+    assert rows.end_times == expected.end_times == [dt(3), None]
+    np.testing.assert_allclose(rows.forecasts_values, [[0.8, 0.2], [0.4, 0.6]])
+    np.testing.assert_allclose(rows.forecasts_values, expected.forecasts_values)
+
+
+def test_minimize_history_by_shape():
+    history = [dt(day) for day in range(1, 11)]
+    values = [0.2, 0.2, 0.2005, 0.2, 0.6, 0.6, 0.6, 0.3, 0.3, 0.3]
+
+    # flat stretches collapse, every move above the tolerance is kept
+    assert minimize_history_by_shape(history, values) == [
+        dt(1),
+        dt(5),
+        dt(8),
+        dt(10),
+    ]
+    # the largest moves are kept first when the budget runs out
+    assert minimize_history_by_shape(history, values, max_size=3) == [
+        dt(1),
+        dt(5),
+        dt(10),
+    ]
+    assert minimize_history_by_shape(history, values, tolerance=1e-4) == [
+        dt(1),
+        dt(3),
+        dt(4),
+        dt(5),
+        dt(8),
+        dt(10),
+    ]
+
+
+def test_minimize_forecast_history():
+    probabilities = [0.2, 0.2, 0.8, 0.8, 0.8, 0.3, 0.3, 0.3, 0.9, 0.9]
+    rows = ForecastRows(
+        author_ids=np.arange(len(probabilities)),
+        start_times=[dt(day) for day in range(1, len(probabilities) + 1)],
+        end_times=[dt(day + 1) for day in range(1, len(probabilities))] + [None],
+        forecasts_values=np.array([[1 - p, p] for p in probabilities]),
+    )
+    history = get_user_forecast_history(rows)
+    quartiles = get_binary_history_quartiles(
+        history, AggregationMethod.RECENCY_WEIGHTED
+    )
+    series = [
+        get_aggregation_series(
+            history, "binary", AggregationMethod.RECENCY_WEIGHTED, None, quartiles
+        )
+    ]
+
+    # short histories are kept as they are
+    assert minimize_forecast_history(rows, history, series, max_size=10) == (
+        history,
+        None,
+    )
+
+    minimized, kept_indexes = minimize_forecast_history(
+        rows, history, series, max_size=5
+    )
+    assert minimized.timesteps == [dt(1), dt(3), dt(6), dt(9), dt(10)]
+    # quartiles of the kept forecast sets are unchanged
+    np.testing.assert_allclose(
+        get_binary_history_quartiles(minimized, AggregationMethod.RECENCY_WEIGHTED),
+        quartiles[kept_indexes],
+    )
+
+    # candidate timesteps are picked on the unweighted means
+    candidates, _ = minimize_forecast_history(
+        rows,
+        history,
+        [get_aggregation_series(history, "binary", AggregationMethod.UNWEIGHTED, None)],
+        max_size=5,
+        tolerance=0.0,
+    )
+    assert candidates.timesteps == minimized.timesteps
@@ -4,6 +4,7 @@ import pytest
 from questions.models import Question
 from utils.the_math.measures import (
     weighted_percentile_2d,
+    weighted_percentile_3d,
     percent_point_function,
     prediction_difference_for_sorting,
     prediction_difference_for_display,
@@ -76,6 +77,29 @@ def test_weighted_percentile_2d(values, weights, percentiles, expected_result):
         np.testing.assert_allclose(result, [numpy_medians])
 
 
+@pytest.mark.parametrize("weighted", [False, True])
+def test_weighted_percentile_3d(weighted):
+    rng = np.random.default_rng(0)
+    values = rng.random((5, 6, 3))
+    weights = rng.random((5, 6)) if weighted else None
+    sizes = [1, 2, 3, 5, 6]
+    mask = np.arange(6) < np.array(sizes)[:, np.newaxis]
+    percentiles = [25.0, 50.0, 75.0]
+
+    result = weighted_percentile_3d(values, weights, mask, percentiles)
+
+    assert result.shape == (3, 5, 3)
+    for i, size in enumerate(sizes):
+        np.testing.assert_allclose(
+            result[:, i],
+            weighted_percentile_2d(
+                values[i, :size],
+                weights=weights[i, :size] if weighted else None,
+                percentiles=percentiles,
+            ),
+        )
+
+
 @pytest.mark.parametrize(
     "cdf, percentiles, expected_result",
     [
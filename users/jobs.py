@@ -0,0 +1,8 @@
+import dramatiq
+
+from users.services import drop_stale_profile_stats
+
+
+@dramatiq.actor
+def job_drop_stale_profile_stats():
+    drop_stale_profile_stats()
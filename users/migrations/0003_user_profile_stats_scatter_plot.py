@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def drop_profile_stats(apps, schema_editor):
+    # Stats are rebuilt with their scatter plot on the next profile view
+    apps.get_model("users", "UserProfileStats").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_user_profile_stats"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_profile_stats, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="userprofilestats",
+            name="built_at",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+        migrations.AddField(
+            model_name="userprofilestats",
+            name="score_scatter_plot",
+            field=models.JSONField(default=list),
+        ),
+    ]
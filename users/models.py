@@ -1,3 +1,4 @@
+import math
 from datetime import timedelta, datetime
 
 import dateutil.parser
@@ -78,3 +79,61 @@ class User(TimeStampedModel, AbstractUser):
     def update_username(self, val: str):
         self.old_usernames.append((self.username, timezone.now().isoformat()))
         self.username = val
+
+
+class UserProfileStats(TimeStampedModel):
+    """
+    Statistics shown on the profile of a user, over the public questions.
+    Built on the first profile view, then kept up to date as the user forecasts
+    and their questions are scored (see users.services).
+    Stats are dropped a day after they were built, to catch up with the changes
+    which aren't tracked, such as questions made public or private
+    """
+
+    user = models.OneToOneField(
+        User, models.CASCADE, primary_key=True, related_name="profile_stats"
+    )
+    built_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    # Peer scores
+    score_count = models.IntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    score_min = models.FloatField(null=True)
+    score_max = models.FloatField(null=True)
+    # number of scores in each unit wide bin, keyed by the floor of the score
+    score_bins = models.JSONField(default=dict)
+    # points of the scores scatter plot, see get_score_scatter_plot_point
+    score_scatter_plot = models.JSONField(default=list)
+
+    # Forecasts
+    forecasts_count = models.IntegerField(default=0)
+    questions_predicted_count = models.IntegerField(default=0)
+
+    # Forecasts on binary questions resolved yes or no, per calibration bin
+    calibration_counts = ArrayField(models.IntegerField(), default=list)
+    calibration_weight_sums = ArrayField(models.FloatField(), default=list)
+    calibration_resolution_sums = ArrayField(models.FloatField(), default=list)
+
+    def add_score(self, score: float, scatter_plot_point: dict):
+        self.score_scatter_plot.append(scatter_plot_point)
+        self.score_count += 1
+        self.score_sum += score
+        self.score_min = score if self.score_min is None else min(self.score_min, score)
+        self.score_max = score if self.score_max is None else max(self.score_max, score)
+        key = str(math.floor(score))
+        self.score_bins[key] = self.score_bins.get(key, 0) + 1
+
+    def add_calibration(
+        self,
+        counts: list[int],
+        weight_sums: list[float],
+        resolution_sums: list[float],
+    ):
+        if not self.calibration_counts:
+            self.calibration_counts = [0] * len(counts)
+            self.calibration_weight_sums = [0.0] * len(counts)
+            self.calibration_resolution_sums = [0.0] * len(counts)
+        for i in range(len(counts)):
+            self.calibration_counts[i] += counts[i]
+            self.calibration_weight_sums[i] += weight_sums[i]
+            self.calibration_resolution_sums[i] += resolution_sums[i]
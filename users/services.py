@@ -1,14 +1,27 @@
+import math
+from collections import Counter
+from collections.abc import Hashable, Iterable
+from datetime import datetime, timedelta
+
+import numpy as np
+
 from django.core.signing import TimestampSigner, BadSignature, SignatureExpired
-from django.db.models import Q, Case, When, IntegerField
+from django.db import transaction
+from django.db.models import Q, Case, When, IntegerField, F, QuerySet
+from django.utils import timezone
 from django.utils.crypto import get_random_string
 from rest_framework.exceptions import ValidationError
+from scipy.stats import binom
 
 from notifications.constants import MailingTags
 from posts.services.subscriptions import (
     disable_global_cp_reminders,
     enable_global_cp_reminders,
 )
-from users.models import User
+from questions.models import AggregateForecast, Forecast, Question
+from questions.types import AggregationMethod
+from scoring.models import Score
+from users.models import User, UserProfileStats
 from utils.email import send_email_with_template
 from utils.frontend import build_frontend_email_change_url
 
@@ -128,3 +141,389 @@ def send_email_change_confirmation_email(user: User, new_email: str):
             "reset_link": reset_link,
         },
     )
+
+
+_v = 0.125 / 3
+# [p_min, p_max) bounds of the calibration curve bins
+CALIBRATION_BINS = [
+    (0 * _v, 1 * _v),
+    (1 * _v, 2 * _v),
+    (2 * _v, 3 * _v),
+    (0.125, 0.175),
+    (0.175, 0.225),
+    (0.225, 0.275),
+    (0.275, 0.325),
+    (0.325, 0.375),
+    (0.375, 0.425),
+    (0.425, 0.475),
+    (0.475, 0.525),
+    (0.525, 0.575),
+    (0.575, 0.625),
+    (0.625, 0.675),
+    (0.675, 0.725),
+    (0.725, 0.775),
+    (0.775, 0.825),
+    (0.825, 0.875),
+    (0.875 + 0 * _v, 0.875 + 1 * _v),
+    (0.875 + 1 * _v, 0.875 + 2 * _v),
+    (0.875 + 2 * _v, 1.00),
+]
+
+
+def get_score_bins(scores: Iterable[float]) -> dict[str, int]:
+    """number of scores in each unit wide bin, keyed by the floor of the score"""
+    return {
+        str(key): count
+        for key, count in Counter(math.floor(score) for score in scores).items()
+    }
+
+
+def get_score_histogram(
+    score_min: float | None, score_max: float | None, score_bins: dict[str, int]
+) -> list[dict]:
+    """20 bins histogram of the scores counted in score_bins (see get_score_bins)"""
+    score_histogram = []
+    if not score_bins:
+        return score_histogram
+
+    min_bin = min(-50, score_min)
+    max_bin = max(50, score_max)
+    bin_incr = int((max_bin + abs(min_bin)) / 20)
+    for bin_start in range(math.ceil(min_bin), math.ceil(max_bin), bin_incr):
+        bin_end = bin_start + bin_incr
+        score_histogram.append(
+            {
+                "bin_start": bin_start,
+                "bin_end": bin_end,
+                # bins bounds are integers, so a score is in the bin
+                # if and only if its floor is
+                "score_count": sum(
+                    count
+                    for key, count in score_bins.items()
+                    if bin_start <= int(key) < bin_end
+                ),
+            }
+        )
+
+    return score_histogram
+
+
+CALIBRATION_BIN_EDGES = np.array(
+    [p_min for p_min, _ in CALIBRATION_BINS] + [CALIBRATION_BINS[-1][1]]
+)
+
+# group of the forecasts, probability of yes, forecast start and end times,
+# question open time, actual close time and resolution
+CalibrationRow = tuple[
+    Hashable, float, datetime, datetime | None, datetime, datetime, str
+]
+
+
+def get_calibration_rows(
+    forecasts: QuerySet[Forecast] | QuerySet[AggregateForecast],
+    group_field: str,
+) -> QuerySet:
+    """
+    CalibrationRows of the forecasts counted in calibration curves,
+    the ones on public binary questions resolved yes or no
+    """
+    value_field = (
+        "probability_yes"
+        if forecasts.model is Forecast
+        # probability of yes of binary aggregations
+        else "forecast_values__1"
+    )
+    return forecasts.filter(
+        question__in=Question.objects.filter_public(),
+        question__type="binary",
+        question__resolution__in=["no", "yes"],
+    ).values_list(
+        group_field,
+        value_field,
+        "start_time",
+        "end_time",
+        "question__open_time",
+        "question__actual_close_time",
+        "question__resolution",
+    )
+
+
+def get_calibration_bin_sums(
+    rows: Iterable[CalibrationRow],
+) -> dict[Hashable, tuple[list[int], list[float], list[float]]]:
+    """
+    Returns, for each group of forecasts, the number of forecasts, the sum of
+    their weights and the weighted sum of the resolutions in each calibration bin.
+    A forecast weighs the share of the question lifetime it was active for.
+    """
+    rows = list(rows)
+    if not rows:
+        return {}
+    groups, values, starts, ends, open_times, close_times, resolutions = zip(*rows)
+    keys, group_indexes = np.unique(np.array(groups), return_inverse=True)
+
+    starts = np.array([time.timestamp() for time in starts])
+    ends = np.array([time.timestamp() if time else np.inf for time in ends])
+    # The following is a hack to more closely replicate the old site's behavior
+    # forecast horizons end at the actual close time instead of the scheduled one
+    open_times = np.array([time.timestamp() for time in open_times])
+    close_times = np.array([time.timestamp() for time in close_times])
+    question_durations = close_times - open_times
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.maximum(
+            0,
+            (np.minimum(close_times, ends) - np.maximum(open_times, starts))
+            / question_durations,
+        )
+
+    bins = np.digitize(np.array(values, dtype=float), CALIBRATION_BIN_EDGES) - 1
+    counted = (question_durations != 0) & (bins >= 0) & (bins < len(CALIBRATION_BINS))
+    flat_bins = (group_indexes * len(CALIBRATION_BINS) + bins)[counted]
+    weights = weights[counted]
+    resolved_yes = (np.array(resolutions) == "yes")[counted]
+
+    def bincount(weights=None) -> np.ndarray:
+        return np.bincount(
+            flat_bins, weights=weights, minlength=len(keys) * len(CALIBRATION_BINS)
+        ).reshape(len(keys), len(CALIBRATION_BINS))
+
+    counts = bincount()
+    weight_sums = bincount(weights)
+    resolution_sums = bincount(weights * resolved_yes)
+    return {
+        key: (counts[i].tolist(), weight_sums[i].tolist(), resolution_sums[i].tolist())
+        for i, key in enumerate(keys.tolist())
+    }
+
+
+def get_calibration_curves(
+    bin_sums: dict[Hashable, tuple[list[int], list[float], list[float]]],
+) -> dict[Hashable, list[dict]]:
+    """calibration curves from the sums of get_calibration_bin_sums"""
+    if not bin_sums:
+        return {}
+    keys = list(bin_sums)
+    counts, weight_sums, resolution_sums = (
+        np.array(
+            [bin_sums[key][i] or [0] * len(CALIBRATION_BINS) for key in keys],
+            dtype=float,
+        )
+        for i in range(3)
+    )
+    p_mins = CALIBRATION_BIN_EDGES[:-1]
+    p_maxs = CALIBRATION_BIN_EDGES[1:]
+    bin_centers = (p_mins + p_maxs) / 2
+    count = np.maximum(counts, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        middle_quartiles = resolution_sums / weight_sums
+    lower_quartiles = binom.ppf(0.05, count, p_mins) / count
+    perfect_calibrations = binom.ppf(0.50, count, bin_centers) / count
+    upper_quartiles = binom.ppf(0.95, count, p_maxs) / count
+
+    return {
+        key: [
+            {
+                "bin_lower": p_min,
+                "bin_upper": p_max,
+                "lower_quartile": lower_quartiles[k, i],
+                "middle_quartile": (
+                    middle_quartiles[k, i] if weight_sums[k, i] > 0 else None
+                ),
+                "upper_quartile": upper_quartiles[k, i],
+                "perfect_calibration": perfect_calibrations[k, i],
+            }
+            for i, (p_min, p_max) in enumerate(CALIBRATION_BINS)
+        ]
+        for k, key in enumerate(keys)
+    }
+
+
+def get_calibration_curve(
+    counts: list[int], weight_sums: list[float], resolution_sums: list[float]
+) -> list[dict]:
+    return get_calibration_curves({None: (counts, weight_sums, resolution_sums)})[None]
+
+
+def get_users_calibration_curves(user_ids: Iterable[int]) -> dict[int, list[dict]]:
+    """calibration curves of many users, from a single pass over their forecasts"""
+    user_ids = list(user_ids)
+    bin_sums = get_calibration_bin_sums(
+        get_calibration_rows(
+            Forecast.objects.filter(author_id__in=user_ids), "author_id"
+        )
+    )
+    return get_calibration_curves(
+        {user_id: bin_sums.get(user_id, ([], [], [])) for user_id in user_ids}
+    )
+
+
+def get_aggregation_methods_calibration_curves(
+    methods: Iterable[AggregationMethod] | None = None,
+) -> dict[AggregationMethod, list[dict]]:
+    """calibration curves of the aggregation methods, all of them by default"""
+    methods = list(methods or AggregationMethod)
+    bin_sums = get_calibration_bin_sums(
+        get_calibration_rows(
+            AggregateForecast.objects.filter(method__in=methods), "method"
+        )
+    )
+    return get_calibration_curves(
+        {method: bin_sums.get(method, ([], [], [])) for method in methods}
+    )
+
+
+def get_score_scatter_plot_point(score: Score, question: Question) -> dict:
+    return {
+        "score": score.score,
+        "score_timestamp": score.edited_at.timestamp(),
+        "question_title": question.title,
+        "question_id": question.id,
+        "question_resolution": question.resolution,
+    }
+
+
+def build_user_profile_stats(user: User) -> UserProfileStats:
+    public_questions = Question.objects.filter_public()
+    # TODO: support archived scores
+    score_objects = (
+        Score.objects.filter(
+            question__in=public_questions,
+            score_type=Score.ScoreTypes.PEER,
+            user=user,
+        )
+        .select_related("question")
+        .order_by("edited_at")
+    )
+    scores = [score.score for score in score_objects]
+    forecasts = Forecast.objects.filter(question__in=public_questions, author=user)
+    counts, weight_sums, resolution_sums = get_calibration_bin_sums(
+        get_calibration_rows(Forecast.objects.filter(author=user), "author_id")
+    ).get(user.id, ([], [], []))
+
+    stats, _ = UserProfileStats.objects.update_or_create(
+        user=user,
+        defaults={
+            "score_count": len(scores),
+            "score_sum": sum(scores),
+            "score_min": min(scores, default=None),
+            "score_max": max(scores, default=None),
+            "score_bins": get_score_bins(scores),
+            "score_scatter_plot": [
+                get_score_scatter_plot_point(score, score.question)
+                for score in score_objects
+            ],
+            "forecasts_count": forecasts.count(),
+            "questions_predicted_count": forecasts.values("question")
+            .distinct()
+            .count(),
+            "calibration_counts": counts,
+            "calibration_weight_sums": weight_sums,
+            "calibration_resolution_sums": resolution_sums,
+            "built_at": timezone.now(),
+        },
+    )
+    return stats
+
+
+def get_user_profile_stats(user: User) -> UserProfileStats:
+    try:
+        return UserProfileStats.objects.get(user=user)
+    except UserProfileStats.DoesNotExist:
+        return build_user_profile_stats(user)
+
+
+def update_profile_stats_from_question_scores(
+    question: Question, previous_scores: list[Score], new_scores: list[Score]
+):
+    """
+    Adds the peer scores and calibration of a newly scored question to the
+    profile stats of its forecasters.
+    Contributions of a rescored question can't be taken back, so the stats of
+    its forecasters are dropped instead and rebuilt on their next profile view.
+    """
+    if previous_scores:
+        UserProfileStats.objects.filter(
+            Q(user_id__in={score.user_id for score in previous_scores})
+            | Q(user_id__in=Forecast.objects.filter(question=question).values("author"))
+        ).delete()
+        return
+
+    if not Question.objects.filter_public().filter(pk=question.pk).exists():
+        return
+
+    peer_scores = {
+        score.user_id: score
+        for score in new_scores
+        if score.user_id and score.score_type == Score.ScoreTypes.PEER
+    }
+    calibration_bin_sums = get_calibration_bin_sums(
+        get_calibration_rows(Forecast.objects.filter(question=question), "author_id")
+    )
+
+    with transaction.atomic():
+        stats_list = list(
+            UserProfileStats.objects.select_for_update().filter(
+                user_id__in=peer_scores.keys() | calibration_bin_sums.keys()
+            )
+        )
+        for stats in stats_list:
+            if stats.user_id in peer_scores:
+                score = peer_scores[stats.user_id]
+                stats.add_score(
+                    score.score, get_score_scatter_plot_point(score, question)
+                )
+            if stats.user_id in calibration_bin_sums:
+                stats.add_calibration(*calibration_bin_sums[stats.user_id])
+        UserProfileStats.objects.bulk_update(
+            stats_list,
+            [
+                "score_count",
+                "score_sum",
+                "score_min",
+                "score_max",
+                "score_bins",
+                "score_scatter_plot",
+                "calibration_counts",
+                "calibration_weight_sums",
+                "calibration_resolution_sums",
+            ],
+            batch_size=500,
+        )
+
+
+def update_profile_stats_from_forecast(
+    user: User, question: Question, is_first_forecast: bool
+):
+    """counts a new forecast of the user in their profile stats"""
+    if not Question.objects.filter_public().filter(pk=question.pk).exists():
+        return
+
+    UserProfileStats.objects.filter(user=user).update(
+        forecasts_count=F("forecasts_count") + 1,
+        questions_predicted_count=F("questions_predicted_count")
+        + int(is_first_forecast),
+    )
+
+
+def invalidate_profile_stats(questions: QuerySet[Question]):
+    """
+    Drops the profile stats of the users who forecasted or were scored
+    on the questions, they are rebuilt on their next profile view
+    """
+
+    UserProfileStats.objects.filter(
+        Q(user_id__in=Forecast.objects.filter(question__in=questions).values("author"))
+        | Q(user_id__in=Score.objects.filter(question__in=questions).values("user"))
+    ).delete()
+
+
+def drop_stale_profile_stats():
+    """
+    Drops the profile stats built more than a day ago. This catches up with
+    the changes which are not tracked, such as posts moved to another project
+    or questions resolved outside of score_question
+    """
+
+    UserProfileStats.objects.filter(
+        built_at__lt=timezone.now() - timedelta(days=1)
+    ).delete()
@@ -11,14 +11,13 @@ from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import AllowAny
 from rest_framework.request import Request
 from rest_framework.response import Response
-from scipy.stats import binom
 
 from comments.models import Comment
 from posts.models import Post
-from questions.models import AggregateForecast, Forecast, Question
+from questions.models import Forecast, Question
 from questions.types import AggregationMethod
 from scoring.models import Score
-from users.models import User
+from users.models import User, UserProfileStats
 from users.serializers import (
     UserPrivateSerializer,
     UserPublicSerializer,
@@ -29,7 +28,14 @@ from users.serializers import (
     EmailChangeSerializer,
 )
 from users.services import (
+    get_aggregation_methods_calibration_curves,
+    get_calibration_curve,
+    get_score_bins,
+    get_score_histogram,
+    get_score_scatter_plot_point,
+    get_user_profile_stats,
     get_users,
+    get_users_calibration_curves,
     user_unsubscribe_tags,
     send_email_change_confirmation_email,
     change_email_from_token,
@@ -69,17 +75,9 @@ def get_score_scatter_plot_data(
         scores = list(score_qs)
 
     scores = sorted(scores, key=lambda s: s.edited_at)
-    score_scatter_plot = []
-    for score in scores:
-        score_scatter_plot.append(
-            {
-                "score": score.score,
-                "score_timestamp": score.edited_at.timestamp(),
-                "question_title": score.question.title,
-                "question_id": score.question.id,
-                "question_resolution": score.question.resolution,
-            }
-        )
+    score_scatter_plot = [
+        get_score_scatter_plot_point(score, score.question) for score in scores
+    ]
 
     return {
         "score_scatter_plot": score_scatter_plot,
@@ -118,26 +116,11 @@ def get_score_histogram_data(
             score_qs = score_qs.filter(aggregation_method=aggregation_method)
         scores = list(score_qs)
 
-    score_histogram = []
-    if len(scores) > 0:
-        min_bin = min(-50, min(s.score for s in scores))
-        max_bin = max(50, max(s.score for s in scores))
-        bin_incr = int((max_bin + np.abs(min_bin)) / 20)
-        for bin_start in range(int(np.ceil(min_bin)), int(np.ceil(max_bin)), bin_incr):
-            bin_end = bin_start + bin_incr
-            score_histogram.append(
-                {
-                    "bin_start": bin_start,
-                    "bin_end": bin_end,
-                    "score_count": len(
-                        [
-                            s.score
-                            for s in scores
-                            if s.score >= bin_start and s.score < bin_end
-                        ]
-                    ),
-                }
-            )
+    score_histogram = get_score_histogram(
+        min((s.score for s in scores), default=None),
+        max((s.score for s in scores), default=None),
+        get_score_bins(s.score for s in scores),
+    )
 
     return {
         "score_histogram": score_histogram,
@@ -152,102 +135,12 @@ def get_calibration_curve_data(
         user is not None and aggregation_method is not None
     ):
         raise ValueError("Either user or aggregation_method must be provided only")
-    public_questions = Question.objects.filter_public()
     if user is not None:
-        forecasts = Forecast.objects.filter(
-            question__in=public_questions,
-            question__type="binary",
-            question__resolution__in=["no", "yes"],
-            author=user,
-        ).prefetch_related("question")
+        calibration_curve = get_users_calibration_curves([user.id])[user.id]
     else:
-        forecasts = AggregateForecast.objects.filter(
-            question__in=public_questions,
-            question__type="binary",
-            question__resolution__in=["no", "yes"],
-            method=aggregation_method,
-        ).prefetch_related("question")
-
-    values = []
-    weights = []
-    resolutions = []
-
-    for forecast in forecasts:
-        question = forecast.question
-        forecast_horizon_start = question.open_time.timestamp()
-        actual_close_time = question.actual_close_time.timestamp()
-        # The following is a hack to more closely replicate the old site's behavior
-        # forecast_horizon_end = question.scheduled_close_time.timestamp()
-        forecast_horizon_end = actual_close_time
-        forecast_start = max(forecast_horizon_start, forecast.start_time.timestamp())
-        if forecast.end_time:
-            forecast_end = min(actual_close_time, forecast.end_time.timestamp())
-        else:
-            forecast_end = actual_close_time
-        forecast_duration = forecast_end - forecast_start
-        question_duration = forecast_horizon_end - forecast_horizon_start
-
-        if question_duration == 0:
-            continue
-
-        weight = max(0, forecast_duration / question_duration)
-
-        if isinstance(forecast, Forecast):
-            values.append(forecast.probability_yes)
-        else:
-            values.append(forecast.forecast_values[1])
-
-        weights.append(weight)
-        resolutions.append(int(question.resolution == "yes"))
-
-    calibration_curve = []
-    v = 0.125 / 3
-    for p_min, p_max in [
-        (0 * v, 1 * v),
-        (1 * v, 2 * v),
-        (2 * v, 3 * v),
-        (0.125, 0.175),
-        (0.175, 0.225),
-        (0.225, 0.275),
-        (0.275, 0.325),
-        (0.325, 0.375),
-        (0.375, 0.425),
-        (0.425, 0.475),
-        (0.475, 0.525),
-        (0.525, 0.575),
-        (0.575, 0.625),
-        (0.625, 0.675),
-        (0.675, 0.725),
-        (0.725, 0.775),
-        (0.775, 0.825),
-        (0.825, 0.875),
-        (0.875 + 0 * v, 0.875 + 1 * v),
-        (0.875 + 1 * v, 0.875 + 2 * v),
-        (0.875 + 2 * v, 1.00),
-    ]:
-        res = []
-        ws = []
-        bin_center = (p_min + p_max) / 2
-        for value, weight, resolution in zip(values, weights, resolutions):
-            if p_min <= value < p_max:
-                res.append(resolution)
-                ws.append(weight)
-        count = max(len(res), 1)
-        middle_quartile = np.average(res, weights=ws) if sum(ws) > 0 else None
-        lower_quartile = binom.ppf(0.05, count, p_min) / count
-        perfect_calibration = binom.ppf(0.50, count, bin_center) / count
-        upper_quartile = binom.ppf(0.95, count, p_max) / count
-
-        calibration_curve.append(
-            {
-                "bin_lower": p_min,
-                "bin_upper": p_max,
-                "lower_quartile": lower_quartile,
-                "middle_quartile": middle_quartile,
-                "upper_quartile": upper_quartile,
-                "perfect_calibration": perfect_calibration,
-            }
-        )
+        calibration_curve = get_aggregation_methods_calibration_curves(
+            [aggregation_method]
+        )[aggregation_method]
 
     return {
         "calibration_curve": calibration_curve,
@@ -325,6 +218,27 @@ def get_authoring_stats_data(
     }
 
 
+def get_user_profile_stats_data(stats: UserProfileStats) -> dict:
+    """scatter plot, histogram, calibration curve and forecasting stats of a user"""
+    return {
+        "score_scatter_plot": stats.score_scatter_plot,
+        "score_histogram": get_score_histogram(
+            stats.score_min, stats.score_max, stats.score_bins
+        ),
+        "calibration_curve": get_calibration_curve(
+            stats.calibration_counts,
+            stats.calibration_weight_sums,
+            stats.calibration_resolution_sums,
+        ),
+        "average_score": (
+            stats.score_sum / stats.score_count if stats.score_count else None
+        ),
+        "forecasts_count": stats.forecasts_count,
+        "questions_predicted_count": stats.questions_predicted_count,
+        "score_count": stats.score_count,
+    }
+
+
 def get_user_profile_data(
     user: User,
 ) -> dict:
@@ -344,34 +258,38 @@ def serialize_profile(
         score_type = Score.ScoreTypes.PEER
     if aggregation_method is not None and score_type is None:
         score_type = Score.ScoreTypes.BASELINE
-    public_questions = Question.objects.filter_public()
-    # TODO: support archived scores
-    score_qs = Score.objects.filter(
-        question__in=public_questions,
-        score_type=score_type,
-    )
-    if user is not None:
-        score_qs = score_qs.filter(user=user)
-    else:
-        score_qs = score_qs.filter(aggregation_method=aggregation_method)
-    scores = list(score_qs.select_related("question"))
     data = {}
-    data.update(
-        get_score_scatter_plot_data(
-            scores=scores, user=user, aggregation_method=aggregation_method
+    if user is not None and score_type == Score.ScoreTypes.PEER:
+        # Stored stats, the scores aren't read again
+        data.update(get_user_profile_stats_data(get_user_profile_stats(user)))
+    else:
+        public_questions = Question.objects.filter_public()
+        # TODO: support archived scores
+        score_qs = Score.objects.filter(
+            question__in=public_questions,
+            score_type=score_type,
         )
-    )
-    data.update(
-        get_score_histogram_data(
-            scores=scores, user=user, aggregation_method=aggregation_method
+        if user is not None:
+            score_qs = score_qs.filter(user=user)
+        else:
+            score_qs = score_qs.filter(aggregation_method=aggregation_method)
+        scores = list(score_qs.select_related("question"))
+        data.update(
+            get_score_scatter_plot_data(
+                scores=scores, user=user, aggregation_method=aggregation_method
+            )
         )
-    )
-    data.update(get_calibration_curve_data(user, aggregation_method))
-    data.update(
-        get_forecasting_stats_data(
-            scores=scores, user=user, aggregation_method=aggregation_method
+        data.update(
+            get_score_histogram_data(
+                scores=scores, user=user, aggregation_method=aggregation_method
+            )
+        )
+        data.update(get_calibration_curve_data(user, aggregation_method))
+        data.update(
+            get_forecasting_stats_data(
+                scores=scores, user=user, aggregation_method=aggregation_method
+            )
         )
-    )
     if user is not None:
         data.update(get_user_profile_data(user))
         data.update(get_authoring_stats_data(user))
@@ -9,22 +9,23 @@ Transform back to probabilities.
 Normalise to 1 over all outcomes.
 """
 
-from bisect import bisect_left
+import heapq
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Callable, Iterable
 
 import numpy as np
-from django.db.models import Q
+from django.db.models import Q, QuerySet
 
 from questions.models import Question, Forecast, AggregateForecast
 from questions.types import AggregationMethod
-from scoring.reputation import (
-    get_reputations_at_time,
-    get_reputations_during_interval,
-    Reputation,
+from scoring.reputation import ReputationTable, get_reputation_indexes
+from utils.dtypes import generate_map_from_list
+from utils.the_math.measures import (
+    weighted_percentile_2d,
+    weighted_percentile_3d,
+    percent_point_function,
 )
-from users.models import User
-from utils.the_math.measures import weighted_percentile_2d, percent_point_function
 from utils.typing import (
     ForecastValues,
     ForecastsValues,
@@ -47,7 +48,7 @@ def compute_discrete_forecast_values(
     weights: Weights | None = None,
     percentile: float | Percentiles = 50.0,
 ) -> ForecastsValues:
-    forecasts_values = np.array(forecasts_values)
+    forecasts_values = np.asarray(forecasts_values)
     if isinstance(percentile, float):
         percentile = [percentile]
     if forecasts_values.shape[1] == 2:
@@ -91,10 +92,91 @@ def compute_weighted_semi_standard_deviations(
 class ForecastSet:
     forecasts_values: ForecastsValues
     timestep: datetime
-    users: list[User] = list
+    user_ids: list[int] = list
     timesteps: list[datetime] = list
 
 
+@dataclass
+class ForecastRows:
+    """Column-wise forecasts, ordered by start_time. Loaded with values_list
+    so no Forecast or User instances are built."""
+
+    author_ids: np.ndarray
+    start_times: list[datetime]
+    end_times: list[datetime | None]
+    forecasts_values: np.ndarray  # (forecasts, values)
+
+    columns = (
+        "author_id",
+        "start_time",
+        "end_time",
+        "probability_yes",
+        "probability_yes_per_category",
+        "continuous_cdf",
+    )
+
+    @classmethod
+    def from_queryset(
+        cls, forecasts: QuerySet[Forecast], chunk_size: int = 2000
+    ) -> "ForecastRows":
+        """streams the rows into arrays chunk by chunk, so at most chunk_size
+        forecasts are held as python lists at a time"""
+        author_ids: list[int] = []
+        start_times: list[datetime] = []
+        end_times: list[datetime | None] = []
+        values_chunks: list[np.ndarray] = []
+        chunk: list[list[float]] = []
+        rows = forecasts.values_list(*cls.columns).iterator(chunk_size=chunk_size)
+        for author_id, start_time, end_time, *prediction in rows:
+            author_ids.append(author_id)
+            start_times.append(start_time)
+            end_times.append(end_time)
+            chunk.append(get_prediction_values(*prediction))
+            if len(chunk) == chunk_size:
+                values_chunks.append(np.array(chunk, dtype=float))
+                chunk = []
+        if chunk:
+            values_chunks.append(np.array(chunk, dtype=float))
+        return cls(
+            author_ids=np.array(author_ids, dtype=int),
+            start_times=start_times,
+            end_times=end_times,
+            forecasts_values=(
+                np.concatenate(values_chunks) if values_chunks else np.empty((0, 0))
+            ),
+        )
+
+    @classmethod
+    def from_forecasts(cls, forecasts: Iterable[Forecast]) -> "ForecastRows":
+        forecasts = list(forecasts)
+        return cls(
+            author_ids=np.array([f.author_id for f in forecasts], dtype=int),
+            start_times=[f.start_time for f in forecasts],
+            end_times=[f.end_time for f in forecasts],
+            forecasts_values=(
+                np.array([f.get_prediction_values() for f in forecasts], dtype=float)
+                if forecasts
+                else np.empty((0, 0))
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.start_times)
+
+
+def get_prediction_values(
+    probability_yes: float | None,
+    probability_yes_per_category: list[float] | None,
+    continuous_cdf: list[float] | None,
+) -> list[float]:
+    """same as Forecast.get_prediction_values, from the raw columns"""
+    if probability_yes:
+        return [1 - probability_yes, probability_yes]
+    if probability_yes_per_category:
+        return probability_yes_per_category
+    return continuous_cdf
+
+
 def calculate_aggregation_entry(
     forecast_set: ForecastSet,
     question_type: str,
@@ -102,8 +184,13 @@ def calculate_aggregation_entry(
     method: AggregationMethod,
     include_stats: bool = False,
     histogram: bool = False,
+    quartiles: Percentiles | None = None,
 ) -> AggregateForecast:
+    """quartiles are the 25th, 50th and 75th weighted percentiles of the forecast set,
+    pass them in if they have already been computed (see get_history_quartiles)"""
     weights = np.array(weights) if weights is not None else None
+    if quartiles is not None:
+        quartiles = np.asarray(quartiles).tolist()
     if (
         question_type in ["date", "numeric"]
         or method == AggregationMethod.SINGLE_AGGREGATION
@@ -115,13 +202,19 @@ def calculate_aggregation_entry(
         )
     elif question_type == "binary":
         aggregation = AggregateForecast(
-            forecast_values=compute_discrete_forecast_values(
-                forecast_set.forecasts_values, weights, 50.0
-            )[0]
+            forecast_values=(
+                quartiles[1]
+                if quartiles is not None
+                else compute_discrete_forecast_values(
+                    forecast_set.forecasts_values, weights, 50.0
+                )[0]
+            )
         )
     else:  # multiple_choice
         medians = np.array(
-            compute_discrete_forecast_values(
+            quartiles[1]
+            if quartiles is not None
+            else compute_discrete_forecast_values(
                 forecast_set.forecasts_values, weights, 50.0
             )[0]
         )
@@ -133,7 +226,7 @@ def calculate_aggregation_entry(
         aggregation = AggregateForecast(forecast_values=normalized_medians.tolist())
 
     if include_stats:
-        forecasts_values = np.array(forecast_set.forecasts_values)
+        forecasts_values = np.asarray(forecast_set.forecasts_values)
         aggregation.start_time = forecast_set.timestep
         aggregation.forecaster_count = len(forecast_set.forecasts_values)
         if question_type in ["binary", "multiple_choice"]:
@@ -145,8 +238,12 @@ def calculate_aggregation_entry(
                 lowers = (np.array(centers) - lowers_sd).tolist()
                 uppers = (np.array(centers) + uppers_sd).tolist()
             else:
-                lowers, centers, uppers = compute_discrete_forecast_values(
-                    forecast_set.forecasts_values, weights, [25.0, 50.0, 75.0]
+                lowers, centers, uppers = (
+                    quartiles
+                    if quartiles is not None
+                    else compute_discrete_forecast_values(
+                        forecast_set.forecasts_values, weights, [25.0, 50.0, 75.0]
+                    )
                 )
                 if question_type == "multiple_choice":
                     centers_array = np.array(centers)
@@ -176,7 +273,7 @@ def calculate_aggregation_entry(
             ).tolist()
     if histogram and question_type == "binary":
         aggregation.histogram = get_histogram(
-            [f[1] for f in forecast_set.forecasts_values], weights
+            np.asarray(forecast_set.forecasts_values)[:, 1], weights
         ).tolist()
     return aggregation
 
@@ -192,24 +289,21 @@ def get_aggregations_at_time(
 ) -> dict[AggregationMethod, AggregateForecast]:
     """set include_stats to True if you want to include num_forecasters, q1s, medians,
     and q3s"""
-    forecasts = (
-        question.user_forecasts.filter(
-            Q(end_time__isnull=True) | Q(end_time__gt=time), start_time__lte=time
-        )
-        .order_by("start_time")
-        .select_related("author")
-    )
+    forecasts = question.user_forecasts.filter(
+        Q(end_time__isnull=True) | Q(end_time__gt=time), start_time__lte=time
+    ).order_by("start_time")
     if user_ids:
         forecasts = forecasts.filter(author_id__in=user_ids)
     if not include_bots:
         forecasts = forecasts.exclude(author__is_bot=True)
-    if len(forecasts) == 0:
+    rows = ForecastRows.from_queryset(forecasts)
+    if len(rows) == 0:
         return dict()
     forecast_set = ForecastSet(
-        forecasts_values=[forecast.get_prediction_values() for forecast in forecasts],
+        forecasts_values=rows.forecasts_values,
         timestep=time,
-        users=[forecast.author for forecast in forecasts],
-        timesteps=[forecast.start_time for forecast in forecasts],
+        user_ids=rows.author_ids.tolist(),
+        timesteps=rows.start_times,
     )
 
     aggregations: dict[AggregationMethod, AggregateForecast] = dict()
@@ -220,10 +314,13 @@ def get_aggregations_at_time(
             case AggregationMethod.UNWEIGHTED:
                 weights = None
             case AggregationMethod.SINGLE_AGGREGATION:
-                repuatations = get_reputations_at_time(forecast_set.users, time)
+                reputation_indexes = get_reputation_indexes(forecast_set.user_ids)
                 weights = calculate_single_aggregation_weights(
                     forecast_set,
-                    repuatations,
+                    [
+                        reputation_indexes[user_id].value_at(time)
+                        for user_id in forecast_set.user_ids
+                    ],
                     question.open_time,
                     question.scheduled_close_time,
                 )
@@ -241,91 +338,433 @@ def get_aggregations_at_time(
     return aggregations
 
 
-def minimize_history(
+# number of candidate timesteps measured per kept timestep when minimizing
+MINIMIZE_CANDIDATES_FACTOR = 4
+
+
+def minimize_history_by_shape(
     history: list[datetime],
+    values: np.ndarray,
     max_size: int = 128,
+    tolerance: float = 1e-3,
 ) -> list[datetime]:
-    if len(history) <= max_size:
+    """Picks at most max_size timesteps of history, where values holds the
+    aggregated series at each timestep (one row per timestep).
+    Stored aggregations hold their value until the next one starts, so the
+    history is split top-down at the timestep deviating the most from the value
+    held over it, until every timestep is within tolerance or the budget is used.
+    The first and last timesteps are always kept."""
+    if len(history) <= 2:
         return history
+    values = np.asarray(values).reshape(len(history), -1)
 
-    # this is a pretty cheap algorithm that generates a minimized history
-    # by taking the middle time of the list, then the middle
-    # of the two halves, then the middle of the four quarters, etc. 7 times,
-    # generating a maximum list of 128 datetimes close evenly spaced.
-
-    def find_index_of_middle(forecasts: list[AggregateForecast]) -> int:
-        if len(forecasts) < 3:
-            return 0
-        t0 = forecasts[0]
-        t2 = forecasts[-1]
-        t1 = t0 + (t2 - t0) / 2
-        for i, forecast in enumerate(forecasts):
-            if forecast > t1:
-                if forecast - t1 < t1 - forecasts[i - 1]:
-                    return i
-                return i - 1
-
-    minimized = []
-    working_lists = [history]
-    for _ in range(int(np.ceil(np.log2(max_size)))):
-        new_working_lists = []
-        for working_list in working_lists:
-            middle_index = find_index_of_middle(working_list)
-            if middle_index == 0:
-                minimized.append(working_list[0])
-                continue
-            minimized.append(working_list[middle_index])
-            new_working_lists.append(working_list[:middle_index])
-            new_working_lists.append(working_list[middle_index + 1 :])
-        working_lists = new_working_lists
+    def split(start: int, end: int) -> tuple[float, int, int, int]:
+        errors = np.abs(values[start + 1 : end] - values[start]).max(axis=1)
+        worst = int(errors.argmax())
+        return -errors[worst], start, end, start + 1 + worst
+
+    last = len(history) - 1
+    kept = {0, last}
+    segments = [split(0, last)] if last > 1 else []
+    while segments and len(kept) < max_size:
+        error, start, end, worst = heapq.heappop(segments)
+        if -error <= tolerance:
+            break
+        kept.add(worst)
+        for segment_start, segment_end in [(start, worst), (worst, end)]:
+            if segment_end - segment_start > 1:
+                heapq.heappush(segments, split(segment_start, segment_end))
 
-    minimized: list[AggregateForecast] = sorted(minimized)
-    # make sure to always have the first and last forecast are the first
-    # and last of the original list
-    if minimized[0] != history[0]:
-        minimized.insert(0, history[0])
-    if minimized[-1] != history[-1]:
-        minimized.append(history[-1])
-    return minimized
+    return [history[i] for i in sorted(kept)]
+
+
+@dataclass
+class ForecastHistory:
+    """Array-backed history of forecasts. The values of each forecast are stored
+    once in a contiguous array, and the set of forecasts active at a timestep is
+    derived from the start/end timestep indexes of each forecast.
+    Iterating yields the non-empty ForecastSets in chronological order."""
+
+    forecasts_values: np.ndarray  # (forecasts, values), ordered by start_time
+    start_indexes: np.ndarray  # index of the first timestep a forecast is active at
+    end_indexes: np.ndarray  # index of the first timestep it is no longer active at
+    timesteps: list[datetime]
+    user_ids: np.ndarray
+    start_times: list[datetime]
+
+    @classmethod
+    def from_rows(
+        cls, rows: ForecastRows, timesteps: list[datetime]
+    ) -> "ForecastHistory":
+        timestamps = np.array([timestep.timestamp() for timestep in timesteps])
+        return cls(
+            forecasts_values=rows.forecasts_values,
+            start_indexes=np.searchsorted(
+                timestamps,
+                [start_time.timestamp() for start_time in rows.start_times],
+            ),
+            end_indexes=np.searchsorted(
+                timestamps,
+                [
+                    end_time.timestamp() if end_time else np.inf
+                    for end_time in rows.end_times
+                ],
+            ),
+            timesteps=timesteps,
+            user_ids=rows.author_ids,
+            start_times=rows.start_times,
+        )
+
+    def get_active_counts(self) -> np.ndarray:
+        """number of active forecasts at each timestep"""
+        size = len(self.timesteps) + 1
+        changes = np.bincount(self.start_indexes, minlength=size) - np.bincount(
+            self.end_indexes, minlength=size
+        )
+        return np.cumsum(changes)[:-1]
+
+    def get_active_mask(self, timestep_index: int) -> np.ndarray:
+        return (self.start_indexes <= timestep_index) & (
+            timestep_index < self.end_indexes
+        )
+
+    def get_forecast_set(self, timestep_index: int) -> ForecastSet:
+        active = np.flatnonzero(self.get_active_mask(timestep_index))
+        return ForecastSet(
+            forecasts_values=self.forecasts_values[active],
+            timestep=self.timesteps[timestep_index],
+            user_ids=self.user_ids[active].tolist(),
+            timesteps=[self.start_times[i] for i in active],
+        )
+
+    def iter_padded_chunks(self, max_size: int = 2**22):
+        """yields (values, mask) stacks of consecutive non-empty forecast sets,
+        padded to the largest set of the chunk. values has the shape
+        (sets, forecasts, outcomes) and holds at most around max_size floats"""
+        counts = self.get_active_counts()
+        timestep_indexes = np.flatnonzero(counts)
+        if len(timestep_indexes) == 0:
+            return
+        chunk_size = int(
+            np.clip(
+                max_size // (counts.max() * self.forecasts_values.shape[1]), 1, 1024
+            )
+        )
+        for i in range(0, len(timestep_indexes), chunk_size):
+            chunk = timestep_indexes[i : i + chunk_size]
+            candidates = np.flatnonzero(
+                (self.start_indexes <= chunk[-1]) & (chunk[0] < self.end_indexes)
+            )
+            active = (self.start_indexes[candidates] <= chunk[:, np.newaxis]) & (
+                chunk[:, np.newaxis] < self.end_indexes[candidates]
+            )
+            sizes = active.sum(axis=1)
+            mask = np.arange(sizes.max()) < sizes[:, np.newaxis]
+            indexes = np.zeros(mask.shape, dtype=int)
+            indexes[mask] = np.broadcast_to(candidates, active.shape)[active]
+            yield self.forecasts_values[indexes], mask
+
+    def get_means(self) -> np.ndarray:
+        """unweighted mean values of every non-empty forecast set,
+        with the shape (sets, values)"""
+        size = len(self.timesteps) + 1
+        changes = np.zeros((size, self.forecasts_values.shape[1]))
+        np.add.at(changes, self.start_indexes, self.forecasts_values)
+        np.subtract.at(
+            changes, np.minimum(self.end_indexes, size - 1), self.forecasts_values
+        )
+        counts = self.get_active_counts()
+        active = np.flatnonzero(counts)
+        return np.cumsum(changes, axis=0)[active] / counts[active, np.newaxis]
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.get_active_counts()))
+
+    def __iter__(self):
+        for timestep_index in np.flatnonzero(self.get_active_counts()):
+            yield self.get_forecast_set(timestep_index)
 
 
 def get_user_forecast_history(
-    forecasts: list[Forecast],
-    minimize: bool = False,
-) -> list[ForecastSet]:
-    timesteps = set()
-    for forecast in forecasts:
-        timesteps.add(forecast.start_time)
-        if forecast.end_time:
-            timesteps.add(forecast.end_time)
+    forecasts: ForecastRows | QuerySet[Forecast] | Iterable[Forecast],
+    after: datetime | None = None,
+) -> ForecastHistory:
+    if isinstance(forecasts, QuerySet):
+        forecasts = ForecastRows.from_queryset(forecasts)
+    elif not isinstance(forecasts, ForecastRows):
+        forecasts = ForecastRows.from_forecasts(forecasts)
+    timesteps = set(forecasts.start_times)
+    timesteps.update(end_time for end_time in forecasts.end_times if end_time)
+    if after:
+        timesteps = {timestep for timestep in timesteps if timestep > after}
 
     timesteps = sorted(timesteps)
-    if minimize:
-        timesteps = minimize_history(timesteps)
-
-    forecast_sets: dict[datetime, ForecastSet] = dict()
-    for forecast in forecasts:
-        # Find active timesteps using bisect to find the start & end indexes
-        start_index = bisect_left(timesteps, forecast.start_time)
-        end_index = (
-            bisect_left(timesteps, forecast.end_time)
-            if forecast.end_time
-            else len(timesteps)
+
+    return ForecastHistory.from_rows(forecasts, timesteps)
+
+
+def get_aggregation_series(
+    forecast_history: ForecastHistory,
+    question_type: str,
+    method: AggregationMethod,
+    get_weights: Callable[[ForecastSet], Weights | None] | None,
+    quartiles: np.ndarray | None = None,
+) -> np.ndarray:
+    """forecast values of the aggregation of every forecast set in the history
+    (see calculate_aggregation_entry), with the shape (sets, values).
+    Medians are taken from quartiles when given, every 10th point of the cdf
+    is enough to follow the shape of continuous aggregations"""
+    if quartiles is not None:
+        return quartiles[:, 1]
+
+    step = 10 if question_type in ["date", "numeric"] else 1
+    if method == AggregationMethod.UNWEIGHTED:
+        return forecast_history.get_means()[:, ::step]
+
+    return np.array(
+        [
+            np.average(
+                forecast_set.forecasts_values[:, ::step],
+                axis=0,
+                weights=get_weights(forecast_set),
+            )
+            for forecast_set in forecast_history
+        ]
+    )
+
+
+def minimize_forecast_history(
+    rows: ForecastRows,
+    forecast_history: ForecastHistory,
+    series: list[np.ndarray],
+    max_size: int = 128,
+    tolerance: float = 1e-3,
+) -> tuple[ForecastHistory, np.ndarray | None]:
+    """restricts the history to the timesteps picked by minimize_history_by_shape,
+    measured on the series of every aggregation method (see get_aggregation_series).
+    Returns the minimized history with the indexes of the kept forecast sets,
+    histories within max_size are returned as they are"""
+    if len(forecast_history) <= max_size:
+        return forecast_history, None
+
+    timesteps = [
+        forecast_history.timesteps[i]
+        for i in np.flatnonzero(forecast_history.get_active_counts())
+    ]
+    kept_timesteps = minimize_history_by_shape(
+        timesteps, np.hstack(series), max_size, tolerance
+    )
+    indexes = {timestep: i for i, timestep in enumerate(timesteps)}
+    return ForecastHistory.from_rows(rows, kept_timesteps), np.array(
+        [indexes[timestep] for timestep in kept_timesteps]
+    )
+
+
+def get_history_quartiles(
+    forecast_history: ForecastHistory, method: AggregationMethod
+) -> np.ndarray:
+    """25th, 50th and 75th weighted percentiles of every forecast set in the history,
+    computed in batches. Returns an array of shape (sets, 3, outcomes)"""
+    quartiles = []
+    for values, mask in forecast_history.iter_padded_chunks():
+        weights = None
+        if method == AggregationMethod.RECENCY_WEIGHTED:
+            weights = np.ones(mask.shape)
+            for row, size in enumerate(mask.sum(axis=1)):
+                recency_weights = generate_recency_weights(size)
+                if recency_weights is not None:
+                    weights[row, :size] = recency_weights
+        quartiles.append(
+            weighted_percentile_3d(values, weights, mask, [25.0, 50.0, 75.0]).transpose(
+                1, 0, 2
+            )
+        )
+    if not quartiles:
+        return np.empty((0, 3, forecast_history.forecasts_values.shape[-1]))
+    return np.concatenate(quartiles)
+
+
+class FenwickTree:
+    """counts of items over a fixed range of ranks, supporting O(log N)
+    updates and k-th smallest item lookups"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.step = 1 << size.bit_length()
+
+    def add(self, rank: int, count: int = 1):
+        rank += 1
+        while rank <= self.size:
+            self.tree[rank] += count
+            rank += rank & -rank
+
+    def find(self, k: int) -> int:
+        """rank of the k-th (0-based) smallest item"""
+        position = 0
+        step = self.step
+        while step:
+            if position + step <= self.size and self.tree[position + step] <= k:
+                position += step
+                k -= self.tree[position]
+            step >>= 1
+        return position
+
+
+def first_count_passing(size: int, percentile: float, strict: bool) -> int:
+    """position of the first item whose cumulative count normalized by size is
+    greater than (strict) or equal to percentile / 100,
+    mirroring the unweighted case of weighted_percentile_2d"""
+    threshold = percentile / 100.0
+
+    def passes(count: int) -> bool:
+        return count / size > threshold if strict else count / size >= threshold
+
+    count = min(max(int(threshold * size), 1), size)
+    while count > 1 and passes(count - 1):
+        count -= 1
+    while count <= size and not passes(count):
+        count += 1
+    return count - 1 if count <= size else 0
+
+
+class BinaryForecastWindow:
+    """Active forecasts of a binary question during a sweep over its history.
+
+    Unweighted percentiles are found in O(log N) with a Fenwick tree over the
+    distinct probabilities of the history. Recency weights depend on the start
+    order of the active forecasts, which shifts whenever a forecast leaves,
+    so active forecasts are only flagged in O(1) as they enter and leave, and
+    recency weighted percentiles are computed at the emitted timesteps with
+    one vectorized pass over the forecasts, which are presorted by probability."""
+
+    def __init__(self, forecasts_values: np.ndarray, recency_weighted: bool):
+        self.recency_weighted = recency_weighted
+        self.values, first_indexes, self.value_ranks = np.unique(
+            forecasts_values[:, 1], return_index=True, return_inverse=True
         )
-        forecast_values = forecast.get_prediction_values()
-        for timestep in timesteps[start_index:end_index]:
-            if timestep not in forecast_sets:
-                forecast_sets[timestep] = ForecastSet(
-                    forecasts_values=[],
-                    timestep=timestep,
-                    users=[],
-                    timesteps=[],
+        self.complements = forecasts_values[first_indexes, 0]
+        self.size = 0
+        if recency_weighted:
+            # forecasts ordered by (probability, start order), the active
+            # flags of the forecasts in start order and in that order, and
+            # the start ranks among the active forecasts
+            self.order = np.argsort(self.value_ranks, kind="stable")
+            self.positions = np.empty_like(self.order)
+            self.positions[self.order] = np.arange(len(self.order))
+            self.active = np.zeros(len(self.order), dtype=bool)
+            self.ordered_active = np.zeros(len(self.order), dtype=bool)
+            self.start_ranks = np.zeros(len(self.order), dtype=int)
+        else:
+            self.counts = FenwickTree(len(self.values))
+
+    def add(self, forecast_index: int):
+        self.size += 1
+        if self.recency_weighted:
+            self.active[forecast_index] = True
+            self.ordered_active[self.positions[forecast_index]] = True
+        else:
+            self.counts.add(self.value_ranks[forecast_index])
+
+    def remove(self, forecast_index: int):
+        self.size -= 1
+        if self.recency_weighted:
+            self.active[forecast_index] = False
+            self.ordered_active[self.positions[forecast_index]] = False
+        else:
+            self.counts.add(self.value_ranks[forecast_index], -1)
+
+    def get_percentiles(self, percentiles: Percentiles) -> np.ndarray:
+        """same as weighted_percentile_2d over the active forecasts values,
+        returns an array of shape (percentiles, 2)"""
+        if self.recency_weighted:
+            return self.get_recency_weighted_percentiles(percentiles)
+
+        size = self.size
+        results = []
+        for percentile in percentiles:
+            left = first_count_passing(size, percentile, strict=False)
+            right = first_count_passing(size, percentile, strict=True)
+            results.append(
+                [
+                    0.5
+                    * (
+                        self.complements[self.counts.find(size - 1 - left)]
+                        + self.complements[self.counts.find(size - 1 - right)]
+                    ),
+                    0.5
+                    * (
+                        self.values[self.counts.find(left)]
+                        + self.values[self.counts.find(right)]
+                    ),
+                ]
+            )
+        return np.array(results)
+
+    def get_recency_weighted_percentiles(self, percentiles: Percentiles) -> np.ndarray:
+        ordered_indexes = self.order[np.flatnonzero(self.ordered_active)]
+        value_ranks = self.value_ranks[ordered_indexes]
+        self.start_ranks[np.flatnonzero(self.active)] = np.arange(self.size)
+        start_ranks = self.start_ranks[ordered_indexes]
+        weights = generate_recency_weights(self.size)
+        ordered_weights = (
+            weights[start_ranks] if weights is not None else np.ones(self.size)
+        )
+
+        # ascending probabilities of "no" are the reversed probabilities of "yes"
+        columns = [
+            (self.complements[value_ranks[::-1]], ordered_weights[::-1]),
+            (self.values[value_ranks], ordered_weights),
+        ]
+        results = np.zeros((len(percentiles), 2))
+        for column, (sorted_values, column_weights) in enumerate(columns):
+            normalized_cumulative_weights = np.cumsum(column_weights) / np.sum(
+                column_weights
+            )
+            for i, percentile in enumerate(percentiles):
+                left = np.searchsorted(
+                    normalized_cumulative_weights, percentile / 100.0, side="left"
+                )
+                right = np.searchsorted(
+                    normalized_cumulative_weights, percentile / 100.0, side="right"
                 )
-            forecast_sets[timestep].forecasts_values.append(forecast_values)
-            forecast_sets[timestep].users.append(forecast.author)
-            forecast_sets[timestep].timesteps.append(forecast.start_time)
+                left = left if left < self.size else 0
+                right = right if right < self.size else 0
+                results[i, column] = 0.5 * (sorted_values[left] + sorted_values[right])
+        return results
+
+
+def get_binary_history_quartiles(
+    forecast_history: ForecastHistory, method: AggregationMethod
+) -> np.ndarray:
+    """25th, 50th and 75th weighted percentiles of every forecast set in the
+    history of a binary question, maintaining the active set across the sweep.
+    Returns an array of shape (sets, 3, 2)"""
+    if len(forecast_history.forecasts_values) == 0:
+        return np.empty((0, 3, 2))
+    window = BinaryForecastWindow(
+        forecast_history.forecasts_values,
+        recency_weighted=method == AggregationMethod.RECENCY_WEIGHTED,
+    )
+    starting = generate_map_from_list(
+        range(len(forecast_history.start_indexes)),
+        lambda i: forecast_history.start_indexes[i],
+    )
+    ending = generate_map_from_list(
+        range(len(forecast_history.end_indexes)),
+        lambda i: forecast_history.end_indexes[i],
+    )
 
-    return sorted(list(forecast_sets.values()), key=lambda x: x.timestep)
+    quartiles = []
+    for timestep_index in range(len(forecast_history.timesteps)):
+        # forecasts starting and ending between two timesteps are never active
+        for forecast_index in starting.get(timestep_index, []):
+            window.add(forecast_index)
+        for forecast_index in ending.get(timestep_index, []):
+            window.remove(forecast_index)
+        if window.size:
+            quartiles.append(window.get_percentiles([25.0, 50.0, 75.0]))
+    return np.array(quartiles).reshape(-1, 3, 2)
 
 
 def generate_recency_weights(number_of_forecasts: int) -> np.ndarray:
@@ -338,7 +777,7 @@ def generate_recency_weights(number_of_forecasts: int) -> np.ndarray:
 
 def calculate_single_aggregation_weights(
     forecast_set: ForecastSet,
-    reputations: list[Reputation],
+    reputations: list[float],
     open_time: datetime,
     close_time: datetime,
 ) -> Weights:
@@ -350,7 +789,7 @@ def calculate_single_aggregation_weights(
         for start_time in forecast_set.timesteps
     ]
     weights = [
-        (decay**a * reputation.value ** (1 - a)) ** b
+        (decay**a * reputation ** (1 - a)) ** b
         for decay, reputation in zip(decays, reputations)
     ]
     return weights
@@ -364,26 +803,44 @@ def get_aggregation_history(
     include_stats: bool = True,
     include_bots: bool = False,
     histogram: bool | None = None,
+    after: datetime | None = None,
+    minimize_max_size: int = 128,
 ) -> dict[AggregationMethod, list[AggregateForecast]]:
+    """set after to only aggregate timesteps strictly later than that time.
+    Forecasts that are no longer active at that point are not loaded at all.
+    When minimize is set, at most minimize_max_size timesteps are kept, chosen
+    where any of the aggregations moves (see minimize_forecast_history) among
+    candidate timesteps where the unweighted mean moves."""
     full_summary: dict[AggregationMethod, list[AggregateForecast]] = dict()
 
     # get input forecasts
-    forecasts = question.user_forecasts.order_by("start_time").select_related("author")
+    forecasts = question.user_forecasts.order_by("start_time")
 
     if user_ids:
         forecasts = forecasts.filter(author_id__in=user_ids)
     if not include_bots:
         forecasts = forecasts.exclude(author__is_bot=True)
+    if after:
+        forecasts = forecasts.filter(Q(end_time__isnull=True) | Q(end_time__gt=after))
 
-    forecast_history = get_user_forecast_history(forecasts, minimize)
+    rows = ForecastRows.from_queryset(forecasts)
+    forecast_history = get_user_forecast_history(rows, after=after)
 
+    # weights of each method are computed per forecast set, all methods are
+    # aggregated in the same sweep over the history
+    weight_getters: dict[AggregationMethod, Callable] = dict()
+    quartiles: dict[AggregationMethod, np.ndarray] = dict()
     for method in aggregation_methods:
-        aggregation_history: list[AggregateForecast] = []
         match method:
             case AggregationMethod.RECENCY_WEIGHTED:
+                recency_weights: dict[int, Weights | None] = dict()
 
                 def get_weights(forecast_set: ForecastSet) -> Weights | None:
-                    return generate_recency_weights(len(forecast_set.forecasts_values))
+                    # only depend on the size of the set
+                    size = len(forecast_set.forecasts_values)
+                    if size not in recency_weights:
+                        recency_weights[size] = generate_recency_weights(size)
+                    return recency_weights[size]
 
             case AggregationMethod.UNWEIGHTED:
 
@@ -391,21 +848,19 @@ def get_aggregation_history(
                     return None
 
             case AggregationMethod.SINGLE_AGGREGATION:
-                users = list(set(forecast.author for forecast in forecasts))
-                reputations = get_reputations_during_interval(
-                    users, question.open_time, question.scheduled_close_time
+                reputations = ReputationTable.from_indexes(
+                    get_reputation_indexes(rows.author_ids.tolist())
                 )
 
                 def get_weights(forecast_set: ForecastSet) -> Weights | None:
-                    reps = []
-                    for user in forecast_set.users:
-                        for rep in reputations[user][::-1]:
-                            if rep.time <= forecast_set.timestep:
-                                reps.append(rep)
-                                break
+                    # reputations only change within the question's lifetime
+                    time = min(
+                        max(forecast_set.timestep, question.open_time),
+                        question.scheduled_close_time,
+                    )
                     return calculate_single_aggregation_weights(
                         forecast_set,
-                        reps,
+                        reputations.values_at(forecast_set.user_ids, time),
                         question.open_time,
                         question.scheduled_close_time,
                     )
@@ -418,28 +873,88 @@ def get_aggregation_history(
                 )
                 continue
 
-        for i, forecast_set in enumerate(forecast_history):
-            weights = get_weights(forecast_set)
-            include_histogram = (
-                question.type == "binary" and histogram
-                if histogram is not None
-                else question.type == "binary" and i == (len(forecast_history) - 1)
-            )
+        weight_getters[method] = get_weights
+        full_summary[method] = []
+
+    if not weight_getters:
+        return full_summary
+
+    if minimize and len(forecast_history) > minimize_max_size:
+        # the aggregations are only measured at candidate timesteps, picked on
+        # the unweighted means which are cheap to compute over the full history
+        forecast_history, _ = minimize_forecast_history(
+            rows,
+            forecast_history,
+            [
+                get_aggregation_series(
+                    forecast_history,
+                    question.type,
+                    AggregationMethod.UNWEIGHTED,
+                    get_weights=None,
+                )
+            ],
+            max_size=MINIMIZE_CANDIDATES_FACTOR * minimize_max_size,
+            tolerance=0.0,
+        )
+
+    for method in weight_getters:
+        if method in [
+            AggregationMethod.RECENCY_WEIGHTED,
+            AggregationMethod.UNWEIGHTED,
+        ]:
+            if question.type == "binary":
+                quartiles[method] = get_binary_history_quartiles(
+                    forecast_history, method
+                )
+            elif question.type == "multiple_choice":
+                quartiles[method] = get_history_quartiles(forecast_history, method)
 
+    if minimize:
+        # the forecast sets of the kept timesteps are unchanged,
+        # so are their quartiles
+        forecast_history, kept_indexes = minimize_forecast_history(
+            rows,
+            forecast_history,
+            [
+                get_aggregation_series(
+                    forecast_history,
+                    question.type,
+                    method,
+                    get_weights,
+                    quartiles.get(method),
+                )
+                for method, get_weights in weight_getters.items()
+            ],
+            max_size=minimize_max_size,
+        )
+        if kept_indexes is not None:
+            quartiles = {
+                method: method_quartiles[kept_indexes]
+                for method, method_quartiles in quartiles.items()
+            }
+    history_size = len(forecast_history)
+
+    for i, forecast_set in enumerate(forecast_history):
+        include_histogram = (
+            question.type == "binary" and histogram
+            if histogram is not None
+            else question.type == "binary" and i == (history_size - 1)
+        )
+        for method, get_weights in weight_getters.items():
             new_entry: AggregateForecast = calculate_aggregation_entry(
                 forecast_set,
                 question.type,
-                weights,
+                get_weights(forecast_set),
                 method=method,
                 include_stats=include_stats,
                 histogram=include_histogram,
+                quartiles=quartiles[method][i] if method in quartiles else None,
             )
             new_entry.question = question
             new_entry.method = method
+            aggregation_history = full_summary[method]
             if aggregation_history:
                 aggregation_history[-1].end_time = new_entry.start_time
             aggregation_history.append(new_entry)
 
-        full_summary[method] = aggregation_history
-
     return full_summary
@@ -23,6 +23,12 @@ if TYPE_CHECKING:
 #     as a PMF
 
 
+def cdf_to_pmf(cdfs: np.ndarray) -> np.ndarray:
+    """pmfs of the cdfs along the last axis, the first and last buckets hold
+    the probability below and above the bounds"""
+    return np.diff(cdfs, axis=-1, prepend=0, append=1)
+
+
 def string_location_to_scaled_location(
     string_location: str, question: "Question"
 ) -> float:
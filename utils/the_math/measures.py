@@ -18,7 +18,7 @@ def weighted_percentile_2d(
     weights: Weights | None = None,
     percentiles: Percentiles | None = None,
 ) -> Percentiles:
-    values = np.array(values)
+    values = np.asarray(values)
     if weights is None:
         ordered_weights = np.ones_like(values)
     else:
@@ -55,6 +55,60 @@ def weighted_percentile_2d(
     return np.array(weighted_percentiles)
 
 
+def weighted_percentile_3d(
+    values: np.ndarray,
+    weights: np.ndarray | None = None,
+    mask: np.ndarray | None = None,
+    percentiles: Percentiles | None = None,
+) -> np.ndarray:
+    """batched version of weighted_percentile_2d over a stack of forecast sets
+
+    values has shape (sets, forecasts, outcomes), weights and mask (sets, forecasts).
+    Sets with fewer forecasts are padded, mask marks the real entries.
+    Returns an array of shape (percentiles, sets, outcomes)
+    """
+    values = np.asarray(values, dtype=float)
+    if mask is None:
+        mask = np.ones(values.shape[:2], dtype=bool)
+    if weights is None:
+        weights = np.ones(values.shape[:2])
+    weights = np.where(mask, weights, 0.0)
+    percentiles = np.array(percentiles or [50.0])
+
+    # padded entries are sorted to the end and carry no weight
+    padded_values = np.where(mask[:, :, np.newaxis], values, np.inf)
+    order = padded_values.argsort(axis=1)
+    sorted_values = np.take_along_axis(padded_values, order, axis=1)
+    ordered_weights = np.take_along_axis(
+        np.broadcast_to(weights[:, :, np.newaxis], values.shape), order, axis=1
+    )
+
+    # get the normalized cumulative weights
+    normalized_cumulative_weights = np.cumsum(ordered_weights, axis=1) / np.sum(
+        ordered_weights, axis=1, keepdims=True
+    )
+    weighted_percentiles = []
+    for percentile in percentiles:
+        right_indexes = np.argmax(
+            normalized_cumulative_weights > (percentile / 100.0),
+            axis=1,
+            keepdims=True,
+        )
+        left_indexes = np.argmax(
+            normalized_cumulative_weights >= (percentile / 100.0),
+            axis=1,
+            keepdims=True,
+        )
+        weighted_percentiles.append(
+            0.5
+            * (
+                np.take_along_axis(sorted_values, left_indexes, axis=1)
+                + np.take_along_axis(sorted_values, right_indexes, axis=1)
+            )[:, 0, :]
+        )
+    return np.array(weighted_percentiles)
+
+
 def percent_point_function(
     cdf: ForecastValues, percentiles: Percentiles | float | int
 ) -> Percentiles: